@@ -0,0 +1,295 @@
+# JSON API: keyset-paginated listings, bulk IOC lookup and streaming exports.
+import base64, csv, io, ipaddress, json
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, cast, delete, desc, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import CIDR, insert as pg_insert
+from sqlalchemy.orm import Session
+from .db import SessionLocal, get_db
+from .models import IOC, IOCSighting, Item, ItemTag, ItemTechnique, Source, Tag, Technique, WatchEntry, WatchHit
+from .schemas import (IOCPage, LookupRequest, LookupResponse, SearchResponse, StatsResponse,
+                      WatchEntriesCreated, WatchEntriesIn, WatchEntryPage, WatchHitPage)
+from .lookup import lookup, reported
+from .ingest.ioc_norm import reverse_domain
+from .ingest.tagger import TECHNIQUE_ID, tag_name
+from .search import _row, search_items
+from .rollups import stats
+from .watchlist import KINDS as WATCH_KINDS, normalize_entry
+from . import cache
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+# Rows fetched per round-trip by the export's server-side cursor
+EXPORT_YIELD_PER = 5000
+MAX_LOOKUP_VALUES = 200_000
+MAX_WATCH_ENTRIES = 100_000
+CSV_FIELDS = ["id", "item_id", "type", "value", "malware", "threat_type", "confidence", "first_seen", "last_seen", "tags"]
+
+def encode_cursor(*key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _cursor_part(value: Any, kinds: tuple) -> Any:
+    if value is None and type(None) in kinds:
+        return None
+    if datetime in kinds and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    # bool is an int subclass; ids past bigint would fail in Postgres instead
+    if int in kinds and type(value) is int and -2**63 <= value < 2**63:
+        return value
+    raise ValueError(value)
+
+def decode_cursor(cursor: str, *kinds: type | tuple) -> List[Any]:
+    """
+    Decode an encode_cursor() key whose elements match kinds, one type (or tuple of types)
+    per element; datetime elements arrive as ISO strings and are parsed. Anything else,
+    including a well-formed cursor of the wrong shape, is a 400.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(key, list) or len(key) != len(kinds):
+            raise ValueError(key)
+        return [_cursor_part(v, k if isinstance(k, tuple) else (k,)) for v, k in zip(key, kinds)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def with_technique(attack_id: str):
+    """Items labelled with the technique or one of its sub-techniques; a semi-join on item_techniques."""
+    t = attack_id.strip().upper()
+    if not TECHNIQUE_ID.fullmatch(t):
+        raise HTTPException(status_code=400, detail="Invalid ATT&CK technique id")
+    ids = select(Technique.id).where(or_(Technique.attack_id == t, Technique.attack_id.like(t + ".%")))
+    return Item.id.in_(select(ItemTechnique.item_id).where(ItemTechnique.technique_id.in_(ids)))
+
+def with_tag(tag: str):
+    name = tag_name(tag)
+    if name is None:
+        raise HTTPException(status_code=400, detail="Invalid tag")
+    return Item.id.in_(select(ItemTag.item_id).join(Tag, Tag.id == ItemTag.tag_id).where(Tag.name == name))
+
+@router.get("/items", response_model=SearchResponse)
+def api_items(
+    db: Session = Depends(get_db),
+    q: str | None = Query(None, description="Full-text query; results are ranked and not paginated"),
+    technique: str | None = Query(None, description="ATT&CK id, e.g. T1059 (includes its sub-techniques) or T1059.001"),
+    tag: str | None = Query(None, description="Tag name, e.g. ransomware or cobalt-strike"),
+    cursor: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+):
+    if q:
+        if technique or tag:
+            raise HTTPException(status_code=400, detail="technique/tag filters apply to the listing, not to q")
+        items, count = search_items(db, q=q, limit=limit)
+        return {"items": items, "count": count, "next_cursor": None}
+
+    # Newest first; undated items sort last. Keyset on (published_at, id), never OFFSET
+    stmt = (
+        select(Item, Source.name).join(Source, Item.source_id == Source.id)
+        .order_by(desc(Item.published_at).nulls_last(), desc(Item.id))
+        .limit(limit)
+    )
+    if technique:
+        stmt = stmt.where(with_technique(technique))
+    if tag:
+        stmt = stmt.where(with_tag(tag))
+    if cursor:
+        published, last_id = decode_cursor(cursor, (datetime, type(None)), int)
+        if published is None:
+            stmt = stmt.where(and_(Item.published_at.is_(None), Item.id < last_id))
+        else:
+            stmt = stmt.where(or_(
+                tuple_(Item.published_at, Item.id) < tuple_(published, last_id),
+                Item.published_at.is_(None),
+            ))
+    rows = db.execute(stmt).all()
+    items = [_row(it, sname) for it, sname in rows]
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.published_at.isoformat() if last.published_at else None, last.id)
+    return {"items": items, "count": len(items), "next_cursor": next_cursor}
+
+def in_network(cidr: str):
+    """`IOC.ip <<= cidr`; served by the GiST inet_ops index."""
+    try:
+        net = ipaddress.ip_network(cidr.strip(), strict=False)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid CIDR")
+    return IOC.ip.op("<<=")(cast(str(net), CIDR))
+
+def under_domain(domain: str):
+    """Prefix match on reversed labels: example.com matches itself and *.example.com."""
+    rev = reverse_domain(domain)
+    if rev == ".":
+        raise HTTPException(status_code=400, detail="Invalid domain")
+    pattern = rev.replace("/", "//").replace("%", "/%").replace("_", "/_") + "%"
+    return IOC.domain_rev.like(pattern, escape="/")
+
+@router.get("/iocs", response_model=IOCPage)
+def api_iocs(
+    db: Session = Depends(get_db),
+    type: str | None = Query(None),
+    item_id: int | None = Query(None),
+    seen_within: int | None = Query(None, ge=1, description="Only IOCs last seen within this many hours"),
+    cidr: str | None = Query(None, description="IPs (and IP-host URLs) inside this network, e.g. 203.0.113.0/24"),
+    domain_suffix: str | None = Query(None, description="Domains (and URL hosts) equal to or under this domain"),
+    cursor: str | None = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    stmt = select(IOC).order_by(IOC.id).limit(limit)
+    if type:
+        stmt = stmt.where(IOC.type == type)
+    if item_id is not None:
+        # Every IOC the item reported, not just the ones it reported first
+        stmt = stmt.where(IOC.id.in_(select(IOCSighting.ioc_id).where(IOCSighting.item_id == item_id)))
+    if seen_within:
+        stmt = stmt.where(IOC.last_seen >= datetime.utcnow() - timedelta(hours=seen_within))
+    if cidr:
+        stmt = stmt.where(in_network(cidr))
+    if domain_suffix:
+        stmt = stmt.where(under_domain(domain_suffix))
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(IOC.id > last_id)
+    iocs = db.execute(stmt).scalars().all()
+    next_cursor = encode_cursor(iocs[-1].id) if len(iocs) == limit else None
+    return {"iocs": iocs, "count": len(iocs), "next_cursor": next_cursor}
+
+@router.post("/iocs/lookup", response_model=LookupResponse)
+def api_iocs_lookup(body: LookupRequest, db: Session = Depends(get_db)):
+    if sum(len(v) for v in body.iocs.values()) > MAX_LOOKUP_VALUES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_LOOKUP_VALUES} values per request")
+    return lookup(db, body.iocs, include_extracted=body.include_extracted)
+
+def _csv_row(r) -> list:
+    ctx = r.context or {}
+    return [r.id, r.item_id, r.type, r.value,
+            ctx.get("malware_printable") or ctx.get("malware"), ctx.get("threat_type"),
+            ctx.get("confidence"), ctx.get("first_seen"), ctx.get("last_seen"),
+            ";".join(ctx.get("tags") or [])]
+
+def _stream_iocs(fmt: str, type: str | None, include_extracted: bool = False, chunk_bytes: int = 1 << 16) -> Iterator[str]:
+    # Own session: the request-scoped one is closed before a streaming body is sent
+    db = SessionLocal()
+    try:
+        stmt = select(IOC.id, IOC.item_id, IOC.type, IOC.value, IOC.context).order_by(IOC.id)
+        if type:
+            stmt = stmt.where(IOC.type == type)
+        if not include_extracted:
+            stmt = stmt.where(reported())
+        buf = io.StringIO()
+        writer = csv.writer(buf) if fmt == "csv" else None
+        if writer:
+            writer.writerow(CSV_FIELDS)
+        for r in db.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER)):
+            if writer:
+                writer.writerow(_csv_row(r))
+            else:
+                buf.write(json.dumps({"id": r.id, "item_id": r.item_id, "type": r.type,
+                                      "value": r.value, "context": r.context}))
+                buf.write("\n")
+            if buf.tell() >= chunk_bytes:
+                yield buf.getvalue()
+                buf.seek(0); buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+    finally:
+        db.close()
+
+@router.get("/iocs/export")
+def api_iocs_export(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    type: str | None = Query(None),
+    include_extracted: bool = Query(False, description="Also IOCs only ever extracted from report text"),
+):
+    media = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"iocs.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        _stream_iocs(format, type, include_extracted),
+        media_type=media,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/stats", response_model=StatsResponse)
+def api_stats(
+    db: Session = Depends(get_db),
+    days: int = Query(30, ge=1, le=366),
+    weeks: int = Query(12, ge=1, le=104),
+    top: int = Query(10, ge=1, le=100),
+):
+    # Reads only the rollup tables, cached per cache generation like the pages
+    return cache.cached_json("stats", [days, weeks, top], lambda: stats(db, days, weeks, top))
+
+@router.get("/watchlist", response_model=WatchEntryPage)
+def api_watchlist(
+    db: Session = Depends(get_db),
+    kind: str | None = Query(None, description="cidr, domain, hash or malware"),
+    cursor: str | None = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    stmt = select(WatchEntry).order_by(WatchEntry.id).limit(limit)
+    if kind:
+        stmt = stmt.where(WatchEntry.kind == kind)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(WatchEntry.id > last_id)
+    entries = db.execute(stmt).scalars().all()
+    next_cursor = encode_cursor(entries[-1].id) if len(entries) == limit else None
+    return {"entries": entries, "count": len(entries), "next_cursor": next_cursor}
+
+@router.post("/watchlist", response_model=WatchEntriesCreated)
+def api_watchlist_add(body: WatchEntriesIn, db: Session = Depends(get_db)):
+    """Add entries; ingest matches IOCs against them from the next batch on."""
+    if len(body.entries) > MAX_WATCH_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_WATCH_ENTRIES} entries per request")
+    rows = {}
+    for i, e in enumerate(body.entries):
+        if e.kind not in WATCH_KINDS:
+            raise HTTPException(status_code=400, detail=f"entries[{i}]: kind must be one of {', '.join(WATCH_KINDS)}")
+        try:
+            value = normalize_entry(e.kind, e.value)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"entries[{i}]: {exc}")
+        rows.setdefault((e.kind, value), {"kind": e.kind, "value": value, "note": e.note, "created_at": datetime.utcnow()})
+    created = []
+    values = [rows[k] for k in sorted(rows)]
+    for i in range(0, len(values), 1000):
+        created += db.execute(
+            pg_insert(WatchEntry).values(values[i:i + 1000])
+            .on_conflict_do_nothing(constraint="watch_entries_kind_value_unique")
+            .returning(WatchEntry.id, WatchEntry.kind, WatchEntry.value, WatchEntry.note, WatchEntry.created_at)
+        ).mappings().all()
+    db.commit()
+    return {"created": created, "existing": len(body.entries) - len(created)}
+
+@router.delete("/watchlist/{entry_id}", status_code=204)
+def api_watchlist_delete(entry_id: int, db: Session = Depends(get_db)):
+    # Its hits go with it
+    db.execute(delete(WatchHit).where(WatchHit.entry_id == entry_id))
+    if not db.execute(delete(WatchEntry).where(WatchEntry.id == entry_id)).rowcount:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="No such watchlist entry")
+    db.commit()
+    return Response(status_code=204)
+
+@router.get("/watchlist/hits", response_model=WatchHitPage)
+def api_watchlist_hits(
+    db: Session = Depends(get_db),
+    entry_id: int | None = Query(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    # Newest first, keyset on id
+    stmt = (select(WatchHit.id, WatchHit.entry_id, WatchEntry.kind, WatchEntry.value.label("watch_value"),
+                   WatchHit.ioc_id, IOC.type, IOC.value, WatchHit.item_id, WatchHit.source_id, WatchHit.matched_at)
+            .join(WatchEntry, WatchEntry.id == WatchHit.entry_id).join(IOC, IOC.id == WatchHit.ioc_id)
+            .order_by(desc(WatchHit.id)).limit(limit))
+    if entry_id is not None:
+        stmt = stmt.where(WatchHit.entry_id == entry_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(WatchHit.id < last_id)
+    hits = [dict(r._mapping) for r in db.execute(stmt)]
+    next_cursor = encode_cursor(hits[-1]["id"]) if len(hits) == limit else None
+    return {"hits": hits, "count": len(hits), "next_cursor": next_cursor}
@@ -0,0 +1,56 @@
+# HTML pages on async handlers and an asyncpg session (settings.ASYNC_DB).
+# Same routes, queries and templates as app.pages.
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import HTMLResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import get_async_db
+from .pages import HOME_STATS, IOC_PAGE_SIZE, detail_context, html_response, ioc_page_stmt, item_stmt, split_page, type_counts_stmt
+from .rollups import stats
+from .search import search_items_async
+from .templates import render_async
+from . import cache
+
+router = APIRouter()
+
+@router.get("/", response_class=HTMLResponse)
+async def home(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def page():
+        items, _ = await search_items_async(db, limit=50)
+        home_stats = await db.run_sync(lambda s: stats(s, **HOME_STATS))
+        return (await render_async("index.html", {"items": items, "stats": home_stats})).body.decode()
+    return html_response(request, *await cache.acached_page("home", [], page))
+
+@router.get("/items", response_class=HTMLResponse)
+async def list_items(request: Request, db: AsyncSession = Depends(get_async_db), q: str | None = Query(None)):
+    async def page():
+        items, _ = await search_items_async(db, q=q, limit=100)
+        return (await render_async("items.html", {"items": items, "q": q})).body.decode()
+    return html_response(request, *await cache.acached_page("items", [(q or "").strip()], page))
+
+@router.get("/items/{item_id}", response_class=HTMLResponse)
+async def item_detail(item_id: int, db: AsyncSession = Depends(get_async_db)):
+    row = (await db.execute(item_stmt(item_id))).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Item not found")
+    item, source_name = row
+    type_counts = (await db.execute(type_counts_stmt(item.id))).all()
+    iocs, next_cursor = split_page((await db.execute(ioc_page_stmt(item.id))).scalars().all())
+    return await render_async("item_detail.html", detail_context(item, source_name, type_counts, iocs, next_cursor))
+
+@router.get("/items/{item_id}/iocs", response_class=HTMLResponse)
+async def item_iocs(
+    item_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    type: str | None = Query(None),
+    q: str | None = Query(None),
+    malware: str | None = Query(None),
+    tag: str | None = Query(None),
+    cursor: int | None = Query(None),
+    limit: int = Query(IOC_PAGE_SIZE, ge=1, le=1000),
+):
+    rows = (await db.execute(ioc_page_stmt(item_id, type, q, malware, tag, cursor, limit))).scalars().all()
+    iocs, next_cursor = split_page(rows, limit)
+    resp = await render_async("_ioc_rows.html", {"iocs": iocs})
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = str(next_cursor)
+    return resp
@@ -0,0 +1,110 @@
+# ThreatFox full-export backfill: COPY into staging, set-based merge, resumable checkpoints.
+import hashlib
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from collections import Counter
+from .bulk import copy_iocs
+from .cache import bump_generation
+from . import metrics
+from .ingest.threatfox_export import iter_export_file, make_batch_item
+from .models import IngestCheckpoint, Item
+from .rollups import add_item_counts, week_of
+
+CHECKPOINT_NAME = "threatfox-export-full"
+IOC_TYPES = ("ip", "domain", "url", "sha256", "sha1", "md5", "email")
+# Rows per COPY + merge + checkpoint; the COPY itself streams, so this only bounds rework on resume
+COPY_CHUNK = 100_000
+
+def _batch_item(db: Session, source_id: int, fingerprint: str) -> int:
+    # One Item per export fingerprint, so re-running the same export reuses it
+    h = hashlib.sha256(f"{CHECKPOINT_NAME}:{fingerprint}".encode()).digest()
+    existing = db.execute(select(Item.id).where(Item.hash_sha256 == h).limit(1)).scalar_one_or_none()
+    if existing:
+        return existing
+    batch = make_batch_item(count=0)
+    it = Item(
+        source_id=source_id,
+        canonical_url=batch["canonical_url"],
+        title=batch["title"],
+        published_at=batch["published_at"],
+        fetched_at=datetime.utcnow(),
+        author=batch["author"],
+        raw=batch["raw"],
+        text=batch["text"],
+        summary_short=batch["summary_short"],
+        lang="en",
+        hash_sha256=h,
+    )
+    db.add(it)
+    db.flush()
+    add_item_counts(db, Counter({(week_of(it.published_at or it.fetched_at), source_id): 1}))
+    return it.id
+
+def _checkpoint(db: Session, fingerprint: str) -> IngestCheckpoint:
+    cp = db.get(IngestCheckpoint, CHECKPOINT_NAME)
+    if cp is None:
+        cp = IngestCheckpoint(name=CHECKPOINT_NAME, fingerprint=fingerprint, position=0, completed=False)
+        db.add(cp)
+    elif cp.fingerprint != fingerprint:
+        # A new export supersedes the old one; ON CONFLICT makes restarting from 0 safe
+        cp.fingerprint, cp.position, cp.completed, cp.item_id = fingerprint, 0, False, None
+    return cp
+
+def _known_types(rows: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for r in rows:
+        if r["type"] in IOC_TYPES:
+            yield r
+
+def load_export(db: Session, path: str, fingerprint: str, source_id: int, chunk_size: int = COPY_CHUNK) -> Dict[str, Any]:
+    """
+    Load a downloaded full-export zip into `iocs`.
+
+    Progress is committed together with each merged chunk, so an interrupted run
+    resumes from the last checkpoint when it sees the same export fingerprint.
+    """
+    cp = _checkpoint(db, fingerprint)
+    if cp.completed:
+        return {"status": "already loaded", "position": cp.position, "inserted": 0}
+    if cp.item_id is None:
+        cp.item_id = _batch_item(db, source_id, fingerprint)
+    db.commit()
+
+    # Position counts export rows consumed, including ones later filtered out by type
+    consumed = 0
+    def counted(it):
+        nonlocal consumed
+        for r in it:
+            consumed += 1
+            yield r
+
+    rows = counted(iter_export_file(path))
+    for _ in islice(rows, cp.position or 0):
+        pass
+
+    copied_total = inserted_total = 0
+    while True:
+        before = consumed
+        with metrics.stage("copy_merge", CHECKPOINT_NAME):
+            copied, inserted, hits = copy_iocs(db, _known_types(islice(rows, chunk_size)), cp.item_id, source_id)
+        if consumed == before:
+            break
+        cp.position = consumed
+        cp.updated_at = datetime.utcnow()
+        db.commit()
+        metrics.record_rows(CHECKPOINT_NAME, {"iocs_inserted": inserted, "watch_hits": hits})
+        if inserted:
+            bump_generation()
+        copied_total += copied
+        inserted_total += inserted
+
+    it = db.get(Item, cp.item_id)
+    it.title = make_batch_item(count=cp.position)["title"]
+    it.raw = {**(it.raw or {}), "count": cp.position, "fingerprint": fingerprint}
+    cp.completed = True
+    cp.updated_at = datetime.utcnow()
+    db.commit()
+    bump_generation()  # the batch item's title changed
+    return {"status": "done", "position": cp.position, "copied": copied_total, "inserted": inserted_total}
@@ -0,0 +1,340 @@
+# Set-based write path shared by every ingest task.
+import csv, hashlib, io, json
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from sqlalchemy import and_, case, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .models import Item, ItemAlias, IOC, IOCSighting
+from .rollups import COPY_ROLLUP_CTE, add_ioc_counts, add_item_counts, ioc_key, week_of
+from .lookup import add_to_filter
+from .cache import bump_generation
+from .dedup import split_near_duplicates
+from .tagging import labels_for, write_labels
+from .ingest.tagger import context_tags
+from .watchlist import current as current_watchlist, record_hits, record_matches
+from .ingest.extract import extract_iocs
+from .ingest.fingerprint import canonical_url
+from .ingest.ioc_norm import typed_columns
+
+# Rows per multi-row INSERT; keeps statements well under the bind-param limit
+CHUNK_SIZE = 1000
+
+def item_hash(n: Dict[str, Any]) -> bytes:
+    # Exact dedup hash; callers canonicalize the URL first (see upsert_items)
+    raw = ((n.get("title") or "") + (n.get("canonical_url") or "")).encode()
+    return hashlib.sha256(raw).digest()
+
+def chunked(rows: List[Any], size: int = CHUNK_SIZE) -> Iterable[List[Any]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def _existing_hashes(db: Session, hashes: List[bytes]) -> set[bytes]:
+    # Stored items and the duplicates already linked to them as aliases
+    found: set[bytes] = set()
+    for part in chunked(hashes):
+        found.update(bytes(h) for h in db.execute(
+            select(Item.hash_sha256).where(Item.hash_sha256.in_(part))
+            .union_all(select(ItemAlias.hash_sha256).where(ItemAlias.hash_sha256.in_(part)))
+        ).scalars())
+    return found
+
+def _naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def _context_time(s: Any) -> Optional[datetime]:
+    if not isinstance(s, str) or len(s) < 19:
+        return None
+    try:
+        # "YYYY-MM-DD HH:MM:SS", optionally followed by " UTC" or an offset
+        return datetime.fromisoformat(s[:19])
+    except ValueError:
+        return None
+
+def seen_times(ctx: Optional[Dict[str, Any]]) -> tuple[Optional[datetime], Optional[datetime]]:
+    """(first seen, last seen) carried in an IOC's context (ThreatFox, UTC); each falls back to the other."""
+    first, last = _context_time((ctx or {}).get("first_seen")), _context_time((ctx or {}).get("last_seen"))
+    return first or last, last or first
+
+def upsert_iocs(db: Session, rows: List[Dict[str, Any]], sightings: Dict[tuple, Dict[int, datetime]], source_id: int) -> tuple[int, int, int, int]:
+    """
+    Multi-row upsert of IOC rows (one per (type, value)) plus their sightings.
+
+    New indicators are inserted; known ones get `first_seen`/`last_seen` widened and
+    `sighting_count` bumped by the row's count. `sightings` maps (type, value) to
+    {item_id: seen_at}. New indicators are added to the daily rollup, and every indicator
+    is matched against the watchlist.
+    Returns (iocs inserted, iocs updated, sightings inserted, watch hits inserted).
+    """
+    inserted = updated = sighted = 0
+    counts: Counter = Counter()
+    watch = current_watchlist(db) if rows else None
+    hits: List[Dict[str, Any]] = []
+    # Same lock order in every worker, so overlapping batches can't deadlock
+    rows = sorted(rows, key=lambda r: (r["type"], r["value"]))
+    for part in chunked(rows):
+        stmt = pg_insert(IOC).values(part)
+        stmt = (stmt.on_conflict_do_update(constraint="iocs_type_value_unique", set_={
+                    # A feed's context replaces the {"extracted": true} marker of a text-extracted row
+                    "context": case((and_(IOC.context.op("->>")("extracted").is_not(None),
+                                          stmt.excluded.context.op("->>")("extracted").is_(None)),
+                                     stmt.excluded.context), else_=IOC.context),
+                    "first_seen": func.least(IOC.first_seen, stmt.excluded.first_seen),
+                    "last_seen": func.greatest(IOC.last_seen, stmt.excluded.last_seen),
+                    "sighting_count": IOC.sighting_count + stmt.excluded.sighting_count,
+                })
+                .returning(IOC.id, IOC.type, IOC.value, literal_column("xmax = 0")))
+        res = db.execute(stmt).all()
+        new = [(t, v) for _, t, v, is_new in res if is_new]
+        add_to_filter(db, new)
+        by_key = {(r["type"], r["value"]): r for r in part}
+        counts.update(ioc_key(by_key[k]["first_seen"], k[0], by_key[k]["context"], source_id) for k in new)
+        inserted += len(new)
+        updated += len(res) - len(new)
+        srows = [{"ioc_id": ioc_id, "item_id": item_id, "source_id": source_id, "seen_at": at}
+                 for ioc_id, t, v, _ in res for item_id, at in sightings[(t, v)].items()]
+        for spart in chunked(srows):
+            sighted += db.execute(pg_insert(IOCSighting).values(spart).on_conflict_do_nothing()).rowcount
+        if watch:
+            for ioc_id, t, v, _ in res:
+                r = by_key[(t, v)]
+                hits += [{"entry_id": e, "ioc_id": ioc_id, "item_id": r["item_id"], "source_id": source_id}
+                         for e in set(watch.match(t, v, r, r["context"]))]
+    hit_count = record_hits(db, hits)
+    # Last, so the hot rollup rows stay locked only until the caller commits
+    add_ioc_counts(db, counts)
+    return inserted, updated, sighted, hit_count
+
+def upsert_items(db: Session, normalized_items: List[Dict[str, Any]], source_id: int, extract: bool = False,
+                 near_dupes: bool = False) -> Dict[str, int]:
+    """
+    Insert a batch of normalized items and their IOCs in a handful of statements.
+
+    - URLs are canonicalized, then items are hashed and deduplicated against the batch
+      and the DB with one query (which also matches items stored under their URL as fetched).
+    - With `near_dupes`, new items whose canonical URL or text SimHash matches a stored
+      item are linked to it as aliases instead (see app.dedup).
+    - IOCs go in through multi-row `ON CONFLICT DO UPDATE`: an indicator that already
+      exists is not duplicated, it gains a sighting and its first/last seen and count move.
+    - With `extract`, new items that carry no IOCs get them pulled from their text.
+    - New items are labelled with the ATT&CK techniques and tags found in them (see app.tagging).
+    - Returns inserted/skipped counts for items and IOCs.
+    """
+    stats = {"items_inserted": 0, "items_skipped": 0, "items_aliased": 0,
+             "iocs_inserted": 0, "iocs_updated": 0, "sightings": 0,
+             "item_techniques": 0, "item_tags": 0, "watch_hits": 0}
+    if not normalized_items:
+        return stats
+
+    by_hash: Dict[bytes, Dict[str, Any]] = {}
+    # Items stored before URL canonicalization keep the hash of their URL as fetched; look
+    # that up too, so a rewritten URL doesn't make an old item look new
+    legacy: Dict[bytes, bytes] = {}
+    for n in normalized_items:
+        url = n.get("canonical_url")
+        n["canonical_url"] = canonical_url(url)
+        h = item_hash(n)
+        by_hash.setdefault(h, n)
+        if url != n["canonical_url"]:
+            legacy.setdefault(item_hash({"title": n.get("title"), "canonical_url": url}), h)
+    existing = _existing_hashes(db, list(by_hash) + list(legacy))
+    existing |= {h for old, h in legacy.items() if old in existing}
+    fresh = {h: n for h, n in by_hash.items() if h not in existing}
+    stats["items_skipped"] = len(normalized_items) - len(fresh)
+    if not fresh:
+        return stats
+    aliases = split_near_duplicates(db, fresh) if near_dupes else {}
+    fresh = {h: n for h, n in fresh.items() if h not in aliases}
+    if extract:
+        # Only for items we're about to store; duplicates never pay for the scan
+        for n in fresh.values():
+            if not n.get("iocs") and n.get("text"):
+                n["iocs"] = extract_iocs(n["text"], source_url=n.get("canonical_url"))
+
+    now = datetime.utcnow()
+    item_rows = [{
+        "source_id": source_id,
+        "canonical_url": n.get("canonical_url"),
+        "title": n.get("title"),
+        "published_at": n.get("published_at"),
+        "fetched_at": now,
+        "author": n.get("author"),
+        "raw": n.get("raw"),
+        "text": n.get("text"),
+        "hash_sha256": h,
+        "summary_short": n.get("summary_short"),
+        "lang": "en",
+        "simhash": n.get("simhash"),
+    } for h, n in fresh.items()]
+
+    ids: Dict[bytes, int] = {}
+    for part in chunked(item_rows):
+        # The unique hash index settles races with a concurrent worker; losers are skipped
+        for item_id, h in db.execute(
+            pg_insert(Item).values(part)
+            .on_conflict_do_nothing(index_elements=["hash_sha256"])
+            .returning(Item.id, Item.hash_sha256)
+        ).all():
+            ids[bytes(h)] = item_id
+    stats["items_inserted"] = len(ids)
+    add_item_counts(db, Counter((week_of(_naive_utc(fresh[h].get("published_at")) or now), source_id) for h in ids))
+    stats["items_skipped"] += len(fresh) - len(ids)
+    labels = {}
+    for h, n in fresh.items():
+        if h in ids:
+            techniques, tags = labels_for(n)
+            if techniques or tags:
+                labels[ids[h]] = (techniques, tags)
+    stats["item_techniques"], stats["item_tags"] = write_labels(db, labels)
+
+    alias_rows = []
+    for h, a in aliases.items():
+        # Aliases of an earlier item in this batch point at its new id (gone if it lost a race)
+        target = a.get("item_id") or ids.get(a.get("item_hash"))
+        if target is None:
+            continue
+        n = by_hash[h]
+        alias_rows.append({"hash_sha256": h, "item_id": target, "source_id": source_id,
+                           "canonical_url": n.get("canonical_url"), "title": n.get("title"),
+                           "reason": a["reason"], "distance": a["distance"], "seen_at": now})
+    for part in chunked(alias_rows):
+        stats["items_aliased"] += db.execute(pg_insert(ItemAlias).values(part).on_conflict_do_nothing()).rowcount
+
+    # One row per indicator per batch (an upsert can't touch a row twice); the first
+    # item to carry it owns a new row, every item carrying it is a sighting
+    ioc_rows: Dict[tuple, Dict[str, Any]] = {}
+    sightings: Dict[tuple, Dict[int, datetime]] = {}
+    for h, n in fresh.items():
+        item_id = ids.get(h)
+        if item_id is None:
+            continue
+        default_seen = _naive_utc(n.get("published_at")) or now
+        for i in n.get("iocs") or []:
+            t, v = i.get("type"), i.get("value")
+            if not t or not v:
+                continue
+            first, at = seen_times(i.get("context"))
+            first, at = first or default_seen, at or default_seen
+            row = ioc_rows.get((t, v))
+            if row is None:
+                row = ioc_rows[(t, v)] = {"item_id": item_id, "type": t, "value": v, "context": i.get("context"),
+                                          "first_seen": first, "last_seen": at, "sighting_count": 0,
+                                          **typed_columns(t, v)}
+                sightings[(t, v)] = {}
+            row["first_seen"], row["last_seen"] = min(row["first_seen"], first), max(row["last_seen"], at)
+            if item_id not in sightings[(t, v)]:
+                sightings[(t, v)][item_id] = at
+                row["sighting_count"] += 1
+
+    stats["iocs_inserted"], stats["iocs_updated"], stats["sightings"], stats["watch_hits"] = upsert_iocs(
+        db, list(ioc_rows.values()), sightings, source_id)
+    db.commit()
+    bump_generation()
+    return stats
+
+class _CsvRowStream:
+    """File-like view over an iterator of IOC dicts, rendered as CSV for COPY FROM STDIN."""
+    def __init__(self, rows: Iterator[Dict[str, Any]], watch=None):
+        self._rows = rows
+        self._watch = watch
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf)
+        self._pending = ""
+        self.count = 0
+        # One context per distinct (tags, malware) pair, for tagging the batch item afterwards
+        self.label_contexts: Dict[tuple, Dict[str, Any]] = {}
+        # (type, value) -> watch entry ids, matched as rows stream past
+        self.watch_matches: Dict[tuple, set] = {}
+
+    def read(self, size: int = 65536) -> str:
+        while len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            ctx = row.get("context")
+            if ctx:
+                self.label_contexts.setdefault((repr(ctx.get("tags")), ctx.get("malware_printable")), ctx)
+            first, last = seen_times(ctx)
+            typed = typed_columns(row["type"], row["value"])
+            if self._watch:
+                entries = self._watch.match(row["type"], row["value"], typed, ctx)
+                if entries:
+                    self.watch_matches.setdefault((row["type"], row["value"]), set()).update(entries)
+            hb = typed["hash_bytes"]
+            self._writer.writerow((row["type"], row["value"], json.dumps(ctx, default=str) if ctx is not None else None,
+                                   first.isoformat(sep=" ") if first else None,
+                                   last.isoformat(sep=" ") if last else None,
+                                   typed["ip"], "\\x" + hb.hex() if hb else None, typed["domain_rev"]))
+            self.count += 1
+            if self._buf.tell() >= size:
+                self._pending += self._buf.getvalue()
+                self._buf.seek(0); self._buf.truncate()
+        if self._buf.tell():
+            self._pending += self._buf.getvalue()
+            self._buf.seek(0); self._buf.truncate()
+        out, self._pending = self._pending[:size], self._pending[size:]
+        return out
+
+    readline = read
+
+def copy_iocs(db: Session, rows: Iterator[Dict[str, Any]], item_id: int, source_id: int) -> tuple[int, int, int]:
+    """
+    Stream IOC rows into a temp staging table with COPY, then merge into `iocs`
+    and `ioc_sightings` with one set-based upsert, as `upsert_items` does.
+
+    Runs inside the session's transaction; the staging rows vanish on commit. Tags from
+    the rows' contexts are added to the batch item, and rows are matched against the
+    watchlist as they stream.
+    Returns (rows_copied, rows_inserted, watch_hits_inserted).
+    """
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS iocs_staging (type text, value text, context json, first_seen timestamp, last_seen timestamp, "
+        "ip inet, hash_bytes bytea, domain_rev text) ON COMMIT DELETE ROWS"
+    ))
+    stream = _CsvRowStream(rows, watch=current_watchlist(db))
+    cur = db.connection().connection.cursor()
+    try:
+        cur.copy_expert("COPY iocs_staging (type, value, context, first_seen, last_seen, ip, hash_bytes, domain_rev) FROM STDIN WITH (FORMAT csv)", stream)
+    finally:
+        cur.close()
+    if not stream.count:
+        return 0, 0, 0
+    # All rows share one item, so a repeat within the load (the same indicator under
+    # another ThreatFox id) must not count as a new sighting
+    res = db.execute(text("""
+        WITH src AS (
+            SELECT DISTINCT ON (type, value) type, value, context, ip, hash_bytes, domain_rev,
+                   coalesce(min(first_seen) OVER (PARTITION BY type, value), now() AT TIME ZONE 'utc') AS first_seen,
+                   coalesce(last_seen, now() AT TIME ZONE 'utc') AS last_seen
+              FROM iocs_staging ORDER BY type, value, last_seen DESC NULLS LAST
+        ), up AS (
+            INSERT INTO iocs AS i (item_id, type, value, context, first_seen, last_seen, sighting_count,
+                                   ip, hash_bytes, domain_rev)
+            SELECT :item_id, type, value, context, first_seen, last_seen, 1, ip, hash_bytes, domain_rev
+              FROM src ORDER BY type, value
+            ON CONFLICT ON CONSTRAINT iocs_type_value_unique DO UPDATE SET
+                context = CASE WHEN i.context->>'extracted' IS NOT NULL AND excluded.context->>'extracted' IS NULL
+                               THEN excluded.context ELSE i.context END,
+                first_seen = least(i.first_seen, excluded.first_seen),
+                last_seen = greatest(i.last_seen, excluded.last_seen),
+                sighting_count = i.sighting_count + CASE WHEN EXISTS (
+                    SELECT 1 FROM ioc_sightings s WHERE s.ioc_id = i.id AND s.item_id = excluded.item_id
+                ) THEN 0 ELSE 1 END
+            RETURNING i.id, i.type, i.value, (xmax = 0) AS inserted
+        ), sighted AS (
+            INSERT INTO ioc_sightings (ioc_id, item_id, source_id, seen_at)
+            SELECT up.id, :item_id, :source_id, src.last_seen FROM up JOIN src USING (type, value)
+            ON CONFLICT DO NOTHING
+        ),""" + COPY_ROLLUP_CTE + """
+        SELECT type, value FROM up WHERE inserted
+    """), {"item_id": item_id, "source_id": source_id})
+    new = res.all()
+    add_to_filter(db, new)
+    tags = context_tags(stream.label_contexts.values())
+    if tags:
+        write_labels(db, {item_id: (set(), tags)})
+    hits = record_matches(db, stream.watch_matches, item_id, source_id) if stream.watch_matches else 0
+    return stream.count, len(new), hits
@@ -0,0 +1,126 @@
+# Redis response/query cache, invalidated wholesale by a generation counter that ingest bumps.
+import asyncio, hashlib, json, time
+from typing import Any, Awaitable, Callable, Tuple
+import redis
+from .kv import get_async_redis, get_redis
+
+GEN_KEY = "cache:gen"
+PREFIX = "cache:v:"
+# Backstop only; a new generation is what normally retires entries
+TTL = 15 * 60
+# How long a recompute may hold the single-flight lock, and how long others wait on it
+LOCK_TTL = 30
+LOCK_WAIT = 5.0
+POLL = 0.025
+
+def generation() -> int:
+    try:
+        return int(get_redis().get(GEN_KEY) or 0)
+    except (redis.RedisError, ValueError):
+        return -1
+
+def bump_generation():
+    """Call after committing new data. Never raises: a failed bump only means stale pages until TTL."""
+    try:
+        get_redis().incr(GEN_KEY)
+    except redis.RedisError:
+        pass
+
+def etag_for(body: str) -> str:
+    return 'W/"' + hashlib.blake2b(body.encode(), digest_size=12).hexdigest() + '"'
+
+def _key(namespace: str, parts: Any, gen: int) -> str:
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{PREFIX}{namespace}:{gen}:{digest}"
+
+def cached(namespace: str, parts: Any, compute: Callable[[], str], ttl: int = TTL) -> str:
+    """
+    Return the cached string for (namespace, parts) in the current generation,
+    computing it at most once across processes on a miss.
+
+    Falls through to `compute()` whenever Redis is unavailable.
+    """
+    gen = generation()
+    if gen < 0:
+        return compute()
+    key = _key(namespace, parts, gen)
+    r = get_redis()
+    try:
+        hit = r.get(key)
+        if hit is not None:
+            return hit.decode()
+        if not r.set(key + ":lock", 1, nx=True, ex=LOCK_TTL):
+            # Someone else is recomputing: wait for their result rather than piling on the DB
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(POLL)
+                hit = r.get(key)
+                if hit is not None:
+                    return hit.decode()
+            return compute()
+    except redis.RedisError:
+        return compute()
+    try:
+        value = compute()
+        try:
+            r.set(key, value, ex=ttl)
+        except redis.RedisError:
+            pass
+        return value
+    finally:
+        try:
+            r.delete(key + ":lock")
+        except redis.RedisError:
+            pass
+
+def cached_json(namespace: str, parts: Any, compute: Callable[[], Any], ttl: int = TTL) -> Any:
+    return json.loads(cached(namespace, parts, lambda: json.dumps(compute(), default=str), ttl))
+
+def cached_page(namespace: str, parts: Any, compute: Callable[[], str], ttl: int = TTL) -> Tuple[str, str]:
+    """Rendered page plus its ETag."""
+    body = cached(namespace, parts, compute, ttl)
+    return body, etag_for(body)
+
+async def acached(namespace: str, parts: Any, compute: Callable[[], Awaitable[str]], ttl: int = TTL) -> str:
+    """`cached` for async handlers: same keys, lock and fallbacks, on redis.asyncio."""
+    r = get_async_redis()
+    try:
+        gen = int(await r.get(GEN_KEY) or 0)
+    except (redis.RedisError, ValueError):
+        return await compute()
+    key = _key(namespace, parts, gen)
+    try:
+        hit = await r.get(key)
+        if hit is not None:
+            return hit.decode()
+        if not await r.set(key + ":lock", 1, nx=True, ex=LOCK_TTL):
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(POLL)
+                hit = await r.get(key)
+                if hit is not None:
+                    return hit.decode()
+            return await compute()
+    except redis.RedisError:
+        return await compute()
+    try:
+        value = await compute()
+        try:
+            await r.set(key, value, ex=ttl)
+        except redis.RedisError:
+            pass
+        return value
+    finally:
+        try:
+            await r.delete(key + ":lock")
+        except redis.RedisError:
+            pass
+
+async def acached_json(namespace: str, parts: Any, compute: Callable[[], Awaitable[Any]], ttl: int = TTL) -> Any:
+    async def dumped():
+        return json.dumps(await compute(), default=str)
+    return json.loads(await acached(namespace, parts, dumped, ttl))
+
+async def acached_page(namespace: str, parts: Any, compute: Callable[[], Awaitable[str]], ttl: int = TTL) -> Tuple[str, str]:
+    body = await acached(namespace, parts, compute, ttl)
+    return body, etag_for(body)
@@ -1,3 +1,4 @@
+import os
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .settings import settings
@@ -9,10 +10,64 @@ def get_db_url():
     return (f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
             f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}")
 
-engine = create_engine(get_db_url(), pool_pre_ping=True)
+def _pool_args():
+    return dict(
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+
+engine = create_engine(get_db_url(), **_pool_args())
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+_async_sessionmaker = None
+
+def get_async_sessionmaker():
+    # Created on first use, so sync-only processes (workers) never import asyncpg
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        async_engine = create_async_engine(get_db_url().replace("postgresql://", "postgresql+asyncpg://", 1), **_pool_args())
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 def init_db():
-    # Tables are created via models import side-effect
-    from . import models  # noqa
-    Base.metadata.create_all(bind=engine)
+    # Schema is versioned with Alembic (api/migrations); bring it to head
+    from alembic import command
+    from alembic.config import Config
+    cfg = Config(os.path.join(API_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(API_DIR, "migrations"))
+    cfg.attributes["configure_logger"] = False  # keep uvicorn's logging config
+    command.upgrade(cfg, "head")
+
+def create_index_concurrently(op, ddl: str):
+    """
+    For migrations, inside `autocommit_block()`: run a `CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT
+    EXISTS <name> ...`, first dropping an INVALID index of that name. A failed concurrent build
+    leaves one behind, and IF NOT EXISTS would keep it: never used by queries, and for a unique
+    index never usable as an ON CONFLICT arbiter.
+    """
+    name = ddl.split(" IF NOT EXISTS ", 1)[1].split(" ", 1)[0]
+    if not op.get_context().as_sql:
+        invalid = op.get_bind().execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid) AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(ddl)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
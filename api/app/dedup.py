@@ -0,0 +1,87 @@
+# Near-duplicate items: the same canonical URL, or a SimHash of the text within MAX_DISTANCE
+# bits of a stored one. Candidates come from four band indexes on items.simhash, so a lookup
+# touches a few buckets rather than every stored signature. Duplicates are recorded as
+# item_aliases of the item they repeat instead of being inserted.
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+from .ingest.fingerprint import BANDS, MAX_DISTANCE, bands, distance, simhash
+from .models import Item, Source, simhash_band
+
+def _url_matches(db: Session, urls: List[str]) -> Dict[str, int]:
+    if not urls:
+        return {}
+    return dict(db.execute(
+        select(Item.canonical_url, func.min(Item.id)).where(Item.canonical_url.in_(urls)).group_by(Item.canonical_url)
+    ).all())
+
+def candidates_stmt(sigs: List[int]):
+    """(id, simhash) of stored items sharing at least one band with any of `sigs`: a BitmapOr of the band indexes."""
+    per_band = [sorted({bands(s)[i] for s in sigs}) for i in range(BANDS)]
+    return (select(Item.id, Item.simhash)
+            .where(Item.simhash.is_not(None))
+            .where(or_(*(simhash_band(Item.simhash, i).in_(vals) for i, vals in enumerate(per_band)))))
+
+def _candidates(db: Session, sigs: List[int]) -> List[Tuple[int, int]]:
+    return db.execute(candidates_stmt(sigs)).all() if sigs else []
+
+def _nearest(sig: int, pool: List[Tuple[Any, int]]) -> Optional[Tuple[Any, int]]:
+    best = None
+    for key, other in pool:
+        d = distance(sig, other)
+        if d <= MAX_DISTANCE and (best is None or d < best[1]):
+            best = (key, d)
+    return best
+
+def split_near_duplicates(db: Session, fresh: Dict[bytes, Dict[str, Any]]) -> Dict[bytes, Dict[str, Any]]:
+    """
+    Sort a batch of new items (hash -> normalized item) into items to store and aliases.
+
+    Sets `simhash` on every item. Returns {hash: alias} for the duplicates, each with
+    `item_id` (a stored item) or `item_hash` (an earlier item of this batch, id unknown
+    until it's inserted), plus `reason` and `distance`.
+    """
+    for n in fresh.values():
+        n["simhash"] = simhash(n.get("text"))
+    by_url = _url_matches(db, sorted({n["canonical_url"] for n in fresh.values() if n.get("canonical_url")}))
+    stored = [(("item_id", item_id), sig) for item_id, sig in _candidates(db, [n["simhash"] for n in fresh.values() if n["simhash"] is not None])]
+
+    aliases: Dict[bytes, Dict[str, Any]] = {}
+    batch_urls: Dict[str, bytes] = {}
+    batch_sigs: List[Tuple[Tuple[str, bytes], int]] = []
+    for h, n in fresh.items():
+        url, sig = n.get("canonical_url"), n["simhash"]
+        if url in by_url:
+            aliases[h] = {"item_id": by_url[url], "reason": "url", "distance": None}
+            continue
+        if url in batch_urls:
+            aliases[h] = {"item_hash": batch_urls[url], "reason": "url", "distance": None}
+            continue
+        hit = _nearest(sig, stored + batch_sigs) if sig is not None else None
+        if hit is not None:
+            (kind, target), d = hit
+            aliases[h] = {kind: target, "reason": "simhash", "distance": d}
+            continue
+        if url:
+            batch_urls[url] = h
+        if sig is not None:
+            batch_sigs.append((("item_hash", h), sig))
+    return aliases
+
+def backfill_simhash(db: Session, kinds=("rss",), batch: int = 1000) -> int:
+    """Sign stored items of `kinds` that predate SimHash, so new items can match them. Returns items signed."""
+    done, last_id = 0, 0
+    while True:
+        rows = db.execute(
+            select(Item.id, Item.text).join(Source, Source.id == Item.source_id)
+            .where(Source.kind.in_(kinds), Item.simhash.is_(None), Item.id > last_id)
+            .order_by(Item.id).limit(batch)
+        ).all()
+        if not rows:
+            return done
+        last_id = rows[-1][0]
+        values = [{"id": item_id, "simhash": sig} for item_id, text in rows if (sig := simhash(text)) is not None]
+        if values:
+            db.execute(update(Item), values)
+            done += len(values)
+        db.commit()
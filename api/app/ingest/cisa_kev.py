@@ -1,28 +1,45 @@
-import requests
+import ijson
+from . import http
+from .. import metrics
 from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional
 
 KEV_URL = "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json"
+# Entries per chunk handed to the upsert
+CHUNK_ITEMS = 500
 
-def fetch_cisa_kev(source):
-    r = requests.get(KEV_URL, timeout=60)
-    data = r.json()
-    out = []
-    for v in data.get("vulnerabilities", []):
-        title = f"{v.get('cveID')}: {v.get('vendorProject','')} {v.get('product','')}".strip()
-        text = f"{v.get('shortDescription','')}".strip()
-        url = v.get("cveURL") or "https://www.cisa.gov/known-exploited-vulnerabilities-catalog"
-        publ = v.get("dateAdded")
-        try:
-            published_at = datetime.fromisoformat(publ.replace("Z","+00:00")) if publ else None
-        except Exception:
-            published_at = None
-        out.append({
-            "canonical_url": url,
-            "title": title,
-            "published_at": published_at,
-            "author": "CISA",
-            "raw": v,
-            "text": text,
-            "summary_short": None
-        })
-    return out
+@metrics.timed_fetch("kev")
+def fetch_cisa_kev(source) -> Optional[Iterator[List[Dict[str, Any]]]]:
+    """
+    None means the catalog hasn't changed since the last successful poll. Otherwise the
+    body is spooled to a temp file and parsed incrementally as the caller iterates,
+    in chunks of up to CHUNK_ITEMS normalized entries.
+    """
+    fh = http.conditional_spool(source, getattr(source, "endpoint", None) or KEV_URL, timeout=(10, 60))
+    if fh is None:
+        return None
+    return _chunks(source, fh)
+
+def _chunks(source, fh: IO[bytes]) -> Iterator[List[Dict[str, Any]]]:
+    with fh:
+        entries = (_normalize(v) for v in ijson.items(fh, "vulnerabilities.item", use_float=True))
+        yield from metrics.timed_chunks(entries, CHUNK_ITEMS, "normalize", source)
+
+def _normalize(v: dict) -> dict:
+    title = f"{v.get('cveID')}: {v.get('vendorProject','')} {v.get('product','')}".strip()
+    text = f"{v.get('shortDescription','')}".strip()
+    url = v.get("cveURL") or "https://www.cisa.gov/known-exploited-vulnerabilities-catalog"
+    publ = v.get("dateAdded")
+    try:
+        published_at = datetime.fromisoformat(publ.replace("Z","+00:00")) if publ else None
+    except Exception:
+        published_at = None
+    return {
+        "canonical_url": url,
+        "title": title,
+        "published_at": published_at,
+        "author": "CISA",
+        "raw": v,
+        "text": text,
+        "summary_short": None
+    }
@@ -0,0 +1,153 @@
+# IOC extraction from report text: cheap candidate split -> refang -> one combined regex scan -> validation.
+import ipaddress, pathlib, re
+from itertools import chain
+from typing import Any, Dict, Iterable, List
+
+MAX_IOCS_PER_TEXT = 5000
+
+def _word_list(name: str) -> frozenset:
+    return frozenset(
+        line.strip() for line in (pathlib.Path(__file__).parent / "data" / name).read_text().splitlines()
+        if line.strip() and not line.startswith("#")
+    )
+
+TLDS = _word_list("tlds.txt")
+# Reference/vendor hosts a report links to; never reported as IOCs (subdomains included)
+BENIGN_DOMAINS = _word_list("benign_domains.txt")
+# A dotted quad right after one of these is a version number, not an address
+_VERSION_WORDS = frozenset({"v", "ver", "ver.", "version", "versions", "build", "release", "firmware", "update", "patch"})
+# Real TLDs that collide with file extensions / code; only trusted inside a URL
+AMBIGUOUS_TLDS = frozenset({"zip", "mov", "sh", "py", "pl", "md", "rs", "so", "ps", "cs", "do", "in", "it", "is", "me", "to", "am", "at", "as", "be", "no", "us"})
+
+_DEFANG = re.compile(
+    r"\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\)|\[:\]|\[://\]|\[/\]|\[at\]|\(at\)|\[@\]|\bhxxp(s?)|\bh\*\*p(s?)|\bfxp\b",
+    re.I,
+)
+
+def _refang_sub(m: re.Match) -> str:
+    tok = m.group(0).lower()
+    if tok in ("[.]", "(.)", "{.}", "[dot]", "(dot)"):
+        return "."
+    if tok == "[:]":
+        return ":"
+    if tok == "[://]":
+        return "://"
+    if tok == "[/]":
+        return "/"
+    if tok in ("[at]", "(at)", "[@]"):
+        return "@"
+    if tok == "fxp":
+        return "ftp"
+    return "http" + (m.group(1) or m.group(2) or "")
+
+def refang(text: str) -> str:
+    return _DEFANG.sub(_refang_sub, text)
+
+_OCTET = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+_LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+# Alternation order matters: the longest/most specific shape wins at each position
+_SCANNER = re.compile(
+    r"(?P<url>\b(?:https?|ftp)://[^\s<>\"'`|\\^{}\[\]]+)"
+    r"|(?P<email>\b[A-Za-z0-9._%+-]+@(?:" + _LABEL + r"\.)+[A-Za-z]{2,63}\b)"
+    r"|(?P<ip>(?<![\w.])" + _OCTET + r"(?:\." + _OCTET + r"){3}(?:/\d{1,2})?(?![\w.]*\d))"
+    r"|(?P<sha256>\b[A-Fa-f0-9]{64}\b)"
+    r"|(?P<sha1>\b[A-Fa-f0-9]{40}\b)"
+    r"|(?P<md5>\b[A-Fa-f0-9]{32}\b)"
+    r"|(?P<domain>(?<![\w.@-])(?:" + _LABEL + r"\.)+[A-Za-z]{2,63}\b(?![\w-]))"
+)
+_URL_TRAILING = ".,;:!?)'\""
+
+def _valid_domain(d: str, in_url: bool = False) -> bool:
+    tld = d.rsplit(".", 1)[-1]
+    if tld not in TLDS:
+        return False
+    return in_url or tld not in AMBIGUOUS_TLDS
+
+# First octets holding any non-public IPv4 range (private, CGNAT, loopback, link-local,
+# documentation, benchmarking, multicast, reserved); every other address is public, which
+# spares most addresses the slow walk in ipaddress' is_global
+_NON_GLOBAL_OCTETS = frozenset(o for n in ("0.0.0.0/8", "10.0.0.0/8", "100.64.0.0/10", "127.0.0.0/8",
+                                           "169.254.0.0/16", "172.16.0.0/12", "192.0.0.0/24", "192.0.2.0/24",
+                                           "192.168.0.0/16", "198.18.0.0/15", "198.51.100.0/24",
+                                           "203.0.113.0/24", "224.0.0.0/3")
+                               for net in [ipaddress.ip_network(n)]
+                               for o in range(int(net.network_address) >> 24, (int(net.broadcast_address) >> 24) + 1))
+
+def _ip(value: str) -> str | None:
+    # Public addresses only: private, loopback, link-local, CGNAT, documentation and reserved
+    # ranges are never indicators
+    try:
+        if "/" in value:
+            net = ipaddress.ip_network(value, strict=False)
+            if not net.is_global:
+                return None
+            return str(net) if net.prefixlen < 32 else str(net.network_address)
+        addr = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    if (int(addr) >> 24) in _NON_GLOBAL_OCTETS and (not addr.is_global or addr.is_multicast):
+        return None
+    # 1.2.3.4, 2.0.1.0: every octet a single digit reads as a version or placeholder
+    if all(len(o) == 1 for o in value.split(".")):
+        return None
+    return str(addr)
+
+def _under(host: str, domains: Iterable[str]) -> bool:
+    labels = host.split(".")
+    return any(".".join(labels[i:]) in domains for i in range(len(labels) - 1))
+
+def _host(url: str) -> str:
+    return url.split("://", 1)[-1].split("/", 1)[0].split("?", 1)[0].rsplit("@", 1)[-1].split(":", 1)[0].lower()
+
+def extract_iocs(text: str, limit: int = MAX_IOCS_PER_TEXT, source_url: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Pull typed IOCs out of free text, in the `IOC.type` vocabulary
+    (ip/domain/url/sha256/sha1/md5/email). CIDRs are kept as `ip` values. Hosts in
+    BENIGN_DOMAINS and the host of `source_url` (the report itself) are left out.
+    """
+    if not text:
+        return []
+    skip = BENIGN_DOMAINS
+    own = _host(source_url) if source_url else ""
+    if own:
+        skip = skip | {own[4:] if own.startswith("www.") else own}
+    # Every IOC shape contains '.', '@' or a defang bracket, or is a long hex run. Filtering
+    # whitespace-separated tokens on that (C-speed str ops) leaves a few % of a typical report
+    # for the regex scan, which is what keeps multi-MB reports fast.
+    toks = text.split()
+    cands = [tok for prev, tok in zip(chain(("",), toks), toks)
+             if ("." in tok or "@" in tok or "[" in tok or len(tok) >= 32)
+             and not (tok[0].isdigit() and prev.lower().rstrip(":") in _VERSION_WORDS)]
+    text = refang("\n".join(cands))
+    out: List[Dict[str, Any]] = []
+    seen: set[tuple] = set()
+    for m in _SCANNER.finditer(text):
+        kind = m.lastgroup
+        value = m.group(0)
+        if kind == "url":
+            value = value.rstrip(_URL_TRAILING)
+            host = _host(value)
+            if not ((host[:1].isdigit() and _ip(host)) or _valid_domain(host, in_url=True)) or _under(host, skip):
+                continue
+        elif kind == "ip":
+            value = _ip(value)
+            if not value:
+                continue
+        elif kind == "domain":
+            value = value.lower()
+            if not _valid_domain(value) or _under(value, skip):
+                continue
+        elif kind == "email":
+            value = value.lower()
+            if not _valid_domain(value.rsplit("@", 1)[1], in_url=True):
+                continue
+        else:
+            value = value.lower()
+        key = (kind, value)
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append({"type": kind, "value": value, "context": {"extracted": True}})
+        if len(out) >= limit:
+            break
+    return out
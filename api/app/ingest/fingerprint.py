@@ -0,0 +1,81 @@
+# Item fingerprints for dedup: canonical URLs and 64-bit SimHash signatures of item text.
+import hashlib, re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the click, never select content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid", "twclid", "li_fat_id",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "__hstc", "__hssc", "__hsfp", "hsctatracking",
+    "mkt_tok", "oly_anon_id", "oly_enc_id", "vero_id", "wickedid", "ref_src", "ref_url",
+    "cmpid", "ncid", "sr_share",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "at_")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# Words per shingle, and the fewest shingles a text needs before its signature means anything;
+# short texts (advisory one-liners, templated summaries) differ in too few shingles to tell apart
+SHINGLE = 3
+MIN_SHINGLES = 64
+# Near-duplicate: at most this many of the 64 bits differ. With 4 bands of 16 bits, two
+# signatures that close share at least one whole band, which is what the band indexes look up.
+MAX_DISTANCE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+_WORD = re.compile(r"\w+")
+
+def _tracking(key: str) -> bool:
+    k = key.lower()
+    return k in TRACKING_PARAMS or k.startswith(TRACKING_PREFIXES)
+
+def canonical_url(url: Optional[str]) -> Optional[str]:
+    """
+    Lower-case scheme and host, drop default ports, fragments and tracking parameters,
+    and sort what is left of the query. Anything that doesn't parse as http(s) is returned as is.
+    """
+    if not url:
+        return url
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+    host = parts.hostname.rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and str(port) != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    if parts.username:
+        host = f"{parts.username}{':' + parts.password if parts.password else ''}@{host}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _tracking(k))
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+def simhash(text: Optional[str]) -> Optional[int]:
+    """
+    64-bit SimHash over word shingles, as a signed int so it fits a BIGINT column.
+    None for texts too short to compare.
+    """
+    words = _WORD.findall((text or "").lower())
+    if len(words) < SHINGLE + MIN_SHINGLES - 1:
+        return None
+    hashes = {hashlib.blake2b(" ".join(words[i:i + SHINGLE]).encode(), digest_size=8).digest()
+              for i in range(len(words) - SHINGLE + 1)}
+    # Per-bit vote: transposing the bit strings lets str.count do the tallying
+    bits = [format(int.from_bytes(h, "big"), "064b") for h in hashes]
+    half = len(bits) / 2
+    sig = 0
+    for column in zip(*bits):
+        sig = (sig << 1) | ("".join(column).count("1") > half)
+    return sig - (1 << 64) if sig >= 1 << 63 else sig
+
+def bands(sig: int) -> tuple[int, ...]:
+    """The 16-bit bands of a signature, most significant first (matches the ix_items_simhash_b* indexes)."""
+    return tuple((sig >> (BAND_BITS * (BANDS - 1 - i))) & 0xFFFF for i in range(BANDS))
+
+def distance(a: int, b: int) -> int:
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
@@ -0,0 +1,110 @@
+# HTML -> text normalization stage for feed entries: lxml fast path, process pool, per-entry cache.
+import hashlib, multiprocessing, os, threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+import redis
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from ..kv import get_redis
+
+CACHE_PREFIX = "rss:text:"
+CACHE_TTL = 14 * 24 * 3600
+# Below this much HTML per call, IPC costs more than parsing inline
+POOL_MIN_BYTES = 256 * 1024
+BATCH_SIZE = 16
+POOL_WORKERS = int(os.environ.get("HTML_POOL_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_broken = False
+# First use comes from fetch_many's threads: one pool per process, never two
+_pool_lock = threading.Lock()
+
+def _lxml_text(html: str) -> str:
+    root = lxml_html.fragment_fromstring(html, create_parent="div")
+    # Same output as BeautifulSoup's get_text("\n"): no script/style/comments, strings joined by newlines
+    etree.strip_elements(root, "script", "style", "template", etree.Comment, etree.ProcessingInstruction, with_tail=False)
+    return "\n".join(t for t in root.itertext() if t)
+
+def html_to_text(html: str) -> str:
+    if not html:
+        return ""
+    try:
+        return _lxml_text(html)
+    except (etree.ParserError, ValueError):
+        # Odd markup lxml's fragment parser rejects; BeautifulSoup is slower but forgiving
+        return BeautifulSoup(html, "lxml").get_text("\n")
+
+def _convert_batch(htmls: List[str]) -> List[str]:
+    return [html_to_text(h) for h in htmls]
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_broken
+    with _pool_lock:
+        if _pool is None and not _pool_broken:
+            try:
+                # Not fork: the caller has live fetch threads (and their locks) that a forked
+                # child would inherit mid-flight. Forkserver children start from a clean process.
+                _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS,
+                                            mp_context=multiprocessing.get_context("forkserver"))
+            except (AssertionError, OSError, ValueError):
+                # e.g. daemonic worker processes may not have children; parse inline instead
+                _pool_broken = True
+        return _pool
+
+def _cache_key(guid: str, html: str) -> str:
+    # Keyed on content too, so an edited post under the same GUID is re-parsed
+    g = hashlib.sha1((guid or "").encode()).hexdigest()
+    h = hashlib.blake2b(html.encode(), digest_size=16).hexdigest()
+    return f"{CACHE_PREFIX}{g}:{h}"
+
+def convert_many(htmls: List[str]) -> List[str]:
+    """Convert a list of HTML strings, fanning out to the process pool for big inputs."""
+    global _pool, _pool_broken
+    if sum(len(h) for h in htmls) < POOL_MIN_BYTES or len(htmls) < 2:
+        return _convert_batch(htmls)
+    pool = _get_pool()
+    if pool is None:
+        return _convert_batch(htmls)
+    batches = [htmls[i:i + BATCH_SIZE] for i in range(0, len(htmls), BATCH_SIZE)]
+    try:
+        return [t for part in pool.map(_convert_batch, batches) for t in part]
+    except Exception:
+        # A dead pool (OOM-killed child etc.) shouldn't lose the tick
+        with _pool_lock:
+            _pool, _pool_broken = None, True
+        return _convert_batch(htmls)
+
+def extract_texts(items: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fill `text` for entries carrying `html` (and `guid`), as produced by `fetch_rss`.
+
+    Entries whose GUID and HTML are unchanged since last time come from the Redis cache.
+    """
+    if not items:
+        return items
+    todo = [n for n in items if "html" in n]
+    keys = [_cache_key(n.get("guid") or n.get("canonical_url") or "", n["html"] or "") for n in todo]
+    try:
+        cached = get_redis().mget(keys) if keys else []
+    except redis.RedisError:
+        cached = [None] * len(keys)
+
+    miss = [i for i, c in enumerate(cached) if c is None]
+    for i, c in enumerate(cached):
+        if c is not None:
+            todo[i]["text"] = c.decode()
+    if miss:
+        texts = convert_many([todo[i]["html"] or "" for i in miss])
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for i, t in zip(miss, texts):
+                todo[i]["text"] = t
+                pipe.set(keys[i], t, ex=CACHE_TTL)
+            pipe.execute()
+        except redis.RedisError:
+            for i, t in zip(miss, texts):
+                todo[i]["text"] = t
+    for n in todo:
+        n.pop("html", None)
+        n.pop("guid", None)
+    return items
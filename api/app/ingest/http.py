@@ -0,0 +1,190 @@
+# Shared HTTP layer for ingestors: one pooled keep-alive session, retries, concurrent fan-out.
+import hashlib, tempfile, threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .. import metrics
+
+USER_AGENT = "threat-intel-portal/0.1"
+# (connect, read) seconds; callers pass their own read timeout for slow endpoints
+DEFAULT_TIMEOUT = (10, 30)
+# Enough threads that a tick of a few hundred feeds is bounded by the slowest one, not the sum
+MAX_WORKERS = 64
+PER_HOST = 4
+# Spooled response bodies stay in memory up to this size, then move to a temp file
+SPOOL_MEMORY = 4 << 20
+SPOOL_READ = 1 << 16
+
+def _make_session() -> requests.Session:
+    s = requests.Session()
+    # Retry budget per request: connection errors and 429/5xx, honoring Retry-After
+    retry = Retry(
+        total=2,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,  # feed POSTs (ThreatFox queries) are read-only, so retry them too
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=64, pool_maxsize=MAX_WORKERS, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers["User-Agent"] = USER_AGENT
+    return s
+
+session = _make_session()
+
+def get(url: str, **kw) -> requests.Response:
+    kw.setdefault("timeout", DEFAULT_TIMEOUT)
+    return session.get(url, **kw)
+
+def post(url: str, **kw) -> requests.Response:
+    kw.setdefault("timeout", DEFAULT_TIMEOUT)
+    return session.post(url, **kw)
+
+def body_unchanged(source, body: bytes) -> bool:
+    """True when `body` matches the source's last processed body; otherwise records the new hash."""
+    return digest_unchanged(source, hashlib.sha256(body).digest())
+
+def digest_unchanged(source, digest: bytes) -> bool:
+    """`body_unchanged` for a sha256 the caller computed, e.g. while spooling."""
+    prev = getattr(source, "content_hash", None)
+    if prev is not None and bytes(prev) == digest:
+        return True
+    source.content_hash = digest
+    return False
+
+def spool(r: requests.Response, source=None) -> Tuple[IO[bytes], bytes]:
+    """
+    Copy a `stream=True` response body into a spooled temp file, hashing it on the way.
+    Returns the file rewound to the start, and the body's sha256. The caller closes the file.
+    """
+    fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+    h = hashlib.sha256()
+    n = 0
+    try:
+        for block in r.iter_content(SPOOL_READ):
+            h.update(block)
+            fh.write(block)
+            n += len(block)
+    except BaseException:
+        fh.close()
+        raise
+    finally:
+        r.close()
+    if source is not None:
+        metrics.record_bytes(source, n)
+    fh.seek(0)
+    return fh, h.digest()
+
+def conditional_get(source, url: Optional[str] = None, **kw) -> Optional[requests.Response]:
+    """
+    GET with the validators stored on `source` (ETag / Last-Modified).
+
+    Returns None when there is nothing new: a 304, or a 200 whose body hashes the same
+    as last time (servers that ignore conditional headers). Otherwise the new validators
+    and content hash are written onto `source`; the caller persists them once the
+    body has been ingested.
+    """
+    r = _conditional(source, url, **kw)
+    if r is None:
+        return None
+    metrics.record_bytes(source, len(r.content))
+    if body_unchanged(source, r.content):
+        return None
+    return r
+
+def conditional_spool(source, url: Optional[str] = None, **kw) -> Optional[IO[bytes]]:
+    """
+    `conditional_get` for large bodies: the body is streamed into a spooled temp file
+    (see `spool`) and never held in memory whole. Returns that file, or None when
+    there is nothing new. The caller closes the file.
+    """
+    r = _conditional(source, url, stream=True, **kw)
+    if r is None:
+        return None
+    fh, digest = spool(r, source)
+    if digest_unchanged(source, digest):
+        fh.close()
+        return None
+    return fh
+
+def _conditional(source, url: Optional[str], **kw) -> Optional[requests.Response]:
+    headers = dict(kw.pop("headers", None) or {})
+    if getattr(source, "last_etag", None):
+        headers["If-None-Match"] = source.last_etag
+    if getattr(source, "last_modified", None):
+        headers["If-Modified-Since"] = format_datetime(source.last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    r = get(url or source.endpoint, headers=headers, **kw)
+    if r.status_code == 304:
+        r.close()
+        return None
+    r.raise_for_status()
+    source.last_etag = r.headers.get("ETag")
+    source.last_modified = _parse_http_date(r.headers.get("Last-Modified"))
+    return r
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        # Stored naive UTC, like the rest of the TIMESTAMP columns
+        return parsedate_to_datetime(value).astimezone(timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+_host_limits: dict[str, threading.BoundedSemaphore] = {}
+_host_limits_lock = threading.Lock()
+
+def _host_limit(url: str, per_host: int) -> threading.BoundedSemaphore:
+    host = urlsplit(url or "").netloc.lower()
+    with _host_limits_lock:
+        sem = _host_limits.get(host)
+        if sem is None:
+            sem = _host_limits[host] = threading.BoundedSemaphore(per_host)
+        return sem
+
+def fetch_many(
+    sources: Iterable[Any],
+    fn: Callable[[Any], Any],
+    max_workers: int = MAX_WORKERS,
+    per_host: int = PER_HOST,
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """
+    Run `fn(source)` for every source on a thread pool and yield
+    `(source, result, error)` as each one completes.
+
+    - At most `per_host` fetches hit the same host at once (keyed on `source.endpoint`).
+    - `deadline` (seconds) bounds the whole fan-out; stragglers are reported as TimeoutError.
+    - `fn` must not touch a DB session: hand it plain snapshots, persist results in the caller.
+    """
+    sources = list(sources)
+    if not sources:
+        return
+
+    def run(src):
+        with _host_limit(getattr(src, "endpoint", ""), per_host):
+            return fn(src)
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(sources)), thread_name_prefix="fetch")
+    futures = {pool.submit(run, s): s for s in sources}
+    try:
+        for fut in as_completed(futures, timeout=deadline):
+            src = futures[fut]
+            try:
+                yield src, fut.result(), None
+            except Exception as e:
+                yield src, None, e
+    except FuturesTimeout:
+        for fut, src in futures.items():
+            if not fut.done():
+                fut.cancel()
+                yield src, None, TimeoutError(f"fetch exceeded {deadline}s deadline")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,85 @@
+# Shared IOC normalization: feed type names -> IOC.type, canonical values, typed lookup columns.
+import ipaddress
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+HASH_HEX_LEN = {"md5": 32, "sha1": 40, "sha256": 64}
+
+_TYPES = {
+    "url": "url",
+    "domain": "domain", "fqdn": "domain", "hostname": "domain",
+    "ip": "ip", "ip:port": "ip", "ipv4": "ip", "ipv6": "ip",
+    "sha256": "sha256", "sha256_hash": "sha256", "filehash-sha256": "sha256",
+    "sha1": "sha1", "sha1_hash": "sha1", "filehash-sha1": "sha1",
+    "md5": "md5", "md5_hash": "md5", "filehash-md5": "md5",
+    "email": "email", "envelope_from": "email",
+}
+
+def map_type(t: Optional[str]) -> str:
+    """Map a feed's indicator type (ThreatFox, OTX style) to our IOC types."""
+    return _TYPES.get((t or "").strip().lower(), "other")
+
+def _split_port(value: str) -> Tuple[str, Optional[str]]:
+    # "1.2.3.4:443", "[2001:db8::1]:443"; a bare IPv6 address has colons but no port
+    if value.startswith("["):
+        host, _, rest = value[1:].partition("]")
+        return host, rest[1:] if rest.startswith(":") and rest[1:].isdigit() else None
+    if value.count(":") == 1:
+        host, port = value.rsplit(":", 1)
+        if port.isdigit():
+            return host, port
+    return value, None
+
+def normalize(raw_type: Optional[str], raw_value: Optional[str]) -> Tuple[str, str, Optional[str]]:
+    """Returns (type, value, port). Ports are stripped from IPs; domains, hashes and emails are lowercased."""
+    t = map_type(raw_type)
+    value = (raw_value or "").strip()
+    port = None
+    if t == "ip":
+        value, port = _split_port(value)
+    elif t in ("domain", "email") or t in HASH_HEX_LEN:
+        value = value.lower()
+    if t == "domain":
+        value = value.rstrip(".")
+    return t, value, port
+
+def reverse_domain(domain: str) -> str:
+    """Labels reversed with a trailing dot (mail.example.com -> com.example.mail.), so subdomains share a prefix."""
+    labels = domain.strip().strip(".").lower().split(".")
+    return ".".join(reversed(labels)) + "."
+
+def _host(url: str) -> Optional[str]:
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+def typed_columns(t: str, value: str) -> Dict[str, Any]:
+    """
+    `IOC.ip` / `hash_bytes` / `domain_rev` for a normalized (type, value).
+
+    Values that don't parse for their type get NULLs, never an error: the text
+    `value` stays the record of what the feed said.
+    """
+    out: Dict[str, Any] = {"ip": None, "hash_bytes": None, "domain_rev": None}
+    if t == "ip":
+        try:
+            out["ip"] = str(ipaddress.ip_interface(value)) if "/" in value else str(ipaddress.ip_address(value))
+        except ValueError:
+            pass
+    elif t in HASH_HEX_LEN:
+        if len(value) == HASH_HEX_LEN[t]:
+            try:
+                out["hash_bytes"] = bytes.fromhex(value)
+            except ValueError:
+                pass
+    elif t == "domain":
+        out["domain_rev"] = reverse_domain(value) if value else None
+    elif t == "url":
+        host = _host(value)
+        if host:
+            try:
+                out["ip"] = str(ipaddress.ip_address(host))
+            except ValueError:
+                out["domain_rev"] = reverse_domain(host)
+    return out
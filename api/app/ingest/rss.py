@@ -1,21 +1,18 @@
-import requests, feedparser
-from bs4 import BeautifulSoup
+import feedparser
+from . import http
+from .. import metrics
 from datetime import datetime
 from email.utils import parsedate_to_datetime
 
+@metrics.timed_fetch("rss")
 def fetch_rss(source):
-    headers = {}
-    if source.last_etag:
-        headers["If-None-Match"] = source.last_etag
-    r = requests.get(source.endpoint, timeout=30, headers=headers)
-    if r.status_code == 304:
-        return []
-    try:
-        etag = r.headers.get("ETag")
-    except Exception:
-        etag = None
+    # None means unchanged since the last successful poll (304 or identical body)
+    r = http.conditional_get(source, timeout=(10, 30))
+    if r is None:
+        return None
 
-    feed = feedparser.parse(r.content)
+    with metrics.stage("parse", source):
+        feed = feedparser.parse(r.content)
     out = []
     for e in feed.entries:
         url = e.get("link")
@@ -29,14 +26,16 @@ def fetch_rss(source):
         for c in e.get("content", []):
             if isinstance(c, dict) and "value" in c:
                 html = c["value"]
-        text = BeautifulSoup(html, "lxml").get_text("\n")
         out.append({
             "canonical_url": url,
             "title": title,
             "published_at": published_at,
             "author": e.get("author"),
             "raw": {"entry": e},
-            "text": text,
+            # Filled in by the html_text stage (see extract_texts)
+            "text": None,
+            "html": html,
+            "guid": e.get("id") or url,
             "summary_short": None
         })
     return out
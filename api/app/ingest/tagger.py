@@ -0,0 +1,115 @@
+# ATT&CK technique and tag matching for item text: one combined regex over the bundled vocabulary.
+import json, pathlib, re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+VOCABULARY = pathlib.Path(__file__).parent / "data" / "attack.json"
+# Characters scanned per item text; bounds the worst case, well past any real report
+MAX_SCAN_CHARS = 8_000_000
+MAX_TAG_LEN = 64
+
+TECHNIQUE_ID = re.compile(r"T\d{4}(?:\.\d{3})?", re.I)
+_SEP = re.compile(r"[\s_-]+")
+
+def phrase_key(s: str) -> str:
+    """Lower-case, with runs of whitespace, '-' and '_' folded to one space."""
+    return _SEP.sub(" ", s.strip().lower())
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    # Prefix-tree alternation: at each position the regex engine follows one branch per
+    # character instead of retrying every phrase, which is what keeps a few hundred
+    # phrases as cheap to scan for as a handful
+    root: Dict[str, Any] = {}
+    for p in phrases:
+        node = root
+        for ch in p:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        alts = [(r"[\s_-]+" if ch == " " else re.escape(ch)) + emit(child)
+                for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(root)
+
+@lru_cache(maxsize=1)
+def vocabulary() -> Tuple[Dict[str, Dict[str, str]], Dict[str, List[Tuple[str, str]]], "re.Pattern[str]"]:
+    """
+    Bundled vocabulary, compiled once per process:
+    ({attack_id: {name, tactic}}, {phrase key: [("technique", attack_id) | ("tag", name)]}, scanner).
+    """
+    data = json.loads(VOCABULARY.read_text())
+    techniques = {t["id"]: {"name": t["name"], "tactic": t["tactic"]} for t in data["techniques"]}
+    phrases: Dict[str, List[Tuple[str, str]]] = {}
+    for t in data["techniques"]:
+        for p in t.get("match", [t["name"]]):
+            phrases.setdefault(phrase_key(p), []).append(("technique", t["id"]))
+    for name, ps in data["tags"].items():
+        for p in ps:
+            phrases.setdefault(phrase_key(p), []).append(("tag", name))
+    scanner = re.compile(
+        r"(?<!\w)(?:(?P<tid>" + TECHNIQUE_ID.pattern + r")|(?P<phrase>" + _trie_pattern(phrases) + r"))(?!\w)",
+        re.I,
+    )
+    return techniques, phrases, scanner
+
+def match_text(text: Optional[str]) -> Tuple[Set[str], Set[str]]:
+    """ATT&CK ids and tag names mentioned in `text`. Explicit ids count only if they are in the vocabulary."""
+    techniques, phrases, scanner = vocabulary()
+    found_t: Set[str] = set()
+    found_tags: Set[str] = set()
+    if not text:
+        return found_t, found_tags
+    seen: Set[str] = set()
+    for m in scanner.finditer(text, 0, MAX_SCAN_CHARS):
+        tid = m.group("tid")
+        if tid:
+            tid = tid.upper()
+            if tid in techniques:
+                found_t.add(tid)
+            continue
+        key = m.group("phrase").lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        for kind, value in phrases.get(phrase_key(key), ()):
+            (found_t if kind == "technique" else found_tags).add(value)
+    return found_t, found_tags
+
+def tag_name(raw: Any) -> Optional[str]:
+    """
+    Tag for a feed-supplied label (ThreatFox `tags`, malware names): the vocabulary tag
+    whose phrase it equals, else its own slug.
+    """
+    if not isinstance(raw, str):
+        return None
+    key = phrase_key(raw)
+    if not key or len(key) > MAX_TAG_LEN:
+        return None
+    for kind, value in vocabulary()[1].get(key, ()):
+        if kind == "tag":
+            return value
+    return key.replace(" ", "-")
+
+@lru_cache(maxsize=1)
+def _known_tags() -> frozenset:
+    return frozenset(v for labels in vocabulary()[1].values() for k, v in labels if k == "tag")
+
+def context_tags(contexts: Iterable[Optional[Dict[str, Any]]]) -> Set[str]:
+    """Tags carried in IOC contexts: ThreatFox `tags`, plus `malware_printable` when it names a known family."""
+    known = _known_tags()
+    out: Set[str] = set()
+    for ctx in contexts:
+        ctx = ctx or {}
+        tags = ctx.get("tags") or ()
+        for raw in [tags] if isinstance(tags, str) else tags:
+            if (name := tag_name(raw)) is not None:
+                out.add(name)
+        family = tag_name(ctx.get("malware_printable"))
+        if family in known:
+            out.add(family)
+    return out
@@ -1,28 +1,16 @@
-import requests
+import hashlib
+import ijson
+from . import http
+from .. import metrics
+from .ioc_norm import normalize
+from .threatfox_export import iter_recent_export
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple, Optional
+from typing import IO, Any, Dict, Iterable, Iterator, List, Tuple, Optional
 
 # Per ThreatFox docs, use the -api host with /v1/
 API = "https://threatfox-api.abuse.ch/api/v1/"
-
-# Map ThreatFox indicator types to our IOC types
-def _map_type(t: str) -> str:
-    t = (t or "").lower()
-    if t in ("url",):
-        return "url"
-    if t in ("domain", "fqdn"):
-        return "domain"
-    if t in ("sha256", "filehash-sha256"):
-        return "sha256"
-    if t in ("sha1", "filehash-sha1"):
-        return "sha1"
-    if t in ("md5", "filehash-md5"):
-        return "md5"
-    if t in ("ip", "ip:port", "ipv4", "ipv6"):
-        return "ip"
-    if t in ("email",):
-        return "email"
-    return "other"
+# IOCs per batch item handed to the upsert; bounds what a poll holds in memory at once
+CHUNK_IOCS = 5000
 
 def _parse_dt(s: Optional[str]) -> Optional[datetime]:
     if not s:
@@ -40,25 +28,13 @@ def _parse_dt(s: Optional[str]) -> Optional[datetime]:
         return None
 
 def _normalize_ioc(d: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
-    ioc_type = _map_type(d.get("ioc_type"))
-    raw_val = (d.get("ioc") or "").strip()
-    if not raw_val:
+    ioc_type, value, port = normalize(d.get("ioc_type"), d.get("ioc"))
+    if not value:
         return "other", "", {}
 
     ctx: Dict[str, Any] = {}
-
-    # Extract IP:port if present
-    value = raw_val
-    if d.get("ioc_type", "").lower() in ("ip:port",):
-        if ":" in raw_val:
-            ip, port = raw_val.rsplit(":", 1)
-            if ip:
-                value = ip
-                ctx["port"] = port
-
-    # Normalize domain to lowercase
-    if ioc_type == "domain":
-        value = value.lower()
+    if port:
+        ctx["port"] = port
 
     # Collect as much context as available
     ctx.update({
@@ -78,14 +54,37 @@ def _normalize_ioc(d: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
 
     return ioc_type, value, ctx
 
-def fetch_threatfox(source, days: int = 1) -> List[Dict[str, Any]]:
+def _ioc_id(d: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(d.get("id") or d.get("ioc_id"))
+    except (TypeError, ValueError):
+        return None
+
+def _cursor(source) -> Optional[int]:
+    try:
+        return int(getattr(source, "sync_cursor", None))
+    except (TypeError, ValueError):
+        return None
+
+@metrics.timed_fetch("threatfox")
+def fetch_threatfox(source, days: int = 1) -> Optional[Iterable[List[Dict[str, Any]]]]:
     """
     Fetch recent IOCs from ThreatFox using API key when provided.
 
-    - Uses incremental fetching when `source.last_etag` contains the last IOC ID.
-    - Falls back to time-window fetch via `days`.
-    - Returns a single 'batch' item with an `iocs` array; returns [] if no IOCs.
+    - Delta mode when `source.sync_cursor` holds the highest IOC id already ingested:
+      polls a 1-day window and drops everything at or below the cursor before normalizing.
+      If the window no longer reaches back to the cursor, catches up from the 48h export.
+    - Without a cursor, fetches the `days` window.
+    - The response is spooled to a temp file and parsed incrementally as the caller
+      iterates; each chunk is a list holding one 'batch' item of up to CHUNK_IOCS IOCs.
+    - Advances `source.sync_cursor` once the chunks are exhausted; the caller persists
+      it after ingesting.
+    - Raises on a network/HTTP error or a refused query; returns None if the response is
+      byte-identical to the last one processed.
     """
+    cursor = _cursor(source)
+    if cursor is not None:
+        days = 1
     auth_key = None
     try:
         auth_key = getattr(source, "auth_secret", None) or None
@@ -107,78 +106,138 @@ def fetch_threatfox(source, days: int = 1) -> List[Dict[str, Any]]:
     if auth_key:
         query["auth_key"] = auth_key
 
+    url = getattr(source, "endpoint", None) or API
+    # Network/HTTP errors and a refused query propagate, so the scheduler records a failure
+    # (and backs off as for one) instead of an empty poll
+    fh, digest = _post(url, query, headers, source)
+
+    # Ensure query succeeded according to API contract; fallback to no-auth if needed
+    if not _query_ok(fh):
+        fh.close()
+        if not auth_key:
+            raise ValueError("ThreatFox get_iocs: query_status nok or not a JSON object")
+        q2 = {"query": "get_iocs", "days": days}
+        fh, digest = _post(url, q2, {k: v for k, v in headers.items() if k.lower() != "auth-key"}, source)
+        if not _query_ok(fh):
+            fh.close()
+            raise ValueError("ThreatFox get_iocs: query_status nok, with and without the auth key")
+
+    # POST API, so no conditional headers; an identical response body means nothing new
+    if http.digest_unchanged(source, digest):
+        fh.close()
+        return None
+    return _batches(source, fh, cursor, days, query["query"])
+
+def _post(url: str, query: Dict[str, Any], headers: Dict[str, str], source) -> Tuple[IO[bytes], bytes]:
+    r = http.post(url, json=query, timeout=(10, 60), headers=headers, stream=True)
     try:
-        r = requests.post(API, json=query, timeout=60, headers=headers)
         r.raise_for_status()
-        js = r.json()
     except Exception:
-        # Avoid crashing the worker on transient/network issues
-        return []
+        r.close()
+        raise
+    return http.spool(r, source)
 
-    # Ensure query succeeded according to API contract; fallback to no-auth if needed
-    if not isinstance(js, dict) or js.get("query_status") == "nok":
-        if auth_key:
-            try:
-                q2 = {"query": "get_iocs", "days": days}
-                r2 = requests.post(API, json=q2, timeout=60, headers={k:v for k,v in headers.items() if k.lower() != "auth-key"})
-                r2.raise_for_status()
-                js = r2.json()
-            except Exception:
-                return []
-            if not isinstance(js, dict) or js.get("query_status") == "nok":
-                return []
-        else:
-            return []
-
-    data = js.get("data", []) or []
-    if not data:
-        return []
-
-    iocs: List[Dict[str, Any]] = []
-    seen: set[Tuple[str, str]] = set()
-    last_times: List[datetime] = []
-
-    for d in data:
-        t, v, ctx = _normalize_ioc(d)
-        if not v:
-            continue
-        key = (t, v)
-        if key in seen:
-            continue
-        seen.add(key)
-        # Track last_seen for published time
-        ls = _parse_dt(ctx.get("last_seen")) if ctx.get("last_seen") else None
-        if ls:
-            last_times.append(ls)
-        iocs.append({"type": t, "value": v, "context": ctx})
-
-    if not iocs:
-        return []
-
-    # Determine a meaningful published_at for the batch
+def _query_ok(fh: IO[bytes]) -> bool:
+    # A JSON object whose query_status isn't "nok"; reads only up to query_status
+    # (ThreatFox sends it ahead of `data`), then rewinds
+    try:
+        events = ijson.parse(fh)
+        if next(events, (None, None, None))[1] != "start_map":
+            return False
+        for prefix, event, value in events:
+            if prefix == "query_status" and event == "string":
+                return value != "nok"
+        return True
+    except ijson.JSONError:
+        return False
+    finally:
+        fh.seek(0)
+
+def _seen_key(t: str, v: str) -> int:
+    # 8-byte digest instead of the (type, value) strings: the dedup set is what a poll
+    # keeps for every IOC, so it should stay small
+    return int.from_bytes(hashlib.blake2b(f"{t}\0{v}".encode(), digest_size=8).digest(), "big")
+
+def _batch_item(rows: List[Tuple[Optional[int], Dict[str, Any]]], part: int, days: int,
+                meta: Dict[str, Any]) -> Dict[str, Any]:
+    ids = [i for i, _ in rows if i is not None]
+    iocs = [ioc for _, ioc in rows]
+    # Latest last_seen in the chunk is its published time
+    last_times = [ls for ioc in iocs if (ls := _parse_dt(ioc["context"].get("last_seen")))]
     published_at = max(last_times) if last_times else datetime.now(timezone.utc)
-
-    # Title reflects recent window
-    title_parts = [
-        "ThreatFox",
-        f"last {days} day(s)",
-        f"({len(iocs)} IOCs)",
-    ]
-    title = " ".join([p for p in title_parts if p])
-
-    raw_meta = {
-        "count": len(iocs),
-        "query": query.get("query"),
-        "window_days": days,
-    }
-
-    return [{
+    # Title reflects the id range (delta) or the recent window, and it keys item dedup: rows
+    # without ids get a digest of their IOCs, so a later poll's chunk never collides with this one
+    if ids:
+        span = f"IOC #{min(ids)}–#{max(ids)}"
+    else:
+        digest = hashlib.blake2b(b"".join(_seen_key(i["type"], i["value"]).to_bytes(8, "big") for i in iocs),
+                                 digest_size=6).hexdigest()
+        span = f"last {days} day(s), part {part}, batch {digest}"
+    title_parts = ["ThreatFox", span, f"({len(iocs)} IOCs)"]
+    return {
         "canonical_url": "https://threatfox.abuse.ch/",
-        "title": title,
+        "title": " ".join(title_parts),
         "published_at": published_at,
         "author": "abuse.ch ThreatFox",
-        "raw": raw_meta,
+        "raw": {**meta, "count": len(iocs)},
         "text": "Recent IOCs from ThreatFox (abuse.ch).",
         "summary_short": None,
         "iocs": iocs,
-    }]
+    }
+
+def _batches(source, fh: IO[bytes], cursor: Optional[int], days: int, query_name: str) -> Iterator[List[Dict[str, Any]]]:
+    seen: set[int] = set()
+    high = cursor
+    low_seen: Optional[int] = None
+
+    def rows(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Optional[int], Dict[str, Any]]]:
+        nonlocal high, low_seen
+        for d in records:
+            ioc_id = _ioc_id(d)
+            if ioc_id is not None:
+                high = ioc_id if high is None else max(high, ioc_id)
+                low_seen = ioc_id if low_seen is None else min(low_seen, ioc_id)
+                if cursor is not None and ioc_id <= cursor:
+                    continue
+            t, v, ctx = _normalize_ioc(d)
+            if not v:
+                continue
+            key = _seen_key(t, v)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield ioc_id, {"type": t, "value": v, "context": ctx}
+
+    meta = {"query": query_name, "window_days": days, "mode": "window" if cursor is None else "delta",
+            "cursor": cursor, "gap": False}
+    # One chunk of lookahead, so the last batch item can still record a gap found at the end
+    pending: Optional[Dict[str, Any]] = None
+    part = 0
+
+    def emit(records):
+        nonlocal pending, part
+        for chunk in metrics.timed_chunks(rows(records), CHUNK_IOCS, "normalize", source):
+            part += 1
+            if pending is not None:
+                yield [pending]
+            pending = _batch_item(chunk, part, days, dict(meta))
+
+    with fh:
+        yield from emit(ijson.items(fh, "data.item", use_float=True))
+
+    if cursor is not None and low_seen is not None and low_seen > cursor:
+        # Missed more than the window covers (worker down, long backoff): use the 48h dump
+        meta["mode"] = "recent-export"
+        low_seen = None
+        try:
+            yield from emit(iter_recent_export())
+        except Exception:
+            meta["gap"] = True
+        if low_seen is not None and low_seen > cursor:
+            # Even 48h doesn't reach back far enough; only a full backfill closes this
+            meta["gap"] = True
+    if pending is not None:
+        pending["raw"]["gap"] = meta["gap"]
+        yield [pending]
+    if high is not None:
+        source.sync_cursor = str(high)
@@ -1,20 +1,16 @@
-import io, json, tempfile, zipfile, requests
+import contextlib, hashlib, tempfile, zipfile
 from datetime import datetime, timezone
 import ijson
+from . import http
+from .. import metrics
+from ..settings import settings
+from .ioc_norm import normalize
 
 EXPORT_FULL = "https://threatfox.abuse.ch/export/json/full/"  # zip; see docs
-# You can swap to the “recent additions” export if you only want 48h:
-# EXPORT_RECENT = "https://threatfox.abuse.ch/export/json/recent/"
-
-def _map_type(t: str) -> str:
-    t = (t or "").lower()
-    if t == "url": return "url"
-    if t in ("domain","fqdn"): return "domain"
-    if t in ("ip","ipv4","ipv6","ip:port"): return "ip"
-    if t in ("filehash-sha256","sha256"): return "sha256"
-    if t in ("filehash-sha1","sha1"): return "sha1"
-    if t in ("filehash-md5","md5"): return "md5"
-    return "other"
+# "Recent additions" export (last 48h); used to catch up when a delta sync falls behind
+EXPORT_RECENT = "https://threatfox.abuse.ch/export/json/recent/"
+# Metrics label for export downloads/parsing, which run outside any one Source
+EXPORT_SOURCE = "threatfox-export"
 
 def _ioc_context(d: dict) -> dict:
     return {
@@ -25,44 +21,70 @@ def _ioc_context(d: dict) -> dict:
         "malware_alias": d.get("malware_alias"),
         "malpedia": d.get("malware_malpedia"),
         "confidence": d.get("confidence_level"),
-        "first_seen": d.get("first_seen"),
-        "last_seen": d.get("last_seen"),
+        "first_seen": d.get("first_seen") or d.get("first_seen_utc"),
+        "last_seen": d.get("last_seen") or d.get("last_seen_utc"),
         "reporter": d.get("reporter"),
         "reference": d.get("reference"),
         "tags": d.get("tags"),
         "ioc_id": d.get("id"),
     }
 
-def iter_full_export(timeout=600):
-    # Download to a temp file to avoid memory spikes, then stream parse JSON array
-    with tempfile.NamedTemporaryFile(suffix=".zip") as tmp:
-        with requests.get(EXPORT_FULL, stream=True, timeout=timeout) as r:
-            r.raise_for_status()
-            for chunk in r.iter_content(1024*64):
-                if chunk: tmp.write(chunk)
-        tmp.flush()
-        with zipfile.ZipFile(tmp.name) as zf:
-            name = zf.namelist()[0]
-            with zf.open(name) as jf:
-                for obj in ijson.items(jf, "item"):
-                    val = obj.get("ioc")
-                    if not val: 
-                        continue
-                    yield {
-                        "type": _map_type(obj.get("ioc_type")),
-                        "value": val,
-                        "context": _ioc_context(obj),
-                    }
+def download_export(path: str, url: str | None = None, timeout=600) -> str:
+    """Stream the export zip to `path`; returns its sha256 so callers can fingerprint the run."""
+    url = url or settings.THREATFOX_EXPORT_URL or EXPORT_FULL
+    h = hashlib.sha256()
+    with metrics.stage("download", EXPORT_SOURCE), open(path, "wb") as fh, \
+            http.get(url, stream=True, timeout=(10, timeout)) as r:
+        r.raise_for_status()
+        for chunk in r.iter_content(1024*64):
+            if chunk:
+                fh.write(chunk)
+                h.update(chunk)
+                metrics.record_bytes(EXPORT_SOURCE, len(chunk))
+    return h.hexdigest()
+
+@contextlib.contextmanager
+def _open_export(path: str):
+    # Exports come either zipped (full) or as bare JSON
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf, zf.open(zf.namelist()[0]) as jf:
+            yield jf
+    else:
+        with open(path, "rb") as fh:
+            yield fh
+
+def iter_export_records(path: str):
+    """Yield raw export records with their ThreatFox id, whether the JSON is an array or keyed by id."""
+    with _open_export(path) as fh:
+        head = fh.read(64).lstrip()
+    with _open_export(path) as fh:
+        if head.startswith(b"{"):
+            for ioc_id, entries in ijson.kvitems(fh, ""):
+                for obj in (entries if isinstance(entries, list) else [entries]):
+                    yield {**obj, "id": obj.get("id") or ioc_id}
+        else:
+            yield from ijson.items(fh, "item")
+
+@metrics.timed_iter("export", EXPORT_SOURCE)
+def iter_export_file(path: str):
+    # Stream parse the export; memory stays flat regardless of size
+    for obj in iter_export_records(path):
+        t, val, port = normalize(obj.get("ioc_type"), obj.get("ioc") or obj.get("ioc_value"))
+        if not val:
+            continue
+        ctx = _ioc_context(obj)
+        if port:
+            ctx["port"] = port
+        yield {"type": t, "value": val, "context": ctx}
 
-def build_chunks(it, size=500):
-    buf = []
-    for x in it:
-        buf.append(x)
-        if len(buf) >= size:
-            yield buf
-            buf = []
-    if buf:
-        yield buf
+def iter_recent_export(timeout=120):
+    """Yield records from the 48h export shaped like `get_iocs` API rows (`ioc`, `id`, ...)."""
+    with tempfile.NamedTemporaryFile(suffix=".json") as tmp:
+        download_export(tmp.name, url=settings.THREATFOX_EXPORT_RECENT_URL or EXPORT_RECENT, timeout=timeout)
+        for obj in iter_export_records(tmp.name):
+            if "ioc" not in obj:
+                obj["ioc"] = obj.get("ioc_value")
+            yield obj
 
 def make_batch_item(count: int):
     now = datetime.now(timezone.utc)
@@ -0,0 +1,20 @@
+# Shared Redis client (lazy, so importing this module never opens a connection).
+import redis
+from .settings import settings
+
+_client: redis.Redis | None = None
+_async_client = None
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=5)
+    return _client
+
+def get_async_redis():
+    """redis.asyncio client for async handlers; same server and timeouts."""
+    global _async_client
+    if _async_client is None:
+        import redis.asyncio
+        _async_client = redis.asyncio.Redis.from_url(settings.REDIS_URL, socket_timeout=5)
+    return _async_client
@@ -0,0 +1,155 @@
+# Bulk IOC membership: Redis sets per type in front of set-based Postgres confirmation.
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import redis
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .kv import get_redis
+from .models import IOC, IngestCheckpoint
+
+FILTER_PREFIX = "iocs:known:"
+READY_KEY = FILTER_PREFIX + "ready"
+# Postgres-side "filter is missing writes" flag (completed = False), for when Redis is too
+# far gone to drop READY_KEY; position counts failed writes so a rebuild only clears the
+# ones that happened before it started
+FILTER_CHECKPOINT = "ioc-filter"
+# Members per SMISMEMBER / SADD call and values per confirming IN (...) query
+BATCH = 10_000
+
+# Swap a rebuilt set in, keeping whatever add_to_filter put in the live set since the rebuild
+# read its snapshot. One script, so no SADD can land between the union and the rename.
+# IOCs are never deleted, so nothing the union carries over is stale.
+_SWAP = """
+redis.call('SUNIONSTORE', KEYS[1], KEYS[1], KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+end
+return 1
+"""
+
+def _key(ioc_type: str) -> str:
+    return f"{FILTER_PREFIX}{ioc_type}"
+
+def normalize_value(ioc_type: str, value: str) -> str:
+    value = (value or "").strip()
+    if ioc_type in ("domain", "md5", "sha1", "sha256", "email"):
+        value = value.lower()
+    return value
+
+def mark_filter_dirty(db: Session):
+    """Record, in the caller's transaction, that the filter missed writes."""
+    now = datetime.utcnow()
+    stmt = pg_insert(IngestCheckpoint).values(name=FILTER_CHECKPOINT, position=1, completed=False, updated_at=now)
+    db.execute(stmt.on_conflict_do_update(index_elements=["name"], set_={
+        "position": IngestCheckpoint.position + 1, "completed": False, "updated_at": now}))
+
+def filter_dirty(db: Session) -> Optional[int]:
+    """Failed-write count if the filter is marked dirty, else None."""
+    row = db.execute(select(IngestCheckpoint.position, IngestCheckpoint.completed)
+                     .where(IngestCheckpoint.name == FILTER_CHECKPOINT)).first()
+    return row[0] if row is not None and not row[1] else None
+
+def add_to_filter(db: Session, pairs: Iterable[Tuple[str, str]]):
+    """Record freshly ingested (type, value) pairs. Never raises: the DB stays the source of truth."""
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        by_type: Dict[str, List[str]] = {}
+        for t, v in pairs:
+            by_type.setdefault(t, []).append(normalize_value(t, v))
+        if not by_type:
+            return
+        for t, vals in by_type.items():
+            for i in range(0, len(vals), BATCH):
+                pipe.sadd(_key(t), *vals[i:i + BATCH])
+        pipe.execute()
+    except redis.RedisError:
+        # A partial write would cause false negatives; stop trusting the filter until rebuilt.
+        # Redis may be unreachable for the DELETE too, so the flag that counts is in Postgres
+        # and commits with these IOCs
+        mark_filter_dirty(db)
+        try:
+            get_redis().delete(READY_KEY)
+        except redis.RedisError:
+            pass
+
+def rebuild_filter(db: Session) -> int:
+    """Rebuild every per-type set from `iocs` and swap them in atomically. Returns values loaded."""
+    dirty = filter_dirty(db)
+    r = get_redis()
+    swap = r.register_script(_SWAP)
+    types = [t for (t,) in db.execute(select(IOC.type).distinct()) if t]
+    loaded = 0
+    for t in types:
+        tmp = _key(t) + ":building"
+        r.delete(tmp)
+        batch: List[str] = []
+        for (v,) in db.execute(select(IOC.value).where(IOC.type == t).execution_options(yield_per=BATCH)):
+            if v:
+                batch.append(normalize_value(t, v))
+            if len(batch) >= BATCH:
+                r.sadd(tmp, *batch); loaded += len(batch); batch = []
+        if batch:
+            r.sadd(tmp, *batch); loaded += len(batch)
+        swap(keys=[tmp, _key(t)])
+    r.set(READY_KEY, "1")
+    if dirty is not None:
+        # Failed writes after this rebuild started bumped position; those keep the flag set
+        db.execute(update(IngestCheckpoint).where(IngestCheckpoint.name == FILTER_CHECKPOINT,
+                                                  IngestCheckpoint.position == dirty).values(completed=True))
+    db.commit()
+    return loaded
+
+def reported():
+    """IOCs a feed reported, as opposed to ones extract_iocs pulled out of report text."""
+    return IOC.context.op("->>")("extracted").is_(None)
+
+def _filter_candidates(db: Session, query: Dict[str, List[str]]) -> Dict[str, List[str]] | None:
+    # Returns only values present in the sets, or None when the filter can't be trusted
+    if filter_dirty(db) is not None:
+        return None
+    try:
+        r = get_redis()
+        if not r.exists(READY_KEY):
+            return None
+        out: Dict[str, List[str]] = {}
+        for t, vals in query.items():
+            pipe = r.pipeline(transaction=False)
+            for i in range(0, len(vals), BATCH):
+                pipe.smismember(_key(t), vals[i:i + BATCH])
+            flags = [f for part in pipe.execute() for f in part]
+            out[t] = [v for v, hit in zip(vals, flags) if hit]
+        return out
+    except redis.RedisError:
+        return None
+
+def lookup(db: Session, query: Dict[str, List[str]], include_extracted: bool = False) -> Dict[str, Any]:
+    """
+    Answer "which of these values are known IOCs?" for large typed batches.
+
+    Values are checked against the Redis sets first; only hits (or everything, when the
+    filter is unavailable) are confirmed with one `IN (...)` query per type and batch.
+    IOCs only ever seen as text extracted from a report count only with `include_extracted`.
+    """
+    clean: Dict[str, List[str]] = {}
+    checked = 0
+    for t, vals in query.items():
+        t = (t or "").lower()
+        uniq = list(dict.fromkeys(normalize_value(t, v) for v in vals if v))
+        checked += len(uniq)
+        if uniq:
+            clean[t] = uniq
+    candidates = _filter_candidates(db, clean)
+    filtered = candidates is not None
+    if candidates is None:
+        candidates = clean
+
+    matches: List[IOC] = []
+    for t, vals in candidates.items():
+        for i in range(0, len(vals), BATCH):
+            stmt = select(IOC).where(IOC.type == t, IOC.value.in_(vals[i:i + BATCH]))
+            if not include_extracted:
+                stmt = stmt.where(reported())
+            matches.extend(db.execute(stmt).scalars())
+    return {"matches": matches, "checked": checked, "matched": len(matches), "filtered": filtered}
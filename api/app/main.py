@@ -1,57 +1,48 @@
-from fastapi import FastAPI, Depends, Query, HTTPException
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
 from datetime import datetime
-from .db import SessionLocal, init_db
-from .search import search_items
-from .templates import render
-from .workers import schedule_now  # for manual triggers
-from . import workers
-from sqlalchemy import select
-from .models import Item, Source, IOC
+from .settings import settings
+from .api import router as api_router
+from . import metrics, tasks
 
 app = FastAPI(title="Threat Intel Portal")
-
-def get_db():
-    db = SessionLocal()
+app.include_router(api_router)
+
+if settings.ASYNC_DB:
+    from .async_pages import router as pages_router
+else:
+    from .pages import router as pages_router
+app.include_router(pages_router)
+
+@app.middleware("http")
+async def observe_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
     try:
-        yield db
+        response = await call_next(request)
+        status = response.status_code
+        return response
     finally:
-        db.close()
-
-@app.on_event("startup")
-def startup_event():
-    init_db()
-
-@app.get("/", response_class=HTMLResponse)
-def home(db: Session = Depends(get_db)):
-    items, _ = search_items(db, limit=50)
-    return render("index.html", {"items": items})
+        # Route template, not the raw path, so /items/{item_id} stays one series
+        route = request.scope.get("route")
+        metrics.HTTP_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(
+            time.perf_counter() - t0)
 
-@app.get("/items", response_class=HTMLResponse)
-def list_items(db: Session = Depends(get_db), q: str | None = Query(None)):
-    items, _ = search_items(db, q=q, limit=100)
-    return render("items.html", {"items": items, "q": q})
-
-@app.get("/items/{item_id}", response_class=HTMLResponse)
-def item_detail(item_id: int, db: Session = Depends(get_db)):
-    row = db.execute(
-        select(Item, Source.name).join(Source, Item.source_id == Source.id).where(Item.id == item_id)
-    ).first()
-    if not row:
-        raise HTTPException(status_code=404, detail="Item not found")
-    item, source_name = row
-    iocs = db.execute(select(IOC).where(IOC.item_id == item.id)).scalars().all()
-    return render("item_detail.html", {
-        "item": item,
-        "source_name": source_name,
-        "iocs": iocs,
-    })
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(body, media_type=content_type)
 
 @app.post("/admin/refresh")
 def admin_refresh():
     # Kick off immediate fetch tasks
-    schedule_now()
+    tasks.send("app.workers.task_dispatch_due", force=True)
+    return {"status": "scheduled"}
+
+@app.post("/admin/rebuild-ioc-filter")
+def admin_rebuild_ioc_filter():
+    tasks.send("app.workers.task_rebuild_ioc_filter")
     return {"status": "scheduled"}
 
 @app.get("/healthz")
@@ -0,0 +1,191 @@
+# Prometheus metrics for ingest stages and HTTP handlers, with optional OpenTelemetry spans.
+#
+# Multi-process servers (Celery prefork, several uvicorn workers) must set
+# PROMETHEUS_MULTIPROC_DIR before start; each process then writes its samples there
+# and the exporters aggregate them.
+import contextlib, functools, inspect, itertools, os, shutil, time
+from typing import Any, Callable, Iterator, Optional
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess, start_http_server)
+from prometheus_client import REGISTRY
+from .settings import settings
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+# Seconds; fetches and upserts run from milliseconds (304s) to minutes (full export)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+FETCH_SECONDS = Histogram("tip_fetch_seconds", "Fetcher wall time per source, download to normalized items",
+                          ["kind", "source"], buckets=BUCKETS)
+FETCHES = Counter("tip_fetches_total", "Fetcher results per source (changed/unchanged/empty/error)",
+                  ["kind", "source", "result"])
+FETCH_BYTES = Counter("tip_fetch_bytes_total", "Response bytes downloaded per source", ["source"])
+STAGE_SECONDS = Histogram("tip_stage_seconds", "Pipeline stage wall time (parse, normalize, html_text, upsert, ...)",
+                          ["stage", "source"], buckets=BUCKETS)
+ROWS = Counter("tip_ingest_rows_total", "Rows written by ingest, by outcome (inserted/skipped/aliased/updated)",
+               ["source", "table", "outcome"])
+HTTP_SECONDS = Histogram("tip_http_request_seconds", "API/page handler latency",
+                         ["method", "route", "status"], buckets=BUCKETS)
+
+def source_label(source: Any) -> str:
+    if isinstance(source, str):
+        return source
+    return getattr(source, "name", None) or "unknown"
+
+_tracer = None
+
+def _get_tracer():
+    # Spans only when asked for and the OpenTelemetry API is installed; the SDK/exporter
+    # is configured the usual way (OTEL_* env, opentelemetry-instrument)
+    global _tracer
+    if _tracer is None and settings.OTEL_TRACING:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            return None
+        _tracer = trace.get_tracer("threat-intel-portal")
+    return _tracer
+
+@contextlib.contextmanager
+def span(name: str, **attrs: Any):
+    tracer = _get_tracer()
+    if tracer is None:
+        yield
+        return
+    with tracer.start_as_current_span(name, attributes={k: str(v) for k, v in attrs.items()}):
+        yield
+
+@contextlib.contextmanager
+def stage(name: str, source: Any = "-"):
+    """Time a pipeline stage into tip_stage_seconds (and a span when tracing is on)."""
+    label = source_label(source)
+    t0 = time.perf_counter()
+    with span(f"ingest.{name}", source=label):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(name, label).observe(time.perf_counter() - t0)
+
+def _record_fetch(kind: str, label: str, result: str, seconds: float):
+    FETCH_SECONDS.labels(kind, label).observe(seconds)
+    FETCHES.labels(kind, label, result).inc()
+
+def _timed_stream(chunks: Iterator, kind: str, label: str, seconds: float) -> Iterator:
+    # Streamed fetchers parse as they are consumed: the fetch takes the time spent inside the
+    # generator (not the caller's upserts between chunks) and its result is known at the end
+    result, changed = "error", False
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                result = "changed" if changed else "empty"
+                return
+            finally:
+                seconds += time.perf_counter() - t0
+            changed = changed or bool(chunk)
+            yield chunk
+    finally:
+        chunks.close()
+        _record_fetch(kind, label, result, seconds)
+
+def timed_fetch(kind: str):
+    """
+    Decorator for `fetch_*(source, ...)`: latency and result per source. A generator result
+    is recorded once it has been consumed (changed if any chunk had items, else empty).
+    """
+    def wrap(fn: Callable):
+        @functools.wraps(fn)
+        def inner(source, *a, **kw):
+            label = source_label(source)
+            t0 = time.perf_counter()
+            try:
+                with span(f"fetch.{kind}", source=label):
+                    out = fn(source, *a, **kw)
+            except BaseException:
+                _record_fetch(kind, label, "error", time.perf_counter() - t0)
+                raise
+            if inspect.isgenerator(out):
+                return _timed_stream(out, kind, label, time.perf_counter() - t0)
+            _record_fetch(kind, label, "unchanged" if out is None else ("changed" if out else "empty"),
+                          time.perf_counter() - t0)
+            return out
+        return inner
+    return wrap
+
+def timed_iter(name: str, source: Any = "-"):
+    """
+    Decorator for generators: one stage observation per iteration, counting only time spent
+    inside the generator. A consumer that writes between items (a COPY) isn't charged.
+    """
+    def wrap(fn: Callable[..., Iterator]):
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            it = fn(*a, **kw)
+            spent = 0.0
+            try:
+                while True:
+                    t0 = time.perf_counter()
+                    try:
+                        x = next(it)
+                    except StopIteration:
+                        return
+                    finally:
+                        spent += time.perf_counter() - t0
+                    yield x
+            finally:
+                it.close()
+                STAGE_SECONDS.labels(name, source_label(source)).observe(spent)
+        return inner
+    return wrap
+
+def timed_chunks(it: Iterator, size: int, name: str, source: Any = "-") -> Iterator[list]:
+    """
+    Lists of up to `size` items from `it`, timing the production of each one as stage `name`.
+    Time spent by the consumer between chunks (the upsert) is not counted.
+    """
+    while True:
+        with stage(name, source):
+            chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def record_bytes(source: Any, n: int):
+    FETCH_BYTES.labels(source_label(source)).inc(n)
+
+def record_rows(source: Any, stats: dict):
+    """Counts from `bulk.upsert_items` / `backfill.load_export`."""
+    label = source_label(source)
+    for key, table, outcome in (("items_inserted", "items", "inserted"), ("items_skipped", "items", "skipped"),
+                                ("items_aliased", "items", "aliased"),
+                                ("iocs_inserted", "iocs", "inserted"), ("iocs_updated", "iocs", "updated"),
+                                ("sightings", "ioc_sightings", "inserted"),
+                                ("item_techniques", "item_techniques", "inserted"), ("item_tags", "item_tags", "inserted"),
+                                ("watch_hits", "watch_hits", "inserted")):
+        if stats.get(key):
+            ROWS.labels(label, table, outcome).inc(stats[key])
+
+def _registry() -> CollectorRegistry:
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+def reset_multiproc_dir():
+    # Stale files from a previous run would be summed into the new one
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+def start_exporter(port: int):
+    """Serve /metrics on `port` from this process (the Celery worker parent)."""
+    start_http_server(port, registry=_registry())
+
+def mark_process_dead(pid: Optional[int] = None):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, BigInteger, Text, Boolean, ForeignKey, TIMESTAMP, JSON, LargeBinary, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, Text, Boolean, Date, ForeignKey, TIMESTAMP, JSON, LargeBinary, UniqueConstraint, Computed, Index, literal_column, text
+from sqlalchemy.dialects.postgresql import INET, TSVECTOR
 from sqlalchemy.orm import relationship
 from .db import Base
 
+def simhash_band(col, i: int):
+    """Band i (0 = most significant) of a 64-bit SimHash column, as indexed and queried."""
+    return col.op(">>")(literal_column(str(48 - 16 * i))).op("&")(literal_column("65535"))
+
+def _simhash_band_index(col, i: int) -> Index:
+    return Index(f"ix_items_simhash_b{i}", simhash_band(col, i), postgresql_where=text("simhash IS NOT NULL"))
+
 class Source(Base):
     __tablename__ = "sources"
     id = Column(Integer, primary_key=True)
@@ -13,6 +21,13 @@ class Source(Base):
     poll_interval_seconds = Column(Integer, default=900)
     last_etag = Column(Text)
     last_modified = Column(TIMESTAMP)
+    content_hash = Column(LargeBinary)  # sha256 of the last body we processed
+    sync_cursor = Column(Text)  # ingestor-specific resume point, e.g. highest ThreatFox IOC id
+    # Per-source scheduling (see app.scheduler)
+    next_poll_at = Column(TIMESTAMP)
+    last_polled_at = Column(TIMESTAMP)
+    fail_count = Column(Integer, default=0)
+    unchanged_count = Column(Integer, default=0)
 
 class Item(Base):
     __tablename__ = "items"
@@ -28,9 +43,48 @@ class Item(Base):
     hash_sha256 = Column(LargeBinary)
     summary_short = Column(Text)
     lang = Column(Text, default="en")
+    # 64-bit SimHash of `text` (app.ingest.fingerprint), for items checked for near-duplicates
+    simhash = Column(BigInteger)
+    # Maintained by Postgres on every insert/update of title/text. Text is capped: a tsvector
+    # over 1 MB is an error, and one huge report would fail its whole insert batch
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', left(coalesce(text, ''), 500000)), 'B')",
+        persisted=True,
+    ))
 
     source = relationship("Source")
 
+    __table_args__ = (
+        # Home page / listings: newest first, undated last, id as tie-breaker for keyset paging
+        Index("ix_items_published_at_id", published_at.desc().nulls_last(), id.desc()),
+        Index("ix_items_source_id", "source_id"),
+        # Dedup is enforced here; ingest inserts with ON CONFLICT DO NOTHING
+        Index("ux_items_hash_sha256", "hash_sha256", unique=True),
+        Index("ix_items_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_items_canonical_url", "canonical_url"),
+        # One index per 16-bit band of the SimHash: near-duplicates share at least one band
+        _simhash_band_index(simhash, 0),
+        _simhash_band_index(simhash, 1),
+        _simhash_band_index(simhash, 2),
+        _simhash_band_index(simhash, 3),
+    )
+
+class ItemAlias(Base):
+    """A near-duplicate that was linked to an existing item instead of being stored (see app.dedup)."""
+    __tablename__ = "item_aliases"
+    __table_args__ = (
+        Index("ix_item_aliases_item_id", "item_id"),
+    )
+    hash_sha256 = Column(LargeBinary, primary_key=True)  # the duplicate's own dedup hash, so repeat polls skip it
+    item_id = Column(BigInteger, ForeignKey("items.id"), nullable=False)
+    source_id = Column(Integer, ForeignKey("sources.id"))
+    canonical_url = Column(Text)
+    title = Column(Text)
+    reason = Column(Text)  # url | simhash
+    distance = Column(Integer)  # differing SimHash bits; NULL for URL matches
+    seen_at = Column(TIMESTAMP)
+
 class Tag(Base):
     __tablename__ = "tags"
     id = Column(Integer, primary_key=True)
@@ -45,11 +99,18 @@ class Technique(Base):
 
 class ItemTag(Base):
     __tablename__ = "item_tags"
+    __table_args__ = (
+        # /api/items?tag= and ?technique=: label -> items
+        Index("ix_item_tags_tag_id_item_id", "tag_id", "item_id"),
+    )
     item_id = Column(BigInteger, ForeignKey("items.id"), primary_key=True)
     tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
 
 class ItemTechnique(Base):
     __tablename__ = "item_techniques"
+    __table_args__ = (
+        Index("ix_item_techniques_technique_id_item_id", "technique_id", "item_id"),
+    )
     item_id = Column(BigInteger, ForeignKey("items.id"), primary_key=True)
     technique_id = Column(Integer, ForeignKey("techniques.id"), primary_key=True)
 
@@ -57,9 +118,93 @@ class IOC(Base):
     __tablename__ = "iocs"
     __table_args__ = (
         UniqueConstraint('type', 'value', name='iocs_type_value_unique'),
+        Index("ix_iocs_value", "value"),
+        # Item detail page: per-item keyset paging, type filter and GROUP BY type
+        Index("ix_iocs_item_id_id", "item_id", "id"),
+        Index("ix_iocs_item_type_id", "item_id", "type", "id"),
+        # "Seen in the last N hours" is a range scan on this
+        Index("ix_iocs_last_seen", "last_seen"),
+        # Typed lookups (see app.ingest.ioc_norm): CIDR containment, raw hash bytes, domain suffix
+        Index("ix_iocs_ip", "ip", postgresql_using="gist", postgresql_ops={"ip": "inet_ops"},
+              postgresql_where=text("ip IS NOT NULL")),
+        Index("ix_iocs_hash_bytes", "hash_bytes", postgresql_where=text("hash_bytes IS NOT NULL")),
+        Index("ix_iocs_domain_rev", "domain_rev", postgresql_ops={"domain_rev": "text_pattern_ops"},
+              postgresql_where=text("domain_rev IS NOT NULL")),
     )
     id = Column(BigInteger, primary_key=True)
-    item_id = Column(BigInteger, ForeignKey("items.id"))
+    item_id = Column(BigInteger, ForeignKey("items.id"))  # item that first reported it
     type = Column(Text)  # ip/domain/url/sha256/sha1/md5/email
     value = Column(Text)
     context = Column(JSON)
+    # Denormalized from ioc_sightings, maintained by the ingest upserts in app.bulk
+    first_seen = Column(TIMESTAMP)
+    last_seen = Column(TIMESTAMP)
+    sighting_count = Column(Integer, default=1, server_default="1", nullable=False)
+    # Typed copies of `value`, NULL where they don't apply
+    ip = Column(INET)  # ip type, or the host of an IP-literal URL
+    hash_bytes = Column(LargeBinary)  # md5/sha1/sha256 digests
+    domain_rev = Column(Text)  # domain or URL host, labels reversed: "com.example.www."
+
+class IOCSighting(Base):
+    """One row per item that reported an indicator."""
+    __tablename__ = "ioc_sightings"
+    __table_args__ = (
+        # An item's IOCs in id order (item detail page)
+        Index("ix_ioc_sightings_item_id_ioc_id", "item_id", "ioc_id"),
+    )
+    ioc_id = Column(BigInteger, ForeignKey("iocs.id"), primary_key=True)
+    item_id = Column(BigInteger, ForeignKey("items.id"), primary_key=True)
+    source_id = Column(Integer, ForeignKey("sources.id"))
+    seen_at = Column(TIMESTAMP)
+
+class IngestCheckpoint(Base):
+    __tablename__ = "ingest_checkpoints"
+    name = Column(Text, primary_key=True)
+    fingerprint = Column(Text)  # identifies the input being loaded, e.g. export zip sha256
+    position = Column(BigInteger, default=0)  # rows consumed from the input so far
+    item_id = Column(BigInteger, ForeignKey("items.id"))
+    completed = Column(Boolean, default=False)
+    updated_at = Column(TIMESTAMP)
+
+class WatchEntry(Base):
+    """Analyst watchlist entry; create/delete only, never edited in place (see app.watchlist)."""
+    __tablename__ = "watch_entries"
+    __table_args__ = (
+        UniqueConstraint("kind", "value", name="watch_entries_kind_value_unique"),
+    )
+    id = Column(Integer, primary_key=True)
+    kind = Column(Text, nullable=False)  # cidr | domain | hash | malware
+    value = Column(Text, nullable=False)  # normalized: network string, lower-case domain/hash, malware key
+    note = Column(Text)
+    created_at = Column(TIMESTAMP)
+
+class WatchHit(Base):
+    __tablename__ = "watch_hits"
+    __table_args__ = (
+        UniqueConstraint("entry_id", "ioc_id", name="watch_hits_entry_ioc_unique"),
+        # Hits of one entry, newest first
+        Index("ix_watch_hits_entry_id_id", "entry_id", "id"),
+        Index("ix_watch_hits_ioc_id", "ioc_id"),
+    )
+    id = Column(BigInteger, primary_key=True)
+    entry_id = Column(Integer, ForeignKey("watch_entries.id"), nullable=False)
+    ioc_id = Column(BigInteger, ForeignKey("iocs.id"), nullable=False)
+    item_id = Column(BigInteger, ForeignKey("items.id"))  # the item whose ingest produced the hit
+    source_id = Column(Integer, ForeignKey("sources.id"))
+    matched_at = Column(TIMESTAMP)
+
+class IOCDailyRollup(Base):
+    """New indicators per first-seen day, type, malware family and reporting source (see app.rollups)."""
+    __tablename__ = "ioc_daily_rollup"
+    day = Column(Date, primary_key=True)
+    type = Column(Text, primary_key=True)
+    malware = Column(Text, primary_key=True)  # ThreatFox malware id ("win.qakbot"), '' when none
+    source_id = Column(Integer, primary_key=True)  # source of the item that first reported it, 0 if none
+    count = Column(BigInteger, nullable=False, default=0)
+
+class ItemWeeklyRollup(Base):
+    """New items per week (Monday, by published date) and source; KEV additions are the json sources' rows."""
+    __tablename__ = "item_weekly_rollup"
+    week = Column(Date, primary_key=True)
+    source_id = Column(Integer, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,115 @@
+# HTML pages (sync handlers). app.async_pages serves the same routes when ASYNC_DB is on;
+# both share the statements and response helpers below.
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response
+from sqlalchemy import Text, cast, func, or_, select
+from sqlalchemy.orm import Session
+from .db import get_db
+from .models import Item, Source, IOC, IOCSighting
+from .search import search_items
+from .rollups import stats
+from .templates import render
+from . import cache
+
+router = APIRouter()
+
+IOC_PAGE_SIZE = 100
+# Home page stats card (see app.rollups.stats)
+HOME_STATS = {"days": 14, "weeks": 8, "top": 5}
+
+def html_response(request: Request, body: str, etag: str) -> Response:
+    # Data only changes when ingest commits, so pages are cached per cache generation;
+    # browsers revalidate every time and get a 304 until then
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
+def item_stmt(item_id: int):
+    return select(Item, Source.name).join(Source, Item.source_id == Source.id).where(Item.id == item_id)
+
+# An item's IOCs are the ones it reported: its ioc_sightings rows. IOC.item_id is only the
+# first item that reported each one
+
+def type_counts_stmt(item_id: int):
+    return (select(IOC.type, func.count()).join(IOCSighting, IOCSighting.ioc_id == IOC.id)
+            .where(IOCSighting.item_id == item_id).group_by(IOC.type).order_by(func.count().desc()))
+
+def ioc_page_stmt(item_id: int, type: str | None = None, q: str | None = None,
+                  malware: str | None = None, tag: str | None = None,
+                  cursor: int | None = None, limit: int = IOC_PAGE_SIZE):
+    # Keyset on IOC id within one item's sightings; served by ix_ioc_sightings_item_id_ioc_id.
+    # Fetches one extra row to tell whether there is a next page
+    stmt = (select(IOC).join(IOCSighting, IOCSighting.ioc_id == IOC.id)
+            .where(IOCSighting.item_id == item_id).order_by(IOCSighting.ioc_id).limit(limit + 1))
+    if type:
+        stmt = stmt.where(IOC.type == type)
+    if q:
+        stmt = stmt.where(IOC.value.icontains(q, autoescape=True))
+    if malware:
+        stmt = stmt.where(or_(
+            IOC.context["malware_printable"].as_string().icontains(malware, autoescape=True),
+            IOC.context["malware"].as_string().icontains(malware, autoescape=True),
+        ))
+    if tag:
+        stmt = stmt.where(cast(IOC.context["tags"], Text).icontains(tag, autoescape=True))
+    if cursor:
+        stmt = stmt.where(IOCSighting.ioc_id > cursor)
+    return stmt
+
+def split_page(rows, limit: int = IOC_PAGE_SIZE):
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def detail_context(item, source_name, type_counts, iocs, next_cursor) -> dict:
+    return {
+        "item": item,
+        "source_name": source_name,
+        "iocs": iocs,
+        "next_cursor": next_cursor,
+        "type_counts": type_counts,
+        "ioc_total": sum(n for _, n in type_counts),
+    }
+
+@router.get("/", response_class=HTMLResponse)
+def home(request: Request, db: Session = Depends(get_db)):
+    def page():
+        items, _ = search_items(db, limit=50)
+        return render("index.html", {"items": items, "stats": stats(db, **HOME_STATS)}).body.decode()
+    return html_response(request, *cache.cached_page("home", [], page))
+
+@router.get("/items", response_class=HTMLResponse)
+def list_items(request: Request, db: Session = Depends(get_db), q: str | None = Query(None)):
+    def page():
+        items, _ = search_items(db, q=q, limit=100)
+        return render("items.html", {"items": items, "q": q}).body.decode()
+    return html_response(request, *cache.cached_page("items", [(q or "").strip()], page))
+
+@router.get("/items/{item_id}", response_class=HTMLResponse)
+def item_detail(item_id: int, db: Session = Depends(get_db)):
+    row = db.execute(item_stmt(item_id)).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Item not found")
+    item, source_name = row
+    type_counts = db.execute(type_counts_stmt(item.id)).all()
+    iocs, next_cursor = split_page(db.execute(ioc_page_stmt(item.id)).scalars().all())
+    return render("item_detail.html", detail_context(item, source_name, type_counts, iocs, next_cursor))
+
+@router.get("/items/{item_id}/iocs", response_class=HTMLResponse)
+def item_iocs(
+    item_id: int,
+    db: Session = Depends(get_db),
+    type: str | None = Query(None),
+    q: str | None = Query(None),
+    malware: str | None = Query(None),
+    tag: str | None = Query(None),
+    cursor: int | None = Query(None),
+    limit: int = Query(IOC_PAGE_SIZE, ge=1, le=1000),
+):
+    # Table-body fragment for the detail page; the next page's cursor rides in a header
+    rows = db.execute(ioc_page_stmt(item_id, type, q, malware, tag, cursor, limit)).scalars().all()
+    iocs, next_cursor = split_page(rows, limit)
+    resp = render("_ioc_rows.html", {"iocs": iocs})
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = str(next_cursor)
+    return resp
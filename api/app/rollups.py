@@ -0,0 +1,131 @@
+# Dashboard rollups: new IOCs per day/type/malware/source and new items per week/source.
+#
+# Ingest adds deltas computed from the rows it actually inserted (RETURNING ... xmax = 0),
+# in the transaction that inserts them: a rolled-back batch leaves no count behind and a
+# repeated one inserts nothing, so nothing is counted twice. reconcile() recounts both
+# tables from the base tables and adds the difference to fix drift (a later sighting
+# moving first_seen earlier, rows changed by hand). Stats queries read only these tables.
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import desc, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .models import IOCDailyRollup, ItemWeeklyRollup, Source
+
+# Source kind of the CISA KEV feed
+KEV_KIND = "json"
+
+def ioc_key(first_seen: datetime, ioc_type: str, context: Optional[Dict[str, Any]], source_id: Optional[int]) -> Tuple:
+    return first_seen.date(), ioc_type, (context or {}).get("malware") or "", source_id or 0
+
+def week_of(d: datetime) -> date:
+    return d.date() - timedelta(days=d.weekday())
+
+def add_ioc_counts(db: Session, counts: Counter):
+    """Add {ioc_key: n} to ioc_daily_rollup; call in the transaction that inserted the IOCs."""
+    rows = [{"day": k[0], "type": k[1], "malware": k[2], "source_id": k[3], "count": n}
+            for k, n in sorted(counts.items()) if n]
+    if rows:
+        stmt = pg_insert(IOCDailyRollup).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["day", "type", "malware", "source_id"],
+            set_={"count": IOCDailyRollup.count + stmt.excluded.count}))
+
+def add_item_counts(db: Session, counts: Counter):
+    """Add {(week, source_id): n} to item_weekly_rollup."""
+    rows = [{"week": w, "source_id": s, "count": n} for (w, s), n in sorted(counts.items()) if n]
+    if rows:
+        stmt = pg_insert(ItemWeeklyRollup).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["week", "source_id"],
+            set_={"count": ItemWeeklyRollup.count + stmt.excluded.count}))
+
+# For the COPY merge in bulk.copy_iocs: a data-modifying CTE over its `up` (upsert RETURNING)
+# and `src` (staged rows) CTEs, with :source_id bound
+COPY_ROLLUP_CTE = """
+    rolled AS (
+        INSERT INTO ioc_daily_rollup AS r (day, type, malware, source_id, count)
+        SELECT src.first_seen::date, up.type, coalesce(src.context->>'malware', ''), :source_id, count(*)
+          FROM up JOIN src USING (type, value) WHERE up.inserted
+         GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, type, malware, source_id) DO UPDATE SET count = r.count + excluded.count
+    )"""
+
+_IOC_FRESH = """
+    SELECT coalesce(i.first_seen, it.fetched_at, 'epoch')::date AS day, i.type,
+           coalesce(i.context->>'malware', '') AS malware, coalesce(it.source_id, 0) AS source_id, count(*) AS count
+      FROM iocs i LEFT JOIN items it ON it.id = i.item_id
+     WHERE i.type IS NOT NULL
+     GROUP BY 1, 2, 3, 4"""
+
+_ITEM_FRESH = """
+    SELECT date_trunc('week', coalesce(published_at, fetched_at, 'epoch'))::date AS week,
+           coalesce(source_id, 0) AS source_id, count(*) AS count
+      FROM items GROUP BY 1, 2"""
+
+def _resync(db: Session, table: str, keys: Tuple[str, ...], fresh: str) -> int:
+    # Recount and read the rollup in one statement, so both see the same snapshot: their
+    # difference is the drift as of that snapshot. Adding it is an increment like any ingest
+    # delta, so it commutes with deltas committed since, and the long recount takes no locks.
+    # Buckets left at zero no longer exist. Returns buckets that had drifted.
+    cols = ", ".join(keys)
+    same = " AND ".join(f"f.{k} = r.{k}" for k in keys)
+    db.execute(text(f"""
+        CREATE TEMP TABLE rollup_drift ON COMMIT DROP AS
+        SELECT {", ".join(f"coalesce(f.{k}, r.{k}) AS {k}" for k in keys)},
+               coalesce(f.count, 0) - coalesce(r.count, 0) AS count
+          FROM ({fresh}) f FULL JOIN {table} r ON {same}
+         WHERE coalesce(f.count, 0) <> coalesce(r.count, 0)
+    """))
+    drift = db.execute(text(f"""
+        WITH fixed AS (
+            INSERT INTO {table} AS r ({cols}, count) SELECT {cols}, count FROM rollup_drift ORDER BY {cols}
+            ON CONFLICT ({cols}) DO UPDATE SET count = r.count + excluded.count
+            RETURNING 1
+        )
+        SELECT count(*) FROM fixed
+    """)).scalar_one()
+    db.execute(text(f"""
+        DELETE FROM {table} r USING rollup_drift f WHERE {same} AND r.count = 0
+    """))
+    db.commit()
+    return drift
+
+def reconcile(db: Session) -> int:
+    """
+    Recompute both rollups from iocs/items and correct them in place. Returns the number
+    of buckets that had drifted.
+
+    Takes no table lock: ingest keeps committing deltas while the recount runs, and the
+    correction only holds row locks on the drifted buckets for its own short transaction.
+    """
+    drift = _resync(db, "ioc_daily_rollup", ("day", "type", "malware", "source_id"), _IOC_FRESH)
+    drift += _resync(db, "item_weekly_rollup", ("week", "source_id"), _ITEM_FRESH)
+    return drift
+
+def stats(db: Session, days: int = 30, weeks: int = 12, top: int = 10) -> Dict[str, Any]:
+    """Dashboard numbers, from the rollups only."""
+    R, W = IOCDailyRollup, ItemWeeklyRollup
+    total = func.sum(R.count)
+    today = datetime.utcnow()
+    since_day = today.date() - timedelta(days=days - 1)
+    since_week = week_of(today) - timedelta(weeks=weeks - 1)
+
+    def pairs(stmt, name):
+        return [{name: k, "count": int(n)} for k, n in db.execute(stmt)]
+
+    return {
+        "iocs_total": int(db.execute(select(func.coalesce(total, 0))).scalar_one()),
+        "iocs_by_type": pairs(select(R.type, total).group_by(R.type).order_by(desc(total)), "type"),
+        "iocs_by_malware": pairs(select(R.malware, total).where(R.malware != "")
+                                 .group_by(R.malware).order_by(desc(total)).limit(top), "malware"),
+        "iocs_by_source": pairs(select(func.coalesce(Source.name, "unknown"), total).select_from(R)
+                                .outerjoin(Source, Source.id == R.source_id)
+                                .group_by(Source.name).order_by(desc(total)), "source"),
+        "iocs_by_day": [{"day": d.isoformat(), "count": int(n)} for d, n in db.execute(
+            select(R.day, total).where(R.day >= since_day).group_by(R.day).order_by(R.day))],
+        "kev_weekly": [{"week": w.isoformat(), "count": int(n)} for w, n in db.execute(
+            select(W.week, func.sum(W.count)).select_from(W).join(Source, Source.id == W.source_id)
+            .where(Source.kind == KEV_KIND, W.week >= since_week).group_by(W.week).order_by(W.week))],
+    }
@@ -0,0 +1,73 @@
+# Database-driven per-source polling: due-source selection, jittered backoff, overlap locks.
+import random
+from datetime import datetime, timedelta
+from typing import List
+from redis.lock import Lock
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from .kv import get_redis
+from .models import Source
+
+DEFAULT_INTERVAL = 900
+JITTER = 0.1  # +/- fraction of the delay
+MAX_UNCHANGED_FACTOR = 4  # quiet feeds slow down to at most 4x their interval
+MAX_FAILURE_DELAY = 6 * 3600
+# Longest a single source fetch+ingest may hold its lock before it's considered dead
+LOCK_TTL = 30 * 60
+DISPATCH_BATCH = 200
+
+def next_delay(interval: int | None, fail_count: int = 0, unchanged_count: int = 0) -> float:
+    """Seconds until the next poll: exponential on failures, gentle linear backoff on no-change."""
+    interval = interval or DEFAULT_INTERVAL
+    if fail_count:
+        delay = min(interval * (2 ** fail_count), MAX_FAILURE_DELAY)
+    else:
+        delay = interval * min(1 + 0.5 * unchanged_count, MAX_UNCHANGED_FACTOR)
+    return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+def claim_due(db: Session, now: datetime | None = None, limit: int = DISPATCH_BATCH) -> List[int]:
+    """
+    Return ids of enabled sources whose `next_poll_at` has passed and lease them for one
+    interval, so a second dispatcher tick doesn't enqueue them again. Sources never
+    scheduled get a random start inside their first interval instead.
+    """
+    now = now or datetime.utcnow()
+    rows = db.execute(
+        select(Source)
+        .where(Source.enabled == True, or_(Source.next_poll_at.is_(None), Source.next_poll_at <= now))
+        .order_by(Source.next_poll_at.nulls_first())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    due: List[int] = []
+    for s in rows:
+        interval = s.poll_interval_seconds or DEFAULT_INTERVAL
+        if s.next_poll_at is None:
+            s.next_poll_at = now + timedelta(seconds=random.uniform(0, min(interval, 300)))
+            continue
+        s.next_poll_at = now + timedelta(seconds=interval)
+        due.append(s.id)
+    db.commit()
+    return due
+
+def record_outcome(db: Session, source_id: int, outcome: str, now: datetime | None = None):
+    """Update counters and `next_poll_at` after a poll. `outcome` is changed | unchanged | failed."""
+    now = now or datetime.utcnow()
+    s = db.get(Source, source_id)
+    if s is None:
+        return
+    if outcome == "failed":
+        s.fail_count = (s.fail_count or 0) + 1
+    else:
+        s.fail_count = 0
+        s.unchanged_count = (s.unchanged_count or 0) + 1 if outcome == "unchanged" else 0
+    s.last_polled_at = now
+    s.next_poll_at = now + timedelta(seconds=next_delay(s.poll_interval_seconds, s.fail_count, s.unchanged_count))
+    db.commit()
+
+def mark_all_due(db: Session):
+    db.execute(Source.__table__.update().where(Source.enabled == True).values(next_poll_at=datetime.utcnow()))
+    db.commit()
+
+def source_lock(source_id: int) -> Lock:
+    return get_redis().lock(f"lock:source:{source_id}", timeout=LOCK_TTL, blocking=False)
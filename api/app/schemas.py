@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Optional, List
 
 class ItemOut(BaseModel):
     id: int
@@ -12,3 +13,106 @@ class ItemOut(BaseModel):
 class SearchResponse(BaseModel):
     items: List[ItemOut]
     count: int
+    # Opaque keyset cursor for the next page; None on the last page and for ranked searches
+    next_cursor: Optional[str] = None
+
+class IOCOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    item_id: Optional[int]
+    type: Optional[str]
+    value: Optional[str]
+    context: Optional[dict[str, Any]]
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    sighting_count: int = 1
+
+class IOCPage(BaseModel):
+    iocs: List[IOCOut]
+    count: int
+    next_cursor: Optional[str] = None
+
+class LookupRequest(BaseModel):
+    # IOC type -> observed values, e.g. {"ip": [...], "domain": [...], "sha256": [...]}
+    iocs: dict[str, List[str]]
+    # Also match IOCs only ever extracted from report text (lower confidence)
+    include_extracted: bool = False
+
+class LookupResponse(BaseModel):
+    matches: List[IOCOut]
+    checked: int
+    matched: int
+
+class TypeCount(BaseModel):
+    type: str
+    count: int
+
+class MalwareCount(BaseModel):
+    malware: str
+    count: int
+
+class SourceCount(BaseModel):
+    source: str
+    count: int
+
+class DayCount(BaseModel):
+    day: str
+    count: int
+
+class WeekCount(BaseModel):
+    week: str  # Monday of the week
+    count: int
+
+class StatsResponse(BaseModel):
+    # New IOCs bucketed by first-seen day; totals are all time, by_day covers the requested days
+    iocs_total: int
+    iocs_by_type: List[TypeCount]
+    iocs_by_malware: List[MalwareCount]
+    iocs_by_source: List[SourceCount]
+    iocs_by_day: List[DayCount]
+    kev_weekly: List[WeekCount]
+
+class WatchEntryIn(BaseModel):
+    kind: str  # cidr | domain | hash | malware
+    value: str
+    note: Optional[str] = None
+
+class WatchEntriesIn(BaseModel):
+    entries: List[WatchEntryIn]
+
+class WatchEntryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    kind: str
+    value: str
+    note: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class WatchEntryPage(BaseModel):
+    entries: List[WatchEntryOut]
+    count: int
+    next_cursor: Optional[str] = None
+
+class WatchEntriesCreated(BaseModel):
+    created: List[WatchEntryOut]
+    # Entries in the request that were already on the watchlist
+    existing: int
+
+class WatchHitOut(BaseModel):
+    id: int
+    entry_id: int
+    kind: str
+    watch_value: str
+    ioc_id: int
+    type: Optional[str]
+    value: Optional[str]
+    item_id: Optional[int]
+    source_id: Optional[int]
+    matched_at: Optional[datetime]
+
+class WatchHitPage(BaseModel):
+    hits: List[WatchHitOut]
+    count: int
+    next_cursor: Optional[str] = None
@@ -1,19 +1,196 @@
-# Minimal search shim – in MVP we just read from DB and allow future Meilisearch wiring.
+# Item search: Postgres full-text by default, Meilisearch when configured and reachable.
+import asyncio, time
+from typing import Any, Dict, List, Tuple
+import requests
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, desc
-from .models import Item, Source
+from sqlalchemy import select, func, desc, literal, union_all
+from .models import Item, Source, IOC, IngestCheckpoint
+from .settings import settings
+from .cache import acached_json, bump_generation, cached_json
+
+# Rank only the newest matches; keeps common terms from ranking millions of rows
+CANDIDATE_LIMIT = 1000
+MEILI_INDEX = "items"
+MEILI_CHECKPOINT = "meili-items"
+
+def _row(it: Item, sname: str | None) -> Dict[str, Any]:
+    return {
+        "id": it.id,
+        "title": it.title,
+        "canonical_url": it.canonical_url,
+        "published_at": it.published_at.isoformat() if it.published_at else None,
+        "source": sname,
+        "summary_short": it.summary_short
+    }
+
+def _hydrate_stmt(ids: List[int]):
+    return select(Item, Source.name).join(Source, Item.source_id == Source.id).where(Item.id.in_(ids))
+
+def _in_order(ids: List[int], rows) -> List[Dict[str, Any]]:
+    by_id = {it.id: _row(it, sname) for it, sname in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+def _hydrate(db: Session, ids: List[int]) -> List[Dict[str, Any]]:
+    if not ids:
+        return []
+    return _in_order(ids, db.execute(_hydrate_stmt(ids)).all())
+
+def newest_stmt(limit: int):
+    return (select(Item, Source.name).join(Source, Item.source_id == Source.id)
+            .order_by(desc(Item.published_at).nulls_last(), desc(Item.id)).limit(limit))
+
+class PostgresBackend:
+    name = "postgres"
+
+    def search_ids(self, db: Session, q: str, limit: int) -> List[int]:
+        return list(db.execute(self.stmt(q, limit)).scalars())
+
+    def stmt(self, q: str, limit: int):
+        tsq = func.websearch_to_tsquery("english", q)
+        text_hits = (
+            select(Item.id.label("id"), Item.published_at.label("published_at"),
+                   func.ts_rank_cd(Item.search_vector, tsq).label("rank"))
+            .where(Item.search_vector.op("@@")(tsq))
+            .order_by(desc(Item.published_at).nulls_last(), desc(Item.id))
+            .limit(CANDIDATE_LIMIT)
+        )
+        # Exact IOC value hits outrank any text match
+        ioc_hits = (
+            select(IOC.item_id.label("id"), Item.published_at.label("published_at"), literal(1e6).label("rank"))
+            .join(Item, Item.id == IOC.item_id)
+            .where(IOC.value == q.strip())
+        )
+        hits = union_all(text_hits, ioc_hits).subquery()
+        return (
+            select(hits.c.id)
+            .group_by(hits.c.id, hits.c.published_at)
+            .order_by(desc(func.max(hits.c.rank)), desc(hits.c.published_at))
+            .limit(limit)
+        )
+
+class MeiliBackend:
+    name = "meili"
+
+    def __init__(self, url: str = settings.MEILI_URL, api_key: str | None = settings.MEILI_API_KEY):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def healthy(self) -> bool:
+        try:
+            return self.session.get(f"{self.url}/health", timeout=0.5).ok
+        except requests.RequestException:
+            return False
+
+    def search_ids(self, db: Session, q: str, limit: int) -> List[int]:
+        r = self.session.post(f"{self.url}/indexes/{MEILI_INDEX}/search",
+                              json={"q": q, "limit": limit, "attributesToRetrieve": ["id"]}, timeout=5)
+        r.raise_for_status()
+        return [h["id"] for h in r.json().get("hits", [])]
+
+    def configure(self):
+        self.session.patch(f"{self.url}/indexes/{MEILI_INDEX}/settings", json={
+            "searchableAttributes": ["title", "iocs", "text"],
+            "sortableAttributes": ["published_at"],
+        }, timeout=10).raise_for_status()
+
+    def index(self, docs: List[Dict[str, Any]]):
+        r = self.session.post(f"{self.url}/indexes/{MEILI_INDEX}/documents?primaryKey=id", json=docs, timeout=30)
+        r.raise_for_status()
+
+_postgres = PostgresBackend()
+_meili: MeiliBackend | None = None
+_probe: Tuple[float, bool] = (0.0, False)
+
+def get_backend():
+    global _meili, _probe
+    mode = (settings.SEARCH_BACKEND or "auto").lower()
+    if mode == "postgres":
+        return _postgres
+    if _meili is None:
+        _meili = MeiliBackend()
+    if mode == "meili":
+        return _meili
+    # auto: re-probe Meilisearch at most once a minute
+    checked_at, ok = _probe
+    if time.monotonic() - checked_at > 60:
+        ok = _meili.healthy()
+        _probe = (time.monotonic(), ok)
+    return _meili if ok else _postgres
 
 def search_items(db: Session, q: str | None = None, limit: int = 50):
-    stmt = select(Item, Source.name).join(Source, Item.source_id == Source.id).order_by(desc(Item.published_at)).limit(limit)
-    rows = db.execute(stmt).all()
-    out = []
-    for it, sname in rows:
-        out.append({
-            "id": it.id,
-            "title": it.title,
-            "canonical_url": it.canonical_url,
-            "published_at": it.published_at.isoformat() if it.published_at else None,
-            "source": sname,
-            "summary_short": it.summary_short
-        })
+    q = (q or "").strip()
+    if not q:
+        out = [_row(it, sname) for it, sname in db.execute(newest_stmt(limit)).all()]
+        return out, len(out)
+    def run():
+        backend = get_backend()
+        try:
+            ids = backend.search_ids(db, q, limit)
+        except requests.RequestException:
+            # Meilisearch went away between probes; Postgres can always answer
+            ids = _postgres.search_ids(db, q, limit)
+        return _hydrate(db, ids)
+    # Shared by /items and /api/items; dropped when ingest bumps the cache generation
+    out = cached_json("search", [q, limit], run)
     return out, len(out)
+
+async def search_items_async(db, q: str | None = None, limit: int = 50):
+    """`search_items` on an AsyncSession; Meilisearch calls go to a worker thread."""
+    q = (q or "").strip()
+    if not q:
+        out = [_row(it, sname) for it, sname in (await db.execute(newest_stmt(limit))).all()]
+        return out, len(out)
+    async def run():
+        # get_backend may run the blocking Meilisearch health probe; keep it off the event loop
+        backend = await asyncio.to_thread(get_backend)
+        ids = None
+        if backend is not _postgres:
+            try:
+                ids = await asyncio.to_thread(backend.search_ids, None, q, limit)
+            except requests.RequestException:
+                pass
+        if ids is None:
+            ids = list((await db.execute(_postgres.stmt(q, limit))).scalars())
+        return _in_order(ids, (await db.execute(_hydrate_stmt(ids))).all()) if ids else []
+    out = await acached_json("search", [q, limit], run)
+    return out, len(out)
+
+def sync_meili_index(db: Session, batch: int = 1000, max_iocs: int = 200) -> int:
+    """Push items newer than the last indexed id to Meilisearch. Returns documents sent."""
+    meili = MeiliBackend()
+    if not meili.healthy():
+        return 0
+    cp = db.get(IngestCheckpoint, MEILI_CHECKPOINT)
+    if cp is None:
+        meili.configure()
+        cp = IngestCheckpoint(name=MEILI_CHECKPOINT, position=0, completed=False)
+        db.add(cp)
+    sent = 0
+    while True:
+        rows = db.execute(
+            select(Item, Source.name).join(Source, Item.source_id == Source.id)
+            .where(Item.id > cp.position).order_by(Item.id).limit(batch)
+        ).all()
+        if not rows:
+            break
+        ids = [it.id for it, _ in rows]
+        iocs: Dict[int, List[str]] = {}
+        for item_id, value in db.execute(select(IOC.item_id, IOC.value).where(IOC.item_id.in_(ids))):
+            vals = iocs.setdefault(item_id, [])
+            if len(vals) < max_iocs:
+                vals.append(value)
+        meili.index([{
+            **_row(it, sname),
+            "published_at": int(it.published_at.timestamp()) if it.published_at else None,
+            "text": (it.text or "")[:65536],
+            "iocs": iocs.get(it.id, []),
+        } for it, sname in rows])
+        cp.position = ids[-1]
+        db.commit()
+        sent += len(rows)
+    if sent:
+        # Cached Meilisearch results predate these documents
+        bump_generation()
+    return sent
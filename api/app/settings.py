@@ -7,17 +7,35 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = "db"
     POSTGRES_PORT: int = 5432
 
+    # Per-process connection pool (sync engine, and the async one when ASYNC_DB is on)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    # Serve the HTML pages from async handlers on an asyncpg engine
+    ASYNC_DB: bool = False
+
     REDIS_URL: str = "redis://redis:6379/0"
 
+    # Celery workers serve Prometheus metrics here (the API uses /metrics)
+    WORKER_METRICS_PORT: int = 9808
+    # OpenTelemetry spans per pipeline stage; needs opentelemetry-api/sdk installed
+    OTEL_TRACING: bool = False
+
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
 
     MEILI_URL: str = "http://search:7700"
     MEILI_API_KEY: str | None = None
+    # postgres | meili | auto (meili when MEILI_URL answers its health check)
+    SEARCH_BACKEND: str = "auto"
 
     OTX_API_KEY: str | None = None
 
     THREATFOX_API_KEY: str | None = None
     THREATFOX_AUTH_KEY: str | None = None
+    # Override the abuse.ch export URLs (full zip, 48h recent), e.g. for a local mirror or bench fixtures
+    THREATFOX_EXPORT_URL: str | None = None
+    THREATFOX_EXPORT_RECENT_URL: str | None = None
 
 settings = Settings()
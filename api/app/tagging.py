@@ -0,0 +1,78 @@
+# Item labels: ATT&CK techniques and tags found at ingest (see app.ingest.tagger), stored as
+# item_techniques / item_tags rows so listings filter on them with an indexed join. Vocabulary
+# rows are created on first use; association rows go in as multi-row ON CONFLICT DO NOTHING.
+from typing import Any, Dict, Iterable, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .ingest.tagger import context_tags, match_text, vocabulary
+from .models import Item, ItemTag, ItemTechnique, Tag, Technique
+
+# Rows per multi-row INSERT, as in app.bulk
+CHUNK_SIZE = 1000
+
+Labels = Tuple[Set[str], Set[str]]  # (ATT&CK ids, tag names)
+
+def _chunked(rows, size: int = CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def labels_for(n: Dict[str, Any]) -> Labels:
+    """Techniques and tags of a normalized item: its title and text, plus tags carried by its IOCs."""
+    techniques, tags = match_text("\n".join(s for s in (n.get("title"), n.get("text")) if s))
+    tags |= context_tags(i.get("context") for i in n.get("iocs") or ())
+    return techniques, tags
+
+def _technique_ids(db: Session, attack_ids: Set[str]) -> Dict[str, int]:
+    if not attack_ids:
+        return {}
+    known = vocabulary()[0]
+    # Sorted, so concurrent batches take the unique-index locks in the same order
+    rows = [{"attack_id": a, "name": known[a]["name"], "tactic": known[a]["tactic"]} for a in sorted(attack_ids)]
+    db.execute(pg_insert(Technique).values(rows).on_conflict_do_nothing(index_elements=["attack_id"]))
+    return dict(db.execute(select(Technique.attack_id, Technique.id).where(Technique.attack_id.in_(attack_ids))).all())
+
+def _tag_ids(db: Session, names: Set[str]) -> Dict[str, int]:
+    ids: Dict[str, int] = {}
+    for part in _chunked(sorted(names)):
+        db.execute(pg_insert(Tag).values([{"name": n} for n in part]).on_conflict_do_nothing(index_elements=["name"]))
+        ids.update(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(part))).all())
+    return ids
+
+def write_labels(db: Session, labels: Dict[int, Labels]) -> Tuple[int, int]:
+    """
+    Store {item_id: (ATT&CK ids, tag names)} in a few statements, in the caller's transaction.
+    Returns (item_techniques rows inserted, item_tags rows inserted).
+    """
+    technique_ids = _technique_ids(db, set().union(*(t for t, _ in labels.values())))
+    tag_ids = _tag_ids(db, set().union(*(g for _, g in labels.values())))
+    t_rows = [{"item_id": i, "technique_id": technique_ids[a]}
+              for i, (ts, _) in sorted(labels.items()) for a in sorted(ts) if a in technique_ids]
+    g_rows = [{"item_id": i, "tag_id": tag_ids[g]}
+              for i, (_, gs) in sorted(labels.items()) for g in sorted(gs) if g in tag_ids]
+    added_t = added_g = 0
+    for part in _chunked(t_rows):
+        added_t += db.execute(pg_insert(ItemTechnique).values(part).on_conflict_do_nothing()).rowcount
+    for part in _chunked(g_rows):
+        added_g += db.execute(pg_insert(ItemTag).values(part).on_conflict_do_nothing()).rowcount
+    return added_t, added_g
+
+def tag_stored(db: Session, batch: int = 500) -> Tuple[int, int]:
+    """
+    Label every stored item from its title and text: one-off after upgrading, or after the
+    vocabulary grows. Tags from IOC contexts are only picked up at ingest. Returns rows added.
+    """
+    added_t = added_g = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Item.id, Item.title, Item.text).where(Item.id > last_id).order_by(Item.id).limit(batch)
+        ).all()
+        if not rows:
+            return added_t, added_g
+        last_id = rows[-1][0]
+        labels = {item_id: match_text("\n".join(s for s in (title, text) if s)) for item_id, title, text in rows}
+        t, g = write_labels(db, {i: l for i, l in labels.items() if l[0] or l[1]})
+        added_t += t
+        added_g += g
+        db.commit()
@@ -0,0 +1,17 @@
+# Task client for the web process: enqueue worker tasks by name without importing app.workers
+# (and with it the ingestors, feedparser, lxml, ijson ...). Celery itself loads on first use.
+from typing import Any
+from .settings import settings
+
+_client = None
+
+def _celery():
+    global _client
+    if _client is None:
+        from celery import Celery
+        _client = Celery("app.workers", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+    return _client
+
+def send(name: str, **kwargs: Any):
+    """Enqueue `name` (e.g. "app.workers.task_dispatch_due") with keyword args."""
+    return _celery().send_task(name, kwargs=kwargs)
@@ -3,11 +3,19 @@ from fastapi.responses import HTMLResponse
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import pathlib
 
+_loader = FileSystemLoader(str(pathlib.Path(__file__).parent / "templates"))
+
 env = Environment(
-    loader=FileSystemLoader(str(pathlib.Path(__file__).parent / "templates")),
+    loader=_loader,
     autoescape=select_autoescape()
 )
+# Same templates, rendered with `render_async` by the async page handlers
+async_env = Environment(loader=_loader, autoescape=select_autoescape(), enable_async=True)
 
 def render(name: str, ctx: dict) -> HTMLResponse:
     tmpl = env.get_template(name)
     return HTMLResponse(tmpl.render(**ctx))
+
+async def render_async(name: str, ctx: dict) -> HTMLResponse:
+    tmpl = async_env.get_template(name)
+    return HTMLResponse(await tmpl.render_async(**ctx))
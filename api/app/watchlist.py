@@ -0,0 +1,177 @@
+# Watchlists: analyst-defined CIDRs, domain suffixes, hashes and malware families, matched
+# against every IOC batch at ingest. Matches are stored in watch_hits, one per (entry, IOC).
+#
+# Entries are compiled into in-memory lookups once per process and recompiled when the table
+# changes. Entries are never edited in place (create/delete only), so (count, max id) is enough
+# to notice a change without a version column.
+import ipaddress, re, socket
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .ingest.ioc_norm import reverse_domain
+from .ingest.tagger import phrase_key
+from .models import IOC, WatchEntry, WatchHit
+
+KINDS = ("cidr", "domain", "hash", "malware")
+HASH_TYPES = {"md5": 32, "sha1": 40, "sha256": 64}
+CHUNK_SIZE = 1000
+
+_HEX = re.compile(r"[0-9a-f]+")
+_LABEL = re.compile(r"[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?")
+# Malpedia-style platform prefix on ThreatFox `malware` (win.cobalt_strike)
+_PLATFORM = re.compile(r"^(?:win|elf|osx|apk|ios|jar|js|php|ps1|py|sh|vbs|asp|aspx)\.")
+
+@lru_cache(maxsize=4096)
+def malware_key(name: str) -> str:
+    # Cached: a feed repeats a few hundred family names across millions of rows
+    return phrase_key(_PLATFORM.sub("", name.strip().lower()))
+
+def normalize_entry(kind: str, value: str) -> str:
+    """Canonical stored value for a watch entry; ValueError if it doesn't parse for its kind."""
+    value = (value or "").strip()
+    if kind == "cidr":
+        return str(ipaddress.ip_network(value, strict=False))
+    if kind == "domain":
+        d = value.lower().strip(".")
+        d = d[2:] if d.startswith("*.") else d
+        if not d or len(d) > 253 or not all(_LABEL.fullmatch(l) for l in d.split(".")):
+            raise ValueError(f"invalid domain: {value!r}")
+        return d
+    if kind == "hash":
+        h = value.lower()
+        if len(h) not in HASH_TYPES.values() or not _HEX.fullmatch(h):
+            raise ValueError(f"invalid md5/sha1/sha256: {value!r}")
+        return h
+    if kind == "malware":
+        m = malware_key(value)
+        if not m or len(m) > 128:
+            raise ValueError(f"invalid malware name: {value!r}")
+        return m
+    raise ValueError(f"unknown kind {kind!r}, expected one of {', '.join(KINDS)}")
+
+def _ip_key(ip: str) -> Optional[Tuple[int, int, int]]:
+    # (version, address as int, prefix length); `ip` is IOC.ip as typed_columns renders it
+    if "/" not in ip and ":" not in ip:
+        try:
+            return 4, int.from_bytes(socket.inet_aton(ip), "big"), 32
+        except OSError:
+            return None
+    try:
+        iface = ipaddress.ip_interface(ip)
+    except ValueError:
+        return None
+    return iface.version, int(iface.network.network_address), iface.network.prefixlen
+
+class Watchlist:
+    """
+    Compiled entries. IP prefixes live in one hash table per prefix length in use, so a lookup
+    is one probe per distinct length (at most 33 for IPv4) — the same answer a radix tree
+    gives, at dict speed. Domains sit in a trie of reversed labels, hashes and malware names
+    in dicts. `match` returns the ids of every entry an IOC falls under.
+    """
+    def __init__(self, entries: Iterable[Tuple[int, str, str]]):
+        self.nets: Dict[int, Dict[int, Dict[int, List[int]]]] = {4: {}, 6: {}}
+        self.domains: Dict[str, Any] = {}
+        self.hashes: Dict[str, List[int]] = {}
+        self.malware: Dict[str, List[int]] = {}
+        self.size = 0
+        for entry_id, kind, value in entries:
+            self.size += 1
+            if kind == "cidr":
+                net = ipaddress.ip_network(value, strict=False)
+                bits = net.max_prefixlen
+                table = self.nets[net.version].setdefault(net.prefixlen, {})
+                table.setdefault(int(net.network_address) >> (bits - net.prefixlen), []).append(entry_id)
+            elif kind == "domain":
+                node = self.domains
+                for label in reversed(value.split(".")):
+                    node = node.setdefault(label, {})
+                node.setdefault("", []).append(entry_id)
+            elif kind == "hash":
+                self.hashes.setdefault(value, []).append(entry_id)
+            elif kind == "malware":
+                self.malware.setdefault(value, []).append(entry_id)
+        # Every covering prefix is a hit, so lengths are probed shortest first and all of them
+        self.prefixlens = {v: sorted(t) for v, t in self.nets.items()}
+
+    def _ip(self, ip: str) -> List[int]:
+        key = _ip_key(ip)
+        if key is None:
+            return []
+        version, addr, plen = key
+        bits = 32 if version == 4 else 128
+        tables = self.nets[version]
+        out: List[int] = []
+        for p in self.prefixlens[version]:
+            if p > plen:
+                break
+            hit = tables[p].get(addr >> (bits - p))
+            if hit:
+                out += hit
+        return out
+
+    def _domain(self, domain_rev: str) -> List[int]:
+        out: List[int] = []
+        node = self.domains
+        for label in domain_rev.rstrip(".").split("."):
+            node = node.get(label)
+            if node is None:
+                break
+            if "" in node:
+                out += node[""]
+        return out
+
+    def match(self, t: str, value: str, typed: Dict[str, Any], context: Optional[Dict[str, Any]]) -> List[int]:
+        """Entry ids hit by one IOC; `typed` is its typed_columns (ip / domain_rev)."""
+        out: List[int] = []
+        if self.prefixlens[4] or self.prefixlens[6]:
+            if typed.get("ip"):
+                out += self._ip(typed["ip"])
+        if self.domains:
+            rev = typed.get("domain_rev")
+            if rev is None and t == "email" and "@" in value:
+                rev = reverse_domain(value.rsplit("@", 1)[1])
+            if rev:
+                out += self._domain(rev)
+        if self.hashes and t in HASH_TYPES:
+            out += self.hashes.get(value.lower(), ())
+        if self.malware and context:
+            names = {malware_key(n) for n in (context.get("malware"), context.get("malware_printable"))
+                     if isinstance(n, str) and n}
+            for name in names:
+                out += self.malware.get(name, ())
+        return out
+
+_compiled: Optional[Tuple[Tuple[int, int], Watchlist]] = None
+
+def current(db: Session) -> Optional[Watchlist]:
+    """The compiled watchlist, rebuilt if entries were added or removed; None when it's empty."""
+    global _compiled
+    version = tuple(db.execute(select(func.count(), func.coalesce(func.max(WatchEntry.id), 0))).one())
+    if _compiled is None or _compiled[0] != version:
+        rows = db.execute(select(WatchEntry.id, WatchEntry.kind, WatchEntry.value)).all() if version[0] else []
+        _compiled = (version, Watchlist(rows))
+    return _compiled[1] if _compiled[1].size else None
+
+def record_hits(db: Session, hits: List[Dict[str, Any]]) -> int:
+    """Insert {entry_id, ioc_id, item_id, source_id} rows; a repeat of a known (entry, IOC) pair is ignored."""
+    now = datetime.utcnow()
+    rows = sorted(({**h, "matched_at": now} for h in hits), key=lambda h: (h["entry_id"], h["ioc_id"]))
+    added = 0
+    for i in range(0, len(rows), CHUNK_SIZE):
+        added += db.execute(pg_insert(WatchHit).values(rows[i:i + CHUNK_SIZE])
+                            .on_conflict_do_nothing(constraint="watch_hits_entry_ioc_unique")).rowcount
+    return added
+
+def record_matches(db: Session, matches: Dict[Tuple[str, str], List[int]], item_id: int, source_id: int) -> int:
+    """Hits for {(type, value): entry ids} of IOCs that are already stored (the COPY path)."""
+    keys = sorted(matches)
+    hits = []
+    for i in range(0, len(keys), CHUNK_SIZE):
+        part = keys[i:i + CHUNK_SIZE]
+        for ioc_id, t, v in db.execute(select(IOC.id, IOC.type, IOC.value).where(tuple_(IOC.type, IOC.value).in_(part))):
+            hits += [{"entry_id": e, "ioc_id": ioc_id, "item_id": item_id, "source_id": source_id} for e in matches[(t, v)]]
+    return record_hits(db, hits)
@@ -1,84 +1,158 @@
 from celery import Celery
-from datetime import datetime
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
 from sqlalchemy.orm import Session
 from .settings import settings
 from .db import SessionLocal
 from .ingest.rss import fetch_rss
 from .ingest.cisa_kev import fetch_cisa_kev
 from .ingest.threatfox import fetch_threatfox
-from .ingest.threatfox_export import iter_full_export, build_chunks, make_batch_item
-from .models import Source, Item, IOC
-from sqlalchemy import select
-from bs4 import BeautifulSoup
-import hashlib
+from .ingest.threatfox_export import download_export
+from .ingest.http import fetch_many
+from .ingest.html_text import extract_texts
+from .models import Source
+from .bulk import upsert_items
+from .backfill import load_export
+from .search import sync_meili_index
+from .lookup import filter_dirty, rebuild_filter
+from .dedup import backfill_simhash
+from .tagging import tag_stored
+from .rollups import reconcile
+from .cache import bump_generation
+from . import scheduler
+from . import metrics
+from celery.signals import worker_init, worker_process_shutdown
+from redis.exceptions import LockError
+from sqlalchemy import select, update
 
 celery_app = Celery(__name__, broker=settings.REDIS_URL, backend=settings.REDIS_URL)
 celery_app.conf.timezone = "UTC"
 
 # Schedules
 celery_app.conf.beat_schedule = {
-    "rss-every-15min": {
-        "task": "app.workers.task_fetch_rss",
-        "schedule": 15*60
+    # One task per due source, paced by Source.poll_interval_seconds (see app.scheduler)
+    "dispatch-due-sources": {
+        "task": "app.workers.task_dispatch_due",
+        "schedule": 30
     },
-    "kev-hourly": {
-        "task": "app.workers.task_fetch_kev",
-        "schedule": 60*60
+    "ioc-filter-rebuild-daily": {
+        "task": "app.workers.task_rebuild_ioc_filter",
+        "schedule": 24*60*60
     },
-    "threatfox-15min": {
-        "task": "app.workers.task_fetch_threatfox",
-        "schedule": 15*60
+    # Rebuilds early when an ingest couldn't write to Redis (see app.lookup.mark_filter_dirty)
+    "ioc-filter-repair-5min": {
+        "task": "app.workers.task_rebuild_ioc_filter",
+        "schedule": 5*60,
+        "kwargs": {"only_if_dirty": True},
+    },
+    "rollup-reconcile-daily": {
+        "task": "app.workers.task_reconcile_rollups",
+        "schedule": 24*60*60
+    },
+    "search-index-5min": {
+        "task": "app.workers.task_sync_search_index",
+        "schedule": 5*60
     },
 }
 
-def schedule_now():
-    task_fetch_rss.delay()
-    task_fetch_kev.delay()
-    task_fetch_threatfox.delay()
-
-def _upsert_items(db: Session, normalized_items: list[dict], source_id: int):
-    for n in normalized_items:
-        # Simple dedup hash
-        raw = (n.get("title","") + (n.get("canonical_url","") or "")).encode()
-        h = hashlib.sha256(raw).digest()
-        exists = db.execute(select(Item.id).where(Item.hash_sha256==h).limit(1)).scalar_one_or_none()
-        if exists: 
-            continue
-        it = Item(
-            source_id=source_id,
-            canonical_url=n.get("canonical_url"),
-            title=n.get("title"),
-            published_at=n.get("published_at"),
-            fetched_at=datetime.utcnow(),
-            author=n.get("author"),
-            raw=n.get("raw"),
-            text=n.get("text"),
-            hash_sha256=h,
-            summary_short=n.get("summary_short"),
-            lang="en"
-        )
-        db.add(it)
-        # If this item carries IOCs, persist them linked to this item
-        iocs = n.get("iocs") or []
-        if iocs:
-            db.flush()  # ensure it.id is available
-            for i in iocs:
-                try:
-                    io = IOC(item_id=it.id, type=i.get("type"), value=i.get("value"), context=i.get("context"))
-                    db.add(io)
-                except Exception:
-                    # Skip malformed entries rather than failing the batch
-                    continue
+@worker_init.connect
+def _start_metrics(**_):
+    # Parent process serves the metrics of all prefork children (PROMETHEUS_MULTIPROC_DIR)
+    metrics.reset_multiproc_dir()
+    metrics.start_exporter(settings.WORKER_METRICS_PORT)
+
+@worker_process_shutdown.connect
+def _child_exit(pid=None, **_):
+    metrics.mark_process_dead(pid)
+
+def _upsert_items(db: Session, normalized_items: list[dict], source_id: int, extract: bool = False,
+                  near_dupes: bool = False) -> dict:
+    return upsert_items(db, normalized_items, source_id, extract=extract, near_dupes=near_dupes)
+
+def _snapshot(s: Source) -> SimpleNamespace:
+    # Plain copy of a Source for fetch threads, which must never touch the session
+    return SimpleNamespace(**{c.name: getattr(s, c.name) for c in Source.__table__.columns})
+
+def _save_validators(db: Session, snap: SimpleNamespace):
+    # Only called once the fetched body has been ingested, so a failed upsert refetches
+    db.execute(update(Source).where(Source.id == snap.id).values(
+        last_etag=snap.last_etag,
+        last_modified=snap.last_modified,
+        content_hash=snap.content_hash,
+        sync_cursor=snap.sync_cursor,
+    ))
     db.commit()
 
+def _ingest(db: Session, snap: SimpleNamespace, chunks, label: str, extract: bool = False) -> str:
+    # `chunks`: None (unchanged) or an iterable of item lists, each upserted and committed
+    # as it arrives. Returns the scheduler outcome: changed | unchanged
+    if chunks is None:
+        print(f"{label} {snap.name}: unchanged")
+        return "unchanged"
+    totals: Counter = Counter()
+    for items in chunks:
+        if not items:
+            continue
+        with metrics.stage("upsert", snap):
+            stats = _upsert_items(db, items, snap.id, extract=extract, near_dupes=snap.kind in NEAR_DUPE_KINDS)
+        metrics.record_rows(snap, stats)
+        totals.update(stats)
+    if totals:
+        print(f"{label} {snap.name}: {dict(totals)}")
+    else:
+        print(f"{label} {snap.name}: fetch returned 0 items")
+    # Validators and cursors move only once every chunk is in
+    _save_validators(db, snap)
+    return "changed" if totals["items_inserted"] or totals["iocs_inserted"] else "unchanged"
+
+def _ingest_or_fail(db: Session, snap: SimpleNamespace, chunks, label: str, extract: bool = False) -> str:
+    # Streamed fetchers parse while _ingest iterates, so a bad body fails here rather than in
+    # the fetch: roll back and report "failed" so one source never stops the rest
+    try:
+        return _ingest(db, snap, chunks, label, extract=extract)
+    except Exception as e:
+        db.rollback()
+        print(f"{label} {snap.name}: fetch failed: {e!r}")
+        return "failed"
+
+def _fetch_and_upsert(db: Session, sources: list[Source], fetch, label: str, extract: bool = False):
+    # Fetch concurrently; upsert on this thread as each source completes
+    for snap, items, err in fetch_many([_snapshot(s) for s in sources], fetch):
+        if err is not None:
+            print(f"{label} {snap.name}: fetch failed: {err!r}")
+            scheduler.record_outcome(db, snap.id, "failed")
+            continue
+        scheduler.record_outcome(db, snap.id, _ingest_or_fail(db, snap, items, label, extract=extract))
+
+def _fetch_rss_text(snap):
+    # HTML -> text runs as its own stage (process pool + cache) on each fetched feed; a feed
+    # is small enough to be one chunk
+    items = fetch_rss(snap)
+    if items is None:
+        return None
+    with metrics.stage("html_text", snap):
+        return [extract_texts(items)]
+
+# Kinds whose items are linked to near-duplicates (same canonical URL / similar text) instead of
+# stored again. KEV entries are short and templated, so they only get exact, URL-canonical dedup.
+NEAR_DUPE_KINDS = {"rss"}
+
+# kind -> (fetch returning None or chunks of items, log label, extract IOCs from text)
+FETCHERS = {
+    "rss": (_fetch_rss_text, "RSS", True),
+    "json": (fetch_cisa_kev, "KEV", True),
+    # Use a conservative recent window per TF guidance
+    "threatfox": (lambda s: fetch_threatfox(s, days=3), "ThreatFox", False),
+}
+
 @celery_app.task(name="app.workers.task_fetch_rss")
 def task_fetch_rss():
     db = SessionLocal()
     try:
         rss_sources = db.execute(select(Source).where(Source.kind=="rss", Source.enabled==True)).scalars().all()
-        for s in rss_sources:
-            items = fetch_rss(s)
-            _upsert_items(db, items, s.id)
+        fetch, label, extract = FETCHERS["rss"]
+        _fetch_and_upsert(db, rss_sources, fetch, label, extract=extract)
     finally:
         db.close()
 
@@ -87,9 +161,8 @@ def task_fetch_kev():
     db = SessionLocal()
     try:
         kev_sources = db.execute(select(Source).where(Source.kind=="json", Source.name.ilike("%CISA KEV%"))).scalars().all()
-        for s in kev_sources:
-            items = fetch_cisa_kev(s)
-            _upsert_items(db, items, s.id)
+        fetch, label, extract = FETCHERS["json"]
+        _fetch_and_upsert(db, kev_sources, fetch, label, extract=extract)
     finally:
         db.close()
 
@@ -98,23 +171,56 @@ def task_fetch_threatfox():
     db = SessionLocal()
     try:
         tf_sources = db.execute(select(Source).where(Source.kind=="threatfox", Source.enabled==True)).scalars().all()
-        for s in tf_sources:
-            # Use a conservative recent window per TF guidance
-            items = fetch_threatfox(s, days=3)
-            if not items:
-                print("ThreatFox: fetch returned 0 items")
-                continue
-            ioc_count = sum(len(n.get("iocs") or []) for n in items)
-            print(f"ThreatFox: fetched {len(items)} batch item(s), {ioc_count} IOCs")
-            _upsert_items(db, items, s.id)
+        fetch, label, extract = FETCHERS["threatfox"]
+        _fetch_and_upsert(db, tf_sources, fetch, label, extract=extract)
+    finally:
+        db.close()
+
+@celery_app.task(name="app.workers.task_dispatch_due")
+def task_dispatch_due(force: bool = False):
+    db = SessionLocal()
+    try:
+        if force:
+            scheduler.mark_all_due(db)
+        due = scheduler.claim_due(db)
+    finally:
+        db.close()
+    for source_id in due:
+        task_fetch_source.delay(source_id)
+    return f"dispatched {len(due)} source(s)"
+
+@celery_app.task(name="app.workers.task_fetch_source")
+def task_fetch_source(source_id: int):
+    lock = scheduler.source_lock(source_id)
+    if not lock.acquire():
+        # Previous run of this source still going; its outcome sets the next poll
+        return "busy"
+    db = SessionLocal()
+    try:
+        src = db.get(Source, source_id)
+        if src is None or not src.enabled or src.kind not in FETCHERS:
+            return "skipped"
+        fetch, label, extract = FETCHERS[src.kind]
+        snap = _snapshot(src)
+        try:
+            chunks = fetch(snap)
+        except Exception as e:
+            print(f"{label} {snap.name}: fetch failed: {e!r}")
+            outcome = "failed"
+        else:
+            outcome = _ingest_or_fail(db, snap, chunks, label, extract=extract)
+        scheduler.record_outcome(db, source_id, outcome)
+        return outcome
     finally:
         db.close()
+        try:
+            lock.release()
+        except LockError:
+            pass
 
 @celery_app.task(name="app.workers.task_threatfox_backfill_full")
 def task_threatfox_backfill_full():
-    import os
     db = SessionLocal()
-    total = 0
     try:
         src = db.execute(
             select(Source).where(Source.kind=="threatfox", Source.name.ilike("%ThreatFox%"))
@@ -122,30 +228,62 @@ def task_threatfox_backfill_full():
         if not src:
             return "no ThreatFox source found"
 
-        for chunk in build_chunks(iter_full_export(), size=500):
-            batch = make_batch_item(count=len(chunk))
-            it = Item(
-                source_id=src.id,
-                canonical_url=batch["canonical_url"],
-                title=batch["title"],
-                published_at=batch["published_at"],
-                fetched_at=datetime.utcnow(),
-                author=batch["author"],
-                raw=batch["raw"],
-                text=batch["text"],
-                summary_short=batch["summary_short"],
-                lang="en",
-                hash_sha256=os.urandom(32)
-            )
-            db.add(it)
-            db.flush()
-            for ioc in chunk:
-                t = (ioc.get("type") or "").lower()
-                if t not in ("ip","domain","url","sha256","sha1","md5","email"):
-                    continue
-                db.add(IOC(item_id=it.id, type=t, value=ioc.get("value"), context=ioc.get("context")))
-            db.commit()
-            total += len(chunk)
-        return f"backfill done: {total} IOCs"
+        # Download to a temp file to avoid memory spikes; its hash keys the resume checkpoint
+        with tempfile.NamedTemporaryFile(suffix=".zip") as tmp:
+            fingerprint = download_export(tmp.name)
+            res = load_export(db, tmp.name, fingerprint, src.id)
+        return f"backfill {res['status']}: {res['position']} export rows, {res['inserted']} new IOCs"
+    finally:
+        db.close()
+
+@celery_app.task(name="app.workers.task_sync_search_index")
+def task_sync_search_index():
+    # No-op unless Meilisearch is reachable; Postgres search needs no indexing job
+    db = SessionLocal()
+    try:
+        return f"indexed {sync_meili_index(db)} item(s)"
+    finally:
+        db.close()
+
+@celery_app.task(name="app.workers.task_rebuild_ioc_filter")
+def task_rebuild_ioc_filter(only_if_dirty: bool = False):
+    db = SessionLocal()
+    try:
+        if only_if_dirty and filter_dirty(db) is None:
+            return "ioc filter clean"
+        return f"ioc filter rebuilt: {rebuild_filter(db)} values"
+    finally:
+        db.close()
+
+@celery_app.task(name="app.workers.task_backfill_simhash")
+def task_backfill_simhash():
+    # One-off after upgrading: lets new feed items match ones stored before near-dup detection
+    db = SessionLocal()
+    try:
+        return f"simhash backfilled: {backfill_simhash(db, kinds=tuple(NEAR_DUPE_KINDS))} item(s)"
+    finally:
+        db.close()
+
+@celery_app.task(name="app.workers.task_tag_stored")
+def task_tag_stored():
+    # One-off after upgrading (or growing app/ingest/data/attack.json): labels items stored before
+    db = SessionLocal()
+    try:
+        techniques, tags = tag_stored(db)
+    finally:
+        db.close()
+    if techniques or tags:
+        bump_generation()
+    return f"items labelled: {techniques} technique row(s), {tags} tag row(s)"
+
+@celery_app.task(name="app.workers.task_reconcile_rollups")
+def task_reconcile_rollups():
+    # Rollups are kept by ingest deltas; this recount only catches drift
+    db = SessionLocal()
+    try:
+        drift = reconcile(db)
     finally:
         db.close()
+    if drift:
+        bump_generation()
+    return f"rollups reconciled: {drift} bucket(s) corrected"
@@ -0,0 +1 @@
+# benchmarks; run from api/ as `python -m bench.<name>`
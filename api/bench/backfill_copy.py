@@ -0,0 +1,41 @@
+# Rows/sec of the COPY-based full-export backfill against a local fixture zip.
+# Needs a disposable Postgres reachable through the usual POSTGRES_* settings.
+import argparse, hashlib, json, os, tempfile, time
+from sqlalchemy import delete, select
+from app.db import SessionLocal, init_db
+from app.backfill import CHECKPOINT_NAME, load_export
+from app.models import IngestCheckpoint, Source
+from .fixtures import write_threatfox_export_zip
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--zip", help="reuse an existing export zip instead of generating one")
+    args = ap.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.zip or write_threatfox_export_zip(os.path.join(tmp, "full.zip"), args.rows)
+        with open(path, "rb") as fh:
+            fingerprint = hashlib.sha256(fh.read()).hexdigest()
+        src = db.execute(select(Source).where(Source.kind == "threatfox")).scalars().first()
+        if not src:
+            src = Source(name="ThreatFox (bench)", kind="threatfox", endpoint="http://localhost/")
+            db.add(src); db.commit()
+        db.execute(delete(IngestCheckpoint).where(IngestCheckpoint.name == CHECKPOINT_NAME)); db.commit()
+
+        t0 = time.perf_counter()
+        res = load_export(db, path, fingerprint, src.id)
+        elapsed = time.perf_counter() - t0
+    db.close()
+    print(json.dumps({
+        "bench": "backfill_copy",
+        "rows": res["position"],
+        "inserted": res["inserted"],
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(res["position"] / elapsed, 1) if elapsed else None,
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Compare two bench.pipeline result files (e.g. before/after a change) stage by stage.
+# Prints one JSON line per stage with new/old ratios; exits 1 if any stage's throughput
+# drops or its peak RSS grows by more than --tolerance.
+import argparse, json, sys
+
+METRICS = (("items_per_s", True), ("iocs_per_s", True), ("seconds", False), ("peak_rss_mb", False))
+
+def _ratio(new, old):
+    return round(new / old, 3) if new is not None and old else None
+
+def compare(old: dict, new: dict, tolerance: float) -> tuple[list, bool]:
+    rows, regressed = [], False
+    for stage in new["stages"]:
+        a, b = old["stages"].get(stage) or {}, new["stages"][stage]
+        row = {"stage": stage}
+        if "error" in b:
+            rows.append({**row, "error": b["error"]})
+            regressed = True
+            continue
+        for key, higher_is_better in METRICS:
+            r = _ratio(b.get(key), a.get(key))
+            row[key] = {"old": a.get(key), "new": b.get(key), "ratio": r}
+            if r is None or key == "seconds":
+                continue
+            if (higher_is_better and r < 1 - tolerance) or (not higher_is_better and r > 1 + tolerance):
+                row.setdefault("regressed", []).append(key)
+                regressed = True
+        rows.append(row)
+    return rows, regressed
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    args = ap.parse_args()
+    with open(args.old) as fh:
+        old = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+    if old.get("sizes") != new.get("sizes"):
+        print(json.dumps({"warning": "fixture sizes differ", "old": old.get("sizes"), "new": new.get("sizes")}))
+    rows, regressed = compare(old, new, args.tolerance)
+    for row in rows:
+        print(json.dumps({"bench": "compare", "old": old.get("git_sha"), "new": new.get("git_sha"), **row}))
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# Near-duplicate detection throughput with a large items table (default 1M signed items).
+# Needs a disposable Postgres reachable through the usual POSTGRES_* settings. The first run
+# COPYs --stored synthetic items under a "bench-dedup" source; later runs reuse them.
+#
+# Measures app.dedup.split_near_duplicates on batches of new items, a --dupe-ratio of which
+# are light edits of stored texts: items/sec, batch latency, band candidates per batch, and
+# how many planted duplicates were caught versus unrelated items wrongly linked.
+import argparse, hashlib, io, json, random, time
+from sqlalchemy import func, select
+from app.db import SessionLocal, init_db
+from app.dedup import candidates_stmt, split_near_duplicates
+from app.ingest.fingerprint import simhash
+from app.models import Item
+from app.seed import ensure_source
+
+def _text(rnd: random.Random, vocab: list, words: int = 400) -> str:
+    return " ".join(rnd.choice(vocab) for _ in range(words))
+
+def _edit(rnd: random.Random, vocab: list, text: str, edits: int = 2) -> str:
+    words = text.split()
+    for _ in range(edits):
+        words[rnd.randrange(len(words))] = rnd.choice(vocab)
+    return "Originally published elsewhere. " + " ".join(words)
+
+def _seed(db, source_id: int, stored: int, texts: list, chunk: int = 100_000):
+    # Items with text (the ones duplicates are planted against) first, the rest signature-only
+    have = db.execute(select(func.count()).select_from(Item).where(Item.source_id == source_id)).scalar_one()
+    rnd = random.Random(have)
+    for start in range(have, stored, chunk):
+        buf = io.StringIO()
+        for i in range(start, min(start + chunk, stored)):
+            text = texts[i] if i < len(texts) else None
+            sig = simhash(text) if text else rnd.getrandbits(64) - (1 << 63)
+            h = hashlib.sha256(f"bench-dedup:{i}".encode()).hexdigest()
+            buf.write(f"{source_id}\thttps://dedup.bench.local/{i}\tStored {i}\t\\\\x{h}\t{sig}\t{text or chr(92) + 'N'}\n")
+        buf.seek(0)
+        db.connection().connection.cursor().copy_expert("COPY items (source_id, canonical_url, title, hash_sha256, simhash, text) FROM STDIN", buf)
+        db.commit()
+    return max(have, stored)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stored", type=int, default=1_000_000)
+    ap.add_argument("--with-text", type=int, default=5_000, help="stored items that carry real text")
+    ap.add_argument("--batch", type=int, default=50)
+    ap.add_argument("--batches", type=int, default=200)
+    ap.add_argument("--dupe-ratio", type=float, default=0.2)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    init_db()
+    rnd = random.Random(args.seed)
+    vocab = [f"w{i}" for i in range(20_000)]
+    texts = [_text(rnd, vocab) for _ in range(min(args.with_text, args.stored))]
+    db = SessionLocal()
+    try:
+        src = ensure_source(db, "bench-dedup", "rss", "http://dedup.bench.local/feed")
+        t0 = time.perf_counter()
+        stored = _seed(db, src.id, args.stored, texts)
+        seed_s = time.perf_counter() - t0
+
+        lat, candidates = [], 0
+        planted = caught = false_links = 0
+        for b in range(args.batches):
+            fresh, dupes = {}, set()
+            for i in range(args.batch):
+                h = hashlib.sha256(f"bench-dedup:new:{args.seed}:{b}:{i}".encode()).digest()
+                if texts and rnd.random() < args.dupe_ratio:
+                    text = _edit(rnd, vocab, rnd.choice(texts))
+                    dupes.add(h)
+                else:
+                    text = _text(rnd, vocab)
+                fresh[h] = {"canonical_url": f"https://other.bench.local/{b}/{i}", "title": f"New {b}/{i}", "text": text}
+            t = time.perf_counter()
+            aliases = split_near_duplicates(db, fresh)
+            lat.append(time.perf_counter() - t)
+            sigs = [n["simhash"] for n in fresh.values() if n["simhash"] is not None]
+            candidates += len(db.execute(candidates_stmt(sigs)).all()) if sigs else 0
+            planted += len(dupes)
+            caught += len(dupes & aliases.keys())
+            false_links += len(aliases.keys() - dupes)
+            db.rollback()
+    finally:
+        db.close()
+
+    lat.sort()
+    total = sum(lat)
+    print(json.dumps({
+        "bench": "dedup",
+        "stored_items": stored,
+        "seed_s": round(seed_s, 1),
+        "batch": args.batch,
+        "items_per_s": round(args.batch * len(lat) / total, 1) if total else 0.0,
+        "batch_p50_ms": round(lat[len(lat) // 2] * 1000, 2),
+        "batch_p99_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000, 2),
+        "candidates_per_batch": round(candidates / len(lat), 1),
+        "planted_duplicates": planted,
+        "caught": caught,
+        "false_links": false_links,
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# MB/s of the IOC extractor over a fixture corpus of report-sized texts.
+import argparse, json, random, time
+from app.ingest.extract import extract_iocs
+from app.ingest.html_text import html_to_text
+from .fixtures import report_html
+
+def corpus(docs: int, paragraphs: int, seed: int = 3) -> list[str]:
+    rnd = random.Random(seed)
+    texts = []
+    for i in range(docs):
+        t = html_to_text(report_html(i, paragraphs, rnd))
+        # Sprinkle defanged indicators the way reports publish them
+        t += f"\nC2: hxxps://cdn-{i}[.]badhost[.]ru/x.php 45.{i % 256}.12[.]9 admin{i}[at]mail[.]su"
+        texts.append(t)
+    return texts
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=20)
+    ap.add_argument("--paragraphs", type=int, default=400, help="~25 KB of text per 40 paragraphs")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = corpus(args.docs, args.paragraphs)
+    mb = sum(len(t.encode()) for t in texts) / 1e6
+    found = 0
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        found = sum(len(extract_iocs(t)) for t in texts)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "bench": "extract",
+        "mb": round(mb, 2),
+        "iocs_per_round": found,
+        "mb_per_sec": round(mb * args.rounds / elapsed, 2),
+    }))
+
+if __name__ == "__main__":
+    main()
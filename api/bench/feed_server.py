@@ -0,0 +1,136 @@
+# Local stand-in for the upstream feeds, serving bench.fixtures over HTTP:
+#   GET  /rss/<n>.xml                    synthetic RSS feed n
+#   GET  /kev.json                       CISA KEV catalog
+#   POST /threatfox/api/v1/              ThreatFox get_iocs response
+#   GET  /threatfox/export/full.zip      ThreatFox full export
+#   GET  /threatfox/export/recent.json   ThreatFox 48h export
+# Bodies are built once at start-up so the server costs next to nothing while a bench runs.
+# GETs carry an ETag and answer a matching If-None-Match with 304, like the real feeds.
+import argparse, contextlib, hashlib, os, shutil, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .fixtures import kev_catalog, rss_feed, threatfox_get_iocs, threatfox_recent_export, write_threatfox_export_zip
+
+DEFAULTS = {
+    "rss_feeds": 20,
+    "rss_entries": 25,
+    "rss_paragraphs": 40,
+    "kev_entries": 1500,
+    "threatfox_iocs": 20_000,
+    "export_rows": 200_000,
+    "recent_rows": 2_000,
+    "seed": 1,
+}
+
+def build_routes(workdir: str, **sizes) -> dict:
+    """path -> (content type, body bytes or path of a file to stream)."""
+    sz = {**DEFAULTS, **sizes}
+    seed = sz["seed"]
+    routes = {}
+    for n in range(sz["rss_feeds"]):
+        routes[f"/rss/{n}.xml"] = ("application/rss+xml",
+                                   rss_feed(sz["rss_entries"], sz["rss_paragraphs"], seed + n, host=f"feed{n}.bench.local"))
+    routes["/kev.json"] = ("application/json", kev_catalog(sz["kev_entries"], seed))
+    routes["/threatfox/api/v1/"] = ("application/json", threatfox_get_iocs(sz["threatfox_iocs"], seed))
+    # Different seed from get_iocs so the backfill inserts rather than only merging
+    zip_path = os.path.join(workdir, "full.zip")
+    write_threatfox_export_zip(zip_path, sz["export_rows"], seed + 1)
+    routes["/threatfox/export/full.zip"] = ("application/zip", zip_path)
+    routes["/threatfox/export/recent.json"] = ("application/json", threatfox_recent_export(sz["recent_rows"], seed + 2))
+    return routes
+
+def _etag(body) -> str:
+    if isinstance(body, str):
+        st = os.stat(body)
+        key = f"{body}:{st.st_size}:{st.st_mtime_ns}".encode()
+    else:
+        key = body
+    return '"' + hashlib.blake2b(key, digest_size=12).hexdigest() + '"'
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _route(self):
+        # Query strings are ignored; fetchers only vary their request bodies
+        path = self.path.split("?", 1)[0]
+        return self.server.routes.get(path), self.server.etags.get(path)
+
+    def _send(self, status: int, ctype: str | None = None, body=None, etag: str | None = None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if body is None:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        size = os.path.getsize(body) if isinstance(body, str) else len(body)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        if isinstance(body, str):
+            with open(body, "rb") as fh:
+                shutil.copyfileobj(fh, self.wfile, 1024 * 256)
+        else:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        route, etag = self._route()
+        if route is None:
+            return self._send(404)
+        if etag and self.headers.get("If-None-Match") == etag:
+            return self._send(304, etag=etag)
+        self._send(200, *route, etag=etag)
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if n:
+            self.rfile.read(n)
+        route, _ = self._route()
+        if route is None:
+            return self._send(404)
+        self._send(200, *route)
+
+def serve(routes: dict, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread; port 0 picks a free one (see `server.server_address`)."""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.routes = routes
+    server.etags = {path: _etag(body) for path, (_, body) in routes.items()}
+    threading.Thread(target=server.serve_forever, name="feed-server", daemon=True).start()
+    return server
+
+@contextlib.contextmanager
+def running(host: str = "127.0.0.1", port: int = 0, **sizes):
+    """Yield the base URL of a fixture server for the duration of the block."""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = serve(build_routes(tmp, **sizes), host, port)
+        try:
+            yield "http://%s:%d" % server.server_address[:2]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+def add_size_args(ap: argparse.ArgumentParser):
+    for key, default in DEFAULTS.items():
+        ap.add_argument("--" + key.replace("_", "-"), type=int, default=default)
+
+def sizes_from(args: argparse.Namespace) -> dict:
+    return {key: getattr(args, key) for key in DEFAULTS}
+
+def main():
+    # Standalone, e.g. to point a dev worker's sources at it
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    add_size_args(ap)
+    args = ap.parse_args()
+    with running(args.host, args.port, **sizes_from(args)) as base_url:
+        print(f"serving fixtures on {base_url}", flush=True)
+        with contextlib.suppress(KeyboardInterrupt):
+            while True:
+                time.sleep(3600)
+
+if __name__ == "__main__":
+    main()
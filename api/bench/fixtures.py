@@ -0,0 +1,133 @@
+# Synthetic feed fixtures for benchmarks. Deterministic for a given seed.
+import json, random, zipfile
+
+IOC_KINDS = ("ip:port", "domain", "url", "sha256_hash", "md5_hash")
+MALWARE = ("win.cobalt_strike", "win.qakbot", "elf.mirai", "win.asyncrat", "js.socgholish")
+
+def threatfox_ioc(i: int, rnd: random.Random) -> dict:
+    kind = IOC_KINDS[i % len(IOC_KINDS)]
+    if kind == "ip:port":
+        val = f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}:{rnd.randint(1, 65535)}"
+    elif kind == "domain":
+        val = f"h{i}-{rnd.getrandbits(32):08x}.example-{i % 97}.com"
+    elif kind == "url":
+        val = f"http://c2-{i}.example.net/{rnd.getrandbits(48):012x}/gate.php"
+    elif kind == "sha256_hash":
+        val = f"{rnd.getrandbits(256):064x}"
+    else:
+        val = f"{rnd.getrandbits(128):032x}"
+    malware = MALWARE[i % len(MALWARE)]
+    return {
+        "id": str(1_000_000 + i),
+        "ioc": val,
+        "ioc_type": kind,
+        "threat_type": "botnet_cc",
+        "threat_type_desc": "Indicator that identifies a botnet command&control server (C&C)",
+        "malware": malware,
+        "malware_printable": malware.split(".", 1)[1].replace("_", " ").title(),
+        "malware_alias": None,
+        "malware_malpedia": f"https://malpedia.caad.fkie.fraunhofer.de/details/{malware}",
+        "confidence_level": 75,
+        "first_seen": "2024-05-01 12:00:00 UTC",
+        "last_seen": None,
+        "reporter": "bench",
+        "reference": None,
+        "tags": [malware.split(".", 1)[1], "bench"],
+    }
+
+def write_threatfox_export_zip(path: str, rows: int, seed: int = 1) -> str:
+    """Write a full-export style zip holding a JSON array of `rows` IOC objects."""
+    rnd = random.Random(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        with zf.open("full.json", "w") as fh:
+            fh.write(b"[")
+            for i in range(rows):
+                if i:
+                    fh.write(b",")
+                fh.write(json.dumps(threatfox_ioc(i, rnd)).encode())
+            fh.write(b"]")
+    return path
+
+LOREM = ("threat actors leveraged a vulnerable VPN appliance to gain initial access then deployed "
+         "cobalt strike beacons for lateral movement before exfiltrating data over https").split()
+
+def report_html(i: int, paragraphs: int, rnd: random.Random) -> str:
+    parts = [f"<h2>Case {i}</h2>", "<script>var tracking = 1;</script>"]
+    for p in range(paragraphs):
+        words = " ".join(rnd.choice(LOREM) for _ in range(60))
+        parts.append(f"<p>{words} <a href='http://example.com/{i}/{p}'>link</a> <code>185.220.{p % 256}.{i % 256}</code></p>")
+        if p % 5 == 0:
+            parts.append("<table><tr><td>hash</td><td>%064x</td></tr></table>" % rnd.getrandbits(256))
+    return "".join(parts)
+
+def rss_feed(entries: int, paragraphs: int = 40, seed: int = 1, host: str = "feed.bench.local") -> bytes:
+    """RSS 2.0 feed with full-content entries, roughly DFIR-report sized at the default paragraphs."""
+    rnd = random.Random(seed)
+    items = []
+    for i in range(entries):
+        body = report_html(i, paragraphs, rnd).replace("]]>", "]]&gt;")
+        items.append(
+            f"<item><title>Report {i}</title><link>https://{host}/post/{i}</link>"
+            f"<guid>https://{host}/?p={i}</guid><pubDate>Mon, 06 May 2024 12:00:00 GMT</pubDate>"
+            f"<description>Summary {i}</description>"
+            f"<content:encoded><![CDATA[{body}]]></content:encoded></item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel>'
+        f"<title>Bench feed</title><link>https://{host}/</link>"
+        "<description>bench</description>"
+        + "".join(items) + "</channel></rss>"
+    ).encode()
+
+VENDORS = (("Ivanti", "Connect Secure"), ("Microsoft", "Windows"), ("Fortinet", "FortiOS"),
+           ("Citrix", "NetScaler ADC"), ("Apache", "ActiveMQ"), ("Atlassian", "Confluence"))
+
+def kev_catalog(entries: int, seed: int = 1) -> bytes:
+    """CISA KEV catalog JSON; some descriptions carry an IP or domain for the IOC extractor."""
+    rnd = random.Random(seed)
+    vulns = []
+    for i in range(entries):
+        vendor, product = VENDORS[i % len(VENDORS)]
+        desc = " ".join(rnd.choice(LOREM) for _ in range(30))
+        if i % 3 == 0:
+            desc += f" Exploitation observed from 45.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}" \
+                    f" and update-{i}.kev-bench.net."
+        vulns.append({
+            "cveID": f"CVE-{2015 + i % 10}-{10000 + i}",
+            "vendorProject": vendor,
+            "product": product,
+            "vulnerabilityName": f"{vendor} {product} Command Injection Vulnerability",
+            "dateAdded": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "shortDescription": desc,
+            "requiredAction": "Apply mitigations per vendor instructions or discontinue use of the product if mitigations are unavailable.",
+            "dueDate": "2024-06-01",
+            "knownRansomwareCampaignUse": "Unknown",
+            "notes": f"https://nvd.nist.gov/vuln/detail/CVE-{2015 + i % 10}-{10000 + i}",
+            "cwes": ["CWE-78"],
+        })
+    return json.dumps({
+        "title": "CISA Catalog of Known Exploited Vulnerabilities",
+        "catalogVersion": "2024.05.06",
+        "dateReleased": "2024-05-06T12:00:00.0000Z",
+        "count": entries,
+        "vulnerabilities": vulns,
+    }).encode()
+
+def threatfox_get_iocs(rows: int, seed: int = 1) -> bytes:
+    """A `get_iocs` API response body."""
+    rnd = random.Random(seed)
+    return json.dumps({"query_status": "ok", "data": [threatfox_ioc(i, rnd) for i in range(rows)]}).encode()
+
+def threatfox_recent_export(rows: int, seed: int = 1) -> bytes:
+    """The 48h export: JSON keyed by IOC id, with `ioc_value` / `*_utc` field names."""
+    rnd = random.Random(seed)
+    out = {}
+    for i in range(rows):
+        obj = threatfox_ioc(i, rnd)
+        ioc_id = obj.pop("id")
+        obj["ioc_value"] = obj.pop("ioc")
+        obj["first_seen_utc"] = obj.pop("first_seen").replace(" UTC", "")
+        obj["last_seen_utc"] = obj.pop("last_seen")
+        out[ioc_id] = [obj]
+    return json.dumps(out).encode()
@@ -0,0 +1,43 @@
+# Entries/sec of the RSS HTML -> text stage on fixture feeds: BeautifulSoup vs lxml vs process pool.
+import argparse, json, time
+import feedparser
+from bs4 import BeautifulSoup
+from app.ingest import html_text
+from .fixtures import rss_feed
+
+def entry_html(e) -> str:
+    html = e.get("summary", "")
+    for c in e.get("content", []):
+        if isinstance(c, dict) and "value" in c:
+            html = c["value"]
+    return html
+
+def timed(fn, htmls, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn(htmls)
+    return len(htmls) * rounds / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=50)
+    ap.add_argument("--paragraphs", type=int, default=40)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--feed", help="parse a saved feed file instead of a generated one")
+    args = ap.parse_args()
+
+    raw = open(args.feed, "rb").read() if args.feed else rss_feed(args.entries, args.paragraphs)
+    htmls = [entry_html(e) for e in feedparser.parse(raw).entries]
+    html_text.convert_many(htmls)  # warm the pool
+    print(json.dumps({
+        "bench": "html_text",
+        "entries": len(htmls),
+        "mb": round(sum(len(h) for h in htmls) / 1e6, 2),
+        "bs4_entries_per_sec": round(timed(lambda hs: [BeautifulSoup(h, "lxml").get_text("\n") for h in hs], htmls, args.rounds), 1),
+        "lxml_entries_per_sec": round(timed(html_text._convert_batch, htmls, args.rounds), 1),
+        "pool_entries_per_sec": round(timed(html_text.convert_many, htmls, args.rounds), 1),
+        "pool_workers": html_text.POOL_WORKERS,
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Peak Python heap (tracemalloc) of the streaming ThreatFox and KEV fetchers against response
+# size, chunks consumed and dropped the way the upsert loop does. Needs no database: each size
+# gets a local fixture server (bench.feed_server), started before tracing so its bodies don't count.
+# `whole_parse_peak_mb` is json.loads of the same body: the floor for any non-streaming parser.
+import argparse, json, tracemalloc
+from types import SimpleNamespace
+from app.ingest.cisa_kev import fetch_cisa_kev
+from app.ingest.threatfox import fetch_threatfox
+from .feed_server import running
+from .fixtures import kev_catalog, threatfox_get_iocs
+
+def _snapshot(name: str, endpoint: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name, endpoint=endpoint, auth_secret=None, sync_cursor=None,
+                           content_hash=None, last_etag=None, last_modified=None)
+
+def _peak(fn) -> tuple:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        out = fn()
+        return out, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def _drain(chunks) -> tuple:
+    n = rows = 0
+    for chunk in chunks or ():
+        n += 1
+        rows += sum(len(i.get("iocs") or ()) or 1 for i in chunk)
+    return n, rows
+
+def measure(feed: str, size: int, seed: int = 1) -> dict:
+    if feed == "threatfox":
+        sizes, path, body = {"threatfox_iocs": size}, "/threatfox/api/v1/", threatfox_get_iocs(size, seed)
+        fetch = lambda s: fetch_threatfox(s, days=3)
+    else:
+        sizes, path, body = {"kev_entries": size}, "/kev.json", kev_catalog(size, seed)
+        fetch = fetch_cisa_kev
+    with running(rss_feeds=0, export_rows=1, recent_rows=1, seed=seed, **sizes) as base:
+        snap = _snapshot(f"bench-mem-{feed}", base + path)
+        (chunks, rows), peak = _peak(lambda: _drain(fetch(snap)))
+    _, whole = _peak(lambda: json.loads(body))
+    return {"bench": "ingest_memory", "feed": feed, "size": size, "response_mb": round(len(body) / 1e6, 1),
+            "chunks": chunks, "rows": rows, "peak_mb": round(peak, 1), "whole_parse_peak_mb": round(whole, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threatfox-sizes", default="10000,50000,200000", help="IOCs per get_iocs response")
+    ap.add_argument("--kev-sizes", default="1500,15000", help="catalog entries")
+    args = ap.parse_args()
+    for feed, sizes in (("threatfox", args.threatfox_sizes), ("kev", args.kev_sizes)):
+        for size in (int(s) for s in sizes.split(",") if s):
+            print(json.dumps(measure(feed, size)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Requests/sec and latency percentiles for the HTML pages, sync vs async (settings.ASYNC_DB).
+# By default starts uvicorn once per mode on --port against the usual POSTGRES_*/REDIS_URL settings;
+# --base-url load-tests an already running server instead. To measure the database path
+# rather than the page cache, point the servers at a dead Redis: --env REDIS_URL=redis://127.0.0.1:1/0
+import argparse, asyncio, json, os, subprocess, sys, time
+import httpx
+
+def _pct(sorted_ms, p: float) -> float:
+    return round(sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p))], 2) if sorted_ms else 0.0
+
+async def _first_item_id(client: httpx.AsyncClient) -> int | None:
+    items = (await client.get("/api/items", params={"limit": 1})).json().get("items") or []
+    return items[0]["id"] if items else None
+
+async def run_load(base_url: str, paths: list, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if any("{id}" in p for p in paths):
+            item_id = await _first_item_id(client)
+            paths = [p.replace("{id}", str(item_id)) for p in paths if item_id or "{id}" not in p]
+        lat = {p: [] for p in paths}
+        errors = {p: 0 for p in paths}
+        stop = time.perf_counter() + duration
+
+        async def worker(n: int):
+            i = n
+            while time.perf_counter() < stop:
+                path = paths[i % len(paths)]
+                i += 1
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(path)
+                    ok = r.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    lat[path].append((time.perf_counter() - t0) * 1000)
+                else:
+                    errors[path] += 1
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    out = {}
+    for path, ms in lat.items():
+        ms.sort()
+        out[path] = {"requests": len(ms), "errors": errors[path], "rps": round(len(ms) / duration, 1),
+                     "p50_ms": _pct(ms, 0.50), "p99_ms": _pct(ms, 0.99)}
+    return out
+
+def _spawn(mode: str, port: int, extra_env: dict) -> subprocess.Popen:
+    env = {**os.environ, **extra_env, "ASYNC_DB": "true" if mode == "async" else "false"}
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                            env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError(f"{mode} server did not come up on port {port}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", help="test this running server instead of spawning one per mode")
+    ap.add_argument("--modes", default="sync,async")
+    ap.add_argument("--port", type=int, default=8011)
+    ap.add_argument("--paths", default="/,/items,/items/{id}")
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE for spawned servers")
+    args = ap.parse_args()
+
+    paths = args.paths.split(",")
+    if args.base_url:
+        res = asyncio.run(run_load(args.base_url, paths, args.concurrency, args.duration))
+        print(json.dumps({"bench": "loadtest", "base_url": args.base_url, "concurrency": args.concurrency, "paths": res}))
+        return
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    for mode in args.modes.split(","):
+        proc = _spawn(mode, args.port, extra_env)
+        try:
+            # Warm pools and caches so both modes are measured in steady state
+            asyncio.run(run_load(f"http://127.0.0.1:{args.port}", paths, args.concurrency, 2.0))
+            res = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", paths, args.concurrency, args.duration))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        print(json.dumps({"bench": "loadtest", "mode": mode, "concurrency": args.concurrency, "paths": res}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Latency/throughput of the bulk IOC lookup for 10k and 100k-value requests.
+# Needs the usual Postgres and Redis settings; a few % of each request is sampled from real IOCs.
+import argparse, json, random, time
+from sqlalchemy import func, select
+from app.db import SessionLocal, init_db
+from app.lookup import READY_KEY, lookup, rebuild_filter
+from app.kv import get_redis
+from app.models import IOC
+
+def make_request(known: list, size: int, hit_ratio: float, rnd: random.Random) -> dict:
+    hits = rnd.sample(known, min(len(known), int(size * hit_ratio)))
+    query: dict = {}
+    for t, v in hits:
+        query.setdefault(t, []).append(v)
+    ips = query.setdefault("ip", [])
+    while sum(len(v) for v in query.values()) < size:
+        ips.append(f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}")
+    return query
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--hit-ratio", type=float, default=0.02)
+    args = ap.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    if not get_redis().exists(READY_KEY):
+        rebuild_filter(db)
+    known = db.execute(select(IOC.type, IOC.value).order_by(func.random()).limit(20_000)).all()
+    rnd = random.Random(7)
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        timings = []
+        for _ in range(args.rounds):
+            q = make_request(known, size, args.hit_ratio, rnd)
+            t0 = time.perf_counter()
+            res = lookup(db, q)
+            timings.append(time.perf_counter() - t0)
+        timings.sort()
+        results.append({
+            "size": size,
+            "filtered": res["filtered"],
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+            "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 2),
+            "values_per_sec": round(size * len(timings) / sum(timings), 1),
+        })
+    db.close()
+    print(json.dumps({"bench": "lookup", "results": results}))
+
+if __name__ == "__main__":
+    main()
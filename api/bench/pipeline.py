@@ -0,0 +1,176 @@
+# End-to-end ingest throughput and peak RSS per stage, against bench.feed_server fixtures.
+# Needs a disposable Postgres reachable through the usual POSTGRES_* settings (Redis optional:
+# cache bumps are best-effort). --reset truncates the ingest tables first, so every run
+# measures inserts rather than dedup; never point it at a database you care about.
+#
+# Each stage runs in a fresh subprocess so its peak RSS is its own. The combined result is
+# written to bench/results/<utc time>-<git sha>.json; compare two runs with bench.compare.
+import argparse, json, os, platform, resource, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+from sqlalchemy import delete, func, select, text, update
+from app import metrics
+from app.backfill import CHECKPOINT_NAME, load_export
+from app.db import SessionLocal, init_db
+from app.ingest.threatfox_export import download_export
+from app.models import IngestCheckpoint, IOCSighting, Item, Source
+from app.seed import ensure_source
+from app.workers import FETCHERS, _fetch_and_upsert
+from .feed_server import add_size_args, running, sizes_from
+
+STAGES = ("rss", "kev", "threatfox", "threatfox_catchup", "export")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def _maxrss_mb(who=resource.RUSAGE_SELF) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # KiB on Linux
+
+def _bench_sources(db, kind: str, endpoints: list, cursor: str | None = None):
+    # Own sources, reset so nothing short-circuits as unchanged
+    sources = [ensure_source(db, f"bench-{kind}-{n}", kind, url) for n, url in enumerate(endpoints)]
+    db.execute(update(Source).where(Source.id.in_([s.id for s in sources])).values(
+        last_etag=None, last_modified=None, content_hash=None, sync_cursor=cursor))
+    db.commit()
+    for s in sources:
+        db.refresh(s)
+    return sources
+
+def _counts(db, source_ids: list) -> tuple[int, int]:
+    items = db.execute(select(func.count()).select_from(Item).where(Item.source_id.in_(source_ids))).scalar_one()
+    sightings = db.execute(select(func.count()).select_from(IOCSighting)
+                           .where(IOCSighting.source_id.in_(source_ids))).scalar_one()
+    return items, sightings
+
+def _stage_breakdown() -> dict:
+    # Seconds per pipeline stage (parse, normalize, html_text, upsert, ...) from app.metrics
+    out = {}
+    for family in (metrics.STAGE_SECONDS, metrics.FETCH_SECONDS):
+        for metric in family.collect():
+            for s in metric.samples:
+                if s.name.endswith("_sum"):
+                    key = s.labels.get("stage") or "fetch"
+                    out[key] = round(out.get(key, 0.0) + s.value, 3)
+    return out
+
+def run_stage(stage: str, base_url: str, sizes: dict) -> dict:
+    """Run one ingest path end to end in this process; returns its measurements."""
+    rss_baseline = _maxrss_mb()
+    db = SessionLocal()
+    try:
+        if stage == "rss":
+            sources = _bench_sources(db, "rss", [f"{base_url}/rss/{n}.xml" for n in range(sizes["rss_feeds"])])
+        elif stage == "kev":
+            sources = _bench_sources(db, "json", [f"{base_url}/kev.json"])
+        elif stage == "threatfox":
+            sources = _bench_sources(db, "threatfox", [f"{base_url}/threatfox/api/v1/"])
+        elif stage == "threatfox_catchup":
+            # A cursor below every id in the API window sends the fetcher to the 48h export
+            sources = _bench_sources(db, "threatfox", [f"{base_url}/threatfox/api/v1/"], cursor="1")
+        else:
+            sources = _bench_sources(db, "threatfox", [f"{base_url}/threatfox/api/v1/"])
+            db.execute(delete(IngestCheckpoint).where(IngestCheckpoint.name == CHECKPOINT_NAME)); db.commit()
+        ids = [s.id for s in sources]
+        items0, sightings0 = _counts(db, ids)
+
+        t0 = time.perf_counter()
+        if stage == "export":
+            # task_threatfox_backfill_full, minus the lookup of the production source
+            with tempfile.NamedTemporaryFile(suffix=".zip") as tmp:
+                fingerprint = download_export(tmp.name)
+                load_export(db, tmp.name, fingerprint, ids[0])
+        else:
+            fetch, label, extract = FETCHERS[sources[0].kind]
+            _fetch_and_upsert(db, sources, fetch, label, extract=extract)
+        elapsed = time.perf_counter() - t0
+
+        items1, sightings1 = _counts(db, ids)
+    finally:
+        db.close()
+    items, iocs = items1 - items0, sightings1 - sightings0
+    return {
+        "seconds": round(elapsed, 3),
+        "items": items,
+        "iocs": iocs,
+        "items_per_s": round(items / elapsed, 1) if elapsed else 0.0,
+        "iocs_per_s": round(iocs / elapsed, 1) if elapsed else 0.0,
+        "rss_baseline_mb": rss_baseline,
+        "peak_rss_mb": _maxrss_mb(),
+        # html_text's process pool, for the stages that use it
+        "children_peak_rss_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+        "breakdown_s": _stage_breakdown(),
+    }
+
+def _reset_tables():
+    db = SessionLocal()
+    try:
+        db.execute(text("TRUNCATE items, iocs, ioc_sightings, ingest_checkpoints RESTART IDENTITY CASCADE"))
+        db.commit()
+    finally:
+        db.close()
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stages", default=",".join(STAGES))
+    ap.add_argument("--reset", action="store_true", help="TRUNCATE the ingest tables before running")
+    ap.add_argument("--out", default=RESULTS_DIR, help="directory for the JSON result ('' to skip writing)")
+    ap.add_argument("--label", default="", help="free text stored with the result")
+    ap.add_argument("--run-stage", help=argparse.SUPPRESS)
+    ap.add_argument("--base-url", help=argparse.SUPPRESS)
+    add_size_args(ap)
+    args = ap.parse_args()
+    sizes = sizes_from(args)
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.base_url, sizes)))
+        return 0
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    init_db()
+    if args.reset:
+        _reset_tables()
+
+    results, failed = {}, False
+    size_args = [a for k, v in sizes.items() for a in ("--" + k.replace("_", "-"), str(v))]
+    with running(**sizes) as base_url:
+        env = {**os.environ,
+               "THREATFOX_EXPORT_URL": f"{base_url}/threatfox/export/full.zip",
+               "THREATFOX_EXPORT_RECENT_URL": f"{base_url}/threatfox/export/recent.json"}
+        for stage in stages:
+            p = subprocess.run([sys.executable, "-m", "bench.pipeline", "--run-stage", stage, "--base-url", base_url, *size_args],
+                               env=env, capture_output=True, text=True)
+            if p.returncode != 0:
+                failed = True
+                results[stage] = {"error": (p.stderr.strip().splitlines() or [f"exit {p.returncode}"])[-1]}
+            else:
+                results[stage] = json.loads(p.stdout.strip().splitlines()[-1])
+            print(json.dumps({"bench": "pipeline", "stage": stage, **results[stage]}), flush=True)
+
+    sha = _git("rev-parse", "--short=12", "HEAD")
+    run = {
+        "bench": "pipeline",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_sha": sha,
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "label": args.label,
+        "python": platform.python_version(),
+        "machine": {"platform": platform.platform(), "cpus": os.cpu_count()},
+        "sizes": sizes,
+        "stages": results,
+    }
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        path = os.path.join(args.out, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{sha or 'nogit'}.json")
+        with open(path, "w") as fh:
+            json.dump(run, fh, indent=2)
+        print(json.dumps({"bench": "pipeline", "written": path}))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
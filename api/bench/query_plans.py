@@ -0,0 +1,76 @@
+# Query-plan regression check: the hot read paths must be served by their indexes.
+# Needs a disposable Postgres reachable through the usual POSTGRES_* settings; exits 1 on a regression.
+# CI runs it against a fresh database on every push (.github/workflows/checks.yml).
+# Sequential scans are disabled for the session so tiny tables don't hide a missing index.
+import json, sys
+from datetime import datetime, timedelta
+from sqlalchemy import desc, func, select
+from app.db import SessionLocal, engine, init_db
+from app.api import in_network, under_domain, with_tag, with_technique
+from app.dedup import candidates_stmt
+from app.models import IOC, Item, ItemAlias, Source, WatchHit
+from app.pages import ioc_page_stmt, type_counts_stmt
+
+def hot_queries():
+    """(name, statement, index that must appear in the plan)"""
+    newest = (select(Item, Source.name).join(Source, Item.source_id == Source.id)
+              .order_by(desc(Item.published_at).nulls_last(), desc(Item.id)).limit(50))
+    return [
+        ("home page newest items", newest, "ix_items_published_at_id"),
+        ("item dedup probe", select(Item.hash_sha256).where(Item.hash_sha256.in_([b"\0" * 32, b"\1" * 32])),
+         "ux_items_hash_sha256"),
+        ("item alias dedup probe", select(ItemAlias.hash_sha256).where(ItemAlias.hash_sha256.in_([b"\0" * 32])),
+         "item_aliases_pkey"),
+        ("near-duplicate URL probe", select(Item.id).where(Item.canonical_url.in_(["https://example.com/post"])),
+         "ix_items_canonical_url"),
+        ("near-duplicate SimHash bands", candidates_stmt([0x0123456789ABCDEF]), "ix_items_simhash_b0"),
+        ("items by source", select(Item.id).where(Item.source_id == 1), "ix_items_source_id"),
+        ("items by ATT&CK technique", select(Item.id).where(with_technique("T1059")),
+         "ix_item_techniques_technique_id_item_id"),
+        ("items by tag", select(Item.id).where(with_tag("ransomware")), "ix_item_tags_tag_id_item_id"),
+        ("watchlist hits of an entry",
+         select(WatchHit.id).where(WatchHit.entry_id == 1).order_by(desc(WatchHit.id)).limit(100),
+         "ix_watch_hits_entry_id_id"),
+        ("item detail IOC page", ioc_page_stmt(1), "ix_ioc_sightings_item_id_ioc_id"),
+        ("item detail IOC page by type", ioc_page_stmt(1, type="ip"), "ix_ioc_sightings_item_id_ioc_id"),
+        ("item detail IOC type counts", type_counts_stmt(1), "ix_ioc_sightings_item_id_ioc_id"),
+        ("IOCs seen in the last 24h",
+         select(IOC.id).where(IOC.last_seen >= datetime.utcnow() - timedelta(hours=24)), "ix_iocs_last_seen"),
+        ("IOCs inside a CIDR", select(IOC.id).where(in_network("203.0.113.0/24")), "ix_iocs_ip"),
+        ("IOCs under a domain", select(IOC.id).where(under_domain("example.com")), "ix_iocs_domain_rev"),
+        ("hash lookup by digest", select(IOC.id).where(IOC.hash_bytes == b"\xab" * 32), "ix_iocs_hash_bytes"),
+        ("IOC value search", select(IOC.item_id).where(IOC.value == "1.2.3.4"), "ix_iocs_value"),
+        ("full-text search",
+         select(Item.id).where(Item.search_vector.op("@@")(func.websearch_to_tsquery("english", "lockbit"))),
+         "ix_items_search_vector"),
+    ]
+
+def _indexes(plan) -> set:
+    found = set()
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            found.add(plan["Index Name"])
+        for child in plan.get("Plans", []):
+            found |= _indexes(child)
+    return found
+
+def main() -> int:
+    init_db()
+    db = SessionLocal()
+    failures = 0
+    try:
+        db.connection().exec_driver_sql("SET enable_seqscan = off")
+        for name, stmt, index in hot_queries():
+            compiled = stmt.compile(bind=engine, compile_kwargs={"render_postcompile": True})
+            (plan,) = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+            used = _indexes(plan["Plan"])
+            ok = index in used
+            failures += not ok
+            print(json.dumps({"query": name, "expect": index, "used": sorted(used), "ok": ok}))
+    finally:
+        db.rollback()
+        db.close()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
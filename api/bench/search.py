@@ -0,0 +1,66 @@
+# Latency of the configured search backend (search plus hydration) against a generated corpus.
+# Calls the backend directly: search_items() answers repeats from the Redis cache.
+# Needs a disposable Postgres reachable through the usual POSTGRES_* settings.
+import argparse, json, statistics, time
+from sqlalchemy import select, text
+from app.db import SessionLocal, init_db
+from app.models import Source
+from app.search import _hydrate, get_backend
+
+WORDS = ("ransomware loader beacon phishing exploit lateral movement credential dumping persistence "
+         "cobalt strike qakbot emotet icedid lockbit vulnerability remote code execution privilege "
+         "escalation exchange fortinet citrix ivanti zero day backdoor webshell exfiltration").split()
+QUERIES = ["cobalt strike", "lockbit ransomware", "citrix vulnerability", "webshell -exchange",
+           "\"remote code execution\"", "credential dumping", "zero day ivanti", "icedid loader"]
+
+def generate(db, items: int):
+    src = db.execute(select(Source).where(Source.name == "Search bench")).scalar_one_or_none()
+    if not src:
+        src = Source(name="Search bench", kind="bench", endpoint="http://localhost/", enabled=False)
+        db.add(src); db.commit()
+    # Random titles/bodies built server-side; 300-word bodies roughly match RSS posts
+    db.execute(text("""
+        INSERT INTO items (source_id, title, text, published_at, fetched_at, canonical_url, lang)
+        SELECT :sid,
+               (SELECT string_agg(w[1 + floor(random() * array_length(w, 1))::int], ' ')
+                  FROM generate_series(1, 8) WHERE g > 0),
+               (SELECT string_agg(w[1 + floor(random() * array_length(w, 1))::int], ' ')
+                  FROM generate_series(1, 300) WHERE g > 0),
+               now() - (random() * interval '365 days'), now(),
+               'https://bench.local/' || g, 'en'
+          FROM generate_series(1, :n) AS g, (SELECT CAST(:words AS text[]) AS w) words
+    """), {"sid": src.id, "n": items, "words": WORDS})
+    db.commit()
+    db.execute(text("ANALYZE items"))
+    db.commit()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=0, help="generate this many items first")
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    if args.items:
+        generate(db, args.items)
+    backend = get_backend()
+    timings = []
+    for _ in range(args.rounds):
+        for q in QUERIES:
+            t0 = time.perf_counter()
+            _hydrate(db, backend.search_ids(db, q, 50))
+            timings.append((time.perf_counter() - t0) * 1000)
+    db.close()
+    timings.sort()
+    print(json.dumps({
+        "bench": "search",
+        "backend": backend.name,
+        "queries": len(timings),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+        "max_ms": round(timings[-1], 2),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Cold import time and resident memory of the web app, plus a check that the web process
+# stays free of Celery and ingest dependencies. Needs no database: it only imports app.main.
+# Exits 1 if a forbidden module gets imported.
+import argparse, json, re, subprocess, sys
+
+FORBIDDEN = ("celery", "kombu", "feedparser", "bs4", "lxml", "ijson", "alembic",
+             "app.workers", "app.bulk", "app.backfill", "app.ingest.rss", "app.ingest.threatfox", "app.ingest.html_text")
+
+PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "import_s": elapsed,
+    "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+def _top_imports(stderr: str, n: int):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        # Direct imports of app.main and their own first level
+        if m and 3 <= len(m.group(3)) <= 5:
+            rows.append((int(m.group(2)), m.group(4)))
+    rows.sort(reverse=True)
+    return [{"module": mod, "cumulative_ms": round(us / 1000, 1)} for us, mod in rows[:n]]
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    runs = []
+    for _ in range(args.rounds):
+        p = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], capture_output=True, text=True, check=True)
+        runs.append((json.loads(p.stdout.strip().splitlines()[-1]), p.stderr))
+    runs.sort(key=lambda r: r[0]["import_s"])
+    best, stderr = runs[len(runs) // 2]
+    leaked = sorted(m for m in best["modules"] if m.split(".")[0] in FORBIDDEN or m.startswith(FORBIDDEN))
+    print(json.dumps({
+        "bench": "startup",
+        "import_ms_median": round(best["import_s"] * 1000, 1),
+        "maxrss_mb": round(best["maxrss_kb"] / 1024, 1),
+        "modules_loaded": len(best["modules"]),
+        "top_imports": _top_imports(stderr, args.top),
+        "forbidden_loaded": leaked,
+    }))
+    return 1 if leaked else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# MB/s of the ATT&CK/tag matcher over report-sized texts, from a few KB up to multi-MB reports.
+# Needs no database: it times app.ingest.tagger.match_text, which is what ingest runs per item.
+import argparse, json, random, time
+from app.ingest.html_text import html_to_text
+from app.ingest.tagger import match_text, vocabulary
+from .fixtures import report_html
+
+# Mentions a real report carries, sprinkled through the filler text
+MENTIONS = [
+    "The loader ran PowerShell and rundll32.exe to start Cobalt Strike.",
+    "Operators used DLL side-loading and scheduled tasks (T1053.005) for persistence.",
+    "LockBit 3.0 ransomware was deployed after Mimikatz dumped LSASS memory.",
+    "Initial access came through spearphishing attachments; T1566.001.",
+]
+
+def corpus(docs: int, paragraphs: int, seed: int = 5) -> list[str]:
+    rnd = random.Random(seed)
+    texts = []
+    for i in range(docs):
+        lines = html_to_text(report_html(i, paragraphs, rnd)).split("\n")
+        for m in MENTIONS:
+            lines.insert(rnd.randrange(len(lines) + 1), m)
+        texts.append("\n".join(lines))
+    return texts
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5)
+    ap.add_argument("--paragraphs", type=int, default=4000, help="~25 KB of text per 40 paragraphs")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    techniques, phrases, _ = vocabulary()
+    compile_s = time.perf_counter() - t0
+    texts = corpus(args.docs, args.paragraphs)
+    mb = sum(len(t.encode()) for t in texts) / 1e6
+    labels = 0
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        labels = sum(len(ts) + len(gs) for ts, gs in map(match_text, texts))
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "bench": "tagging",
+        "techniques": len(techniques),
+        "phrases": len(phrases),
+        "compile_ms": round(compile_s * 1000, 1),
+        "mb": round(mb, 2),
+        "largest_doc_mb": round(max(len(t.encode()) for t in texts) / 1e6, 2),
+        "labels_per_round": labels,
+        "mb_per_sec": round(mb * args.rounds / elapsed, 2),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Cost of watchlist matching on the full-export COPY path: rows/sec of the CSV stream that
+# feeds COPY, with and without a compiled watchlist of --entries (default 100k) entries.
+# Needs no database: it drives app.bulk._CsvRowStream over a fixture export zip.
+import argparse, json, os, random, tempfile, time
+from app.bulk import _CsvRowStream
+from app.ingest.threatfox_export import iter_export_file
+from app.watchlist import Watchlist, normalize_entry
+from .fixtures import write_threatfox_export_zip
+
+def entries(n: int, seed: int = 7) -> list:
+    """Mostly unrelated CIDRs (/16-/32, like an org's own ranges), domains and hashes, plus a few the fixture rows hit."""
+    rnd = random.Random(seed)
+    out = [("cidr", "185.220.0.0/16"), ("domain", "example-5.com"), ("malware", "win.qakbot")]
+    while len(out) < n:
+        kind = rnd.choices(("cidr", "domain", "hash"), weights=(4, 4, 2))[0]
+        if kind == "cidr":
+            out.append((kind, f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}/{rnd.randint(16, 32)}"))
+        elif kind == "domain":
+            out.append((kind, f"brand-{rnd.getrandbits(40):010x}.example.org"))
+        else:
+            out.append((kind, f"{rnd.getrandbits(256):064x}"))
+    return [(i + 1, k, normalize_entry(k, v)) for i, (k, v) in enumerate(out)]
+
+def _drain(path: str, watch) -> tuple:
+    stream = _CsvRowStream(iter_export_file(path), watch=watch)
+    t0 = time.perf_counter()
+    while stream.read(1 << 16):
+        pass
+    return time.perf_counter() - t0, stream
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--entries", type=int, default=100_000)
+    ap.add_argument("--zip", help="reuse an existing export zip instead of generating one")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.zip or write_threatfox_export_zip(os.path.join(tmp, "full.zip"), args.rows)
+        t0 = time.perf_counter()
+        watch = Watchlist(entries(args.entries))
+        compile_s = time.perf_counter() - t0
+        base_s, base = _drain(path, None)
+        watch_s, matched = _drain(path, watch)
+
+    print(json.dumps({
+        "bench": "watchlist",
+        "rows": base.count,
+        "entries": watch.size,
+        "prefix_lengths": len(watch.prefixlens[4]) + len(watch.prefixlens[6]),
+        "compile_s": round(compile_s, 2),
+        "rows_per_s": round(base.count / base_s),
+        "rows_per_s_with_watchlist": round(matched.count / watch_s),
+        "overhead_pct": round((watch_s / base_s - 1) * 100, 1),
+        "matched_iocs": len(matched.watch_matches),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""baseline schema (as created by the original create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Existing deployments already have these tables from `create_all`; each one is
+only created when missing, so stamping is not needed. An offline (`--sql`)
+script cannot look, and creates them all: it is meant for an empty database.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "sources" not in existing:
+        op.create_table(
+            "sources",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("name", sa.Text, nullable=False),
+            sa.Column("kind", sa.Text),
+            sa.Column("endpoint", sa.Text, nullable=False),
+            sa.Column("enabled", sa.Boolean),
+            sa.Column("auth_secret", sa.Text),
+            sa.Column("poll_interval_seconds", sa.Integer),
+            sa.Column("last_etag", sa.Text),
+            sa.Column("last_modified", sa.TIMESTAMP),
+        )
+    if "items" not in existing:
+        op.create_table(
+            "items",
+            sa.Column("id", sa.BigInteger, primary_key=True),
+            sa.Column("source_id", sa.Integer, sa.ForeignKey("sources.id")),
+            sa.Column("canonical_url", sa.Text),
+            sa.Column("title", sa.Text),
+            sa.Column("published_at", sa.TIMESTAMP),
+            sa.Column("fetched_at", sa.TIMESTAMP),
+            sa.Column("author", sa.Text),
+            sa.Column("raw", sa.JSON),
+            sa.Column("text", sa.Text),
+            sa.Column("hash_sha256", sa.LargeBinary),
+            sa.Column("summary_short", sa.Text),
+            sa.Column("lang", sa.Text),
+        )
+    if "tags" not in existing:
+        op.create_table(
+            "tags",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("name", sa.Text, unique=True),
+        )
+    if "techniques" not in existing:
+        op.create_table(
+            "techniques",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("attack_id", sa.Text, unique=True),
+            sa.Column("tactic", sa.Text),
+            sa.Column("name", sa.Text),
+        )
+    if "item_tags" not in existing:
+        op.create_table(
+            "item_tags",
+            sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id"), primary_key=True),
+            sa.Column("tag_id", sa.Integer, sa.ForeignKey("tags.id"), primary_key=True),
+        )
+    if "item_techniques" not in existing:
+        op.create_table(
+            "item_techniques",
+            sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id"), primary_key=True),
+            sa.Column("technique_id", sa.Integer, sa.ForeignKey("techniques.id"), primary_key=True),
+        )
+    if "iocs" not in existing:
+        op.create_table(
+            "iocs",
+            sa.Column("id", sa.BigInteger, primary_key=True),
+            sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id")),
+            sa.Column("type", sa.Text),
+            sa.Column("value", sa.Text),
+            sa.Column("context", sa.JSON),
+            sa.UniqueConstraint("type", "value", name="iocs_type_value_unique"),
+        )
+
+
+def downgrade() -> None:
+    for name in ("iocs", "item_techniques", "item_tags", "techniques", "tags", "items", "sources"):
+        op.drop_table(name)
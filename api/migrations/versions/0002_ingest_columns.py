@@ -0,0 +1,57 @@
+"""ingest pipeline columns: validators, scheduling, checkpoints, search vector
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Adding the stored `search_vector` column rewrites `items` once; run it in a
+maintenance window on large installs.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', left(coalesce(text, ''), 500000)), 'B')"
+)
+
+
+def upgrade() -> None:
+    for ddl in (
+        "ALTER TABLE sources ADD COLUMN IF NOT EXISTS content_hash bytea",
+        "ALTER TABLE sources ADD COLUMN IF NOT EXISTS sync_cursor text",
+        "ALTER TABLE sources ADD COLUMN IF NOT EXISTS next_poll_at timestamp",
+        "ALTER TABLE sources ADD COLUMN IF NOT EXISTS last_polled_at timestamp",
+        "ALTER TABLE sources ADD COLUMN IF NOT EXISTS fail_count integer",
+        "ALTER TABLE sources ADD COLUMN IF NOT EXISTS unchanged_count integer",
+        f"ALTER TABLE items ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED",
+    ):
+        op.execute(ddl)
+
+    # Offline (--sql) scripts target an empty database, where the table is always missing
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table("ingest_checkpoints"):
+        op.create_table(
+            "ingest_checkpoints",
+            sa.Column("name", sa.Text, primary_key=True),
+            sa.Column("fingerprint", sa.Text),
+            sa.Column("position", sa.BigInteger),
+            sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id")),
+            sa.Column("completed", sa.Boolean),
+            sa.Column("updated_at", sa.TIMESTAMP),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("ingest_checkpoints")
+    op.drop_column("items", "search_vector")
+    for col in ("unchanged_count", "fail_count", "last_polled_at", "next_poll_at", "sync_cursor", "content_hash"):
+        op.drop_column("sources", col)
@@ -0,0 +1,58 @@
+"""indexes for the hot query paths; unique item hash
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Indexes are built CONCURRENTLY (outside a transaction) so ingest and the web
+app keep running against large existing tables. Duplicate item hashes left by
+the old check-then-insert dedup are folded into their oldest row first.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    # Home page / listings: ORDER BY published_at DESC NULLS LAST, id DESC
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_published_at_id ON items (published_at DESC NULLS LAST, id DESC)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_source_id ON items (source_id)",
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_items_hash_sha256 ON items (hash_sha256)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_search_vector ON items USING gin (search_vector)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_value ON iocs (value)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_item_id_id ON iocs (item_id, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_item_type_id ON iocs (item_id, type, id)",
+)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TEMP TABLE item_dupes ON COMMIT DROP AS
+        SELECT id, min(id) OVER (PARTITION BY hash_sha256) AS keep_id
+          FROM items WHERE hash_sha256 IS NOT NULL
+    """)
+    op.execute("DELETE FROM item_dupes WHERE id = keep_id")
+    op.execute("UPDATE iocs SET item_id = d.keep_id FROM item_dupes d WHERE iocs.item_id = d.id")
+    op.execute("UPDATE ingest_checkpoints SET item_id = d.keep_id FROM item_dupes d WHERE ingest_checkpoints.item_id = d.id")
+    op.execute("DELETE FROM item_tags USING item_dupes d WHERE item_tags.item_id = d.id")
+    op.execute("DELETE FROM item_techniques USING item_dupes d WHERE item_techniques.item_id = d.id")
+    op.execute("DELETE FROM items USING item_dupes d WHERE items.id = d.id")
+
+    with op.get_context().autocommit_block():
+        for ddl in INDEXES:
+            create_index_concurrently(op, ddl)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for ddl in reversed(INDEXES):
+            name = ddl.split(" IF NOT EXISTS ", 1)[1].split(" ", 1)[0]
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,61 @@
+"""ioc sightings; first/last seen and sighting count on iocs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Existing IOCs get one sighting each, from the item that inserted them, dated by
+the ThreatFox last/first seen in their context or else the item's dates.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("iocs", sa.Column("first_seen", sa.TIMESTAMP))
+    op.add_column("iocs", sa.Column("last_seen", sa.TIMESTAMP))
+    op.add_column("iocs", sa.Column("sighting_count", sa.Integer, nullable=False, server_default="1"))
+    op.create_table(
+        "ioc_sightings",
+        sa.Column("ioc_id", sa.BigInteger, sa.ForeignKey("iocs.id"), primary_key=True),
+        sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id"), primary_key=True),
+        sa.Column("source_id", sa.Integer, sa.ForeignKey("sources.id")),
+        sa.Column("seen_at", sa.TIMESTAMP),
+    )
+
+    op.execute("""
+        INSERT INTO ioc_sightings (ioc_id, item_id, source_id, seen_at)
+        SELECT i.id, i.item_id, it.source_id,
+               coalesce(
+                   CASE WHEN coalesce(i.context->>'last_seen', i.context->>'first_seen') ~ '^\\d{4}-\\d{2}-\\d{2}[ T]\\d{2}:\\d{2}:\\d{2}'
+                        THEN left(coalesce(i.context->>'last_seen', i.context->>'first_seen'), 19)::timestamp END,
+                   it.published_at, it.fetched_at)
+          FROM iocs i JOIN items it ON it.id = i.item_id
+    """)
+    op.execute("""
+        UPDATE iocs SET first_seen = s.seen_at, last_seen = s.seen_at
+          FROM ioc_sightings s WHERE s.ioc_id = iocs.id
+    """)
+
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_last_seen ON iocs (last_seen)")
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ioc_sightings_item_id ON ioc_sightings (item_id)")
+
+
+def downgrade() -> None:
+    op.drop_table("ioc_sightings")
+    op.drop_index("ix_iocs_last_seen", table_name="iocs")
+    op.drop_column("iocs", "sighting_count")
+    op.drop_column("iocs", "last_seen")
+    op.drop_column("iocs", "first_seen")
@@ -0,0 +1,77 @@
+"""typed IOC columns: inet, raw hash bytes, reversed domain labels
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Backfills the new columns from `value` (mirroring app.ingest.ioc_norm.typed_columns),
+retypes hex digests stored as "other" by the old ThreatFox type map, and fills `ip`
+for ThreatFox ip:port values the full-export loader used to store with the port.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db import create_index_concurrently
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REVERSED = "array_to_string(ARRAY(SELECT l FROM unnest(string_to_array(trim(both '.' from lower({0})), '.')) WITH ORDINALITY AS t(l, n) ORDER BY n DESC), '.') || '.'"
+URL_HOST = "substring(value from '^[A-Za-z][A-Za-z0-9+.-]*://(?:[^/?#@]*@)?([^/?#:\\[\\]]+)')"
+
+
+def upgrade() -> None:
+    op.add_column("iocs", sa.Column("ip", postgresql.INET))
+    op.add_column("iocs", sa.Column("hash_bytes", sa.LargeBinary))
+    op.add_column("iocs", sa.Column("domain_rev", sa.Text))
+
+    # Bad values get NULL rather than aborting the migration
+    op.execute("""
+        CREATE FUNCTION pg_temp.try_inet(v text) RETURNS inet AS $$
+        BEGIN RETURN v::inet; EXCEPTION WHEN others THEN RETURN NULL; END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+
+    for t, n in (("sha256", 64), ("sha1", 40), ("md5", 32)):
+        op.execute(f"""
+            UPDATE iocs i SET type = '{t}', value = lower(i.value)
+             WHERE i.type = 'other' AND i.value ~ '^[0-9A-Fa-f]{{{n}}}$'
+               AND NOT EXISTS (SELECT 1 FROM iocs j WHERE j.type = '{t}' AND j.value = lower(i.value))
+        """)
+    op.execute("""
+        UPDATE iocs SET hash_bytes = decode(value, 'hex')
+         WHERE (type = 'sha256' AND value ~ '^[0-9a-f]{64}$')
+            OR (type = 'sha1' AND value ~ '^[0-9a-f]{40}$')
+            OR (type = 'md5' AND value ~ '^[0-9a-f]{32}$')
+    """)
+    op.execute("""
+        UPDATE iocs SET ip = pg_temp.try_inet(CASE WHEN value ~ '^[0-9.]+:[0-9]+$' THEN split_part(value, ':', 1)
+                                                   ELSE trim(both '[]' from value) END)
+         WHERE type = 'ip'
+    """)
+    op.execute(f"UPDATE iocs SET domain_rev = {REVERSED.format('value')} WHERE type = 'domain' AND value <> ''")
+    op.execute(f"""
+        UPDATE iocs SET ip = pg_temp.try_inet(h.host),
+                        domain_rev = CASE WHEN pg_temp.try_inet(h.host) IS NULL THEN {REVERSED.format('h.host')} END
+          FROM (SELECT id, {URL_HOST} AS host FROM iocs WHERE type = 'url') h
+         WHERE iocs.id = h.id AND h.host IS NOT NULL
+    """)
+
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_ip ON iocs USING gist (ip inet_ops) WHERE ip IS NOT NULL")
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_hash_bytes ON iocs (hash_bytes) WHERE hash_bytes IS NOT NULL")
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_iocs_domain_rev ON iocs (domain_rev text_pattern_ops) WHERE domain_rev IS NOT NULL")
+
+
+def downgrade() -> None:
+    for name in ("ix_iocs_domain_rev", "ix_iocs_hash_bytes", "ix_iocs_ip"):
+        op.drop_index(name, table_name="iocs")
+    for col in ("domain_rev", "hash_bytes", "ip"):
+        op.drop_column("iocs", col)
@@ -0,0 +1,52 @@
+"""near-duplicate items: simhash with band indexes, item_aliases
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+Existing items keep NULL simhash; run app.workers.task_backfill_simhash once to sign
+stored feed items so new ones can match them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("items", sa.Column("simhash", sa.BigInteger))
+    op.create_table(
+        "item_aliases",
+        sa.Column("hash_sha256", sa.LargeBinary, primary_key=True),
+        sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id"), nullable=False),
+        sa.Column("source_id", sa.Integer, sa.ForeignKey("sources.id")),
+        sa.Column("canonical_url", sa.Text),
+        sa.Column("title", sa.Text),
+        sa.Column("reason", sa.Text),
+        sa.Column("distance", sa.Integer),
+        sa.Column("seen_at", sa.TIMESTAMP),
+    )
+    op.create_index("ix_item_aliases_item_id", "item_aliases", ["item_id"])
+
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_canonical_url ON items (canonical_url)")
+        for i in range(4):
+            create_index_concurrently(op, f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_simhash_b{i} "
+                                          f"ON items (((simhash >> {48 - 16 * i}) & 65535)) WHERE simhash IS NOT NULL")
+
+
+def downgrade() -> None:
+    for i in range(4):
+        op.drop_index(f"ix_items_simhash_b{i}", table_name="items")
+    op.drop_index("ix_items_canonical_url", table_name="items")
+    op.drop_table("item_aliases")
+    op.drop_column("items", "simhash")
@@ -0,0 +1,55 @@
+"""dashboard rollups: new IOCs per day/type/malware/source, new items per week/source
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+Seeded from the base tables with the same grouping app.rollups.reconcile uses;
+ingest keeps them current from then on.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ioc_daily_rollup",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("type", sa.Text, primary_key=True),
+        sa.Column("malware", sa.Text, primary_key=True),
+        sa.Column("source_id", sa.Integer, primary_key=True),
+        sa.Column("count", sa.BigInteger, nullable=False),
+    )
+    op.create_table(
+        "item_weekly_rollup",
+        sa.Column("week", sa.Date, primary_key=True),
+        sa.Column("source_id", sa.Integer, primary_key=True),
+        sa.Column("count", sa.BigInteger, nullable=False),
+    )
+    op.execute("""
+        INSERT INTO ioc_daily_rollup (day, type, malware, source_id, count)
+        SELECT coalesce(i.first_seen, it.fetched_at, 'epoch')::date, i.type,
+               coalesce(i.context->>'malware', ''), coalesce(it.source_id, 0), count(*)
+          FROM iocs i LEFT JOIN items it ON it.id = i.item_id
+         WHERE i.type IS NOT NULL
+         GROUP BY 1, 2, 3, 4
+    """)
+    op.execute("""
+        INSERT INTO item_weekly_rollup (week, source_id, count)
+        SELECT date_trunc('week', coalesce(published_at, fetched_at, 'epoch'))::date, coalesce(source_id, 0), count(*)
+          FROM items GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("item_weekly_rollup")
+    op.drop_table("ioc_daily_rollup")
@@ -0,0 +1,33 @@
+"""item labels: technique -> items and tag -> items indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+Ingest now writes item_techniques / item_tags (see app.tagging); run
+app.workers.task_tag_stored once to label items stored before this.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_item_techniques_technique_id_item_id "
+                                      "ON item_techniques (technique_id, item_id)")
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_item_tags_tag_id_item_id ON item_tags (tag_id, item_id)")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_item_tags_tag_id_item_id", table_name="item_tags")
+    op.drop_index("ix_item_techniques_technique_id_item_id", table_name="item_techniques")
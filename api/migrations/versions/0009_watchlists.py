@@ -0,0 +1,48 @@
+"""watchlists: watch_entries and the watch_hits ingest records against them
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+Hits are recorded for IOCs ingested after an entry is added.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "watch_entries",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("kind", sa.Text, nullable=False),
+        sa.Column("value", sa.Text, nullable=False),
+        sa.Column("note", sa.Text),
+        sa.Column("created_at", sa.TIMESTAMP),
+        sa.UniqueConstraint("kind", "value", name="watch_entries_kind_value_unique"),
+    )
+    op.create_table(
+        "watch_hits",
+        sa.Column("id", sa.BigInteger, primary_key=True),
+        sa.Column("entry_id", sa.Integer, sa.ForeignKey("watch_entries.id"), nullable=False),
+        sa.Column("ioc_id", sa.BigInteger, sa.ForeignKey("iocs.id"), nullable=False),
+        sa.Column("item_id", sa.BigInteger, sa.ForeignKey("items.id")),
+        sa.Column("source_id", sa.Integer, sa.ForeignKey("sources.id")),
+        sa.Column("matched_at", sa.TIMESTAMP),
+        sa.UniqueConstraint("entry_id", "ioc_id", name="watch_hits_entry_ioc_unique"),
+    )
+    op.create_index("ix_watch_hits_entry_id_id", "watch_hits", ["entry_id", "id"])
+    op.create_index("ix_watch_hits_ioc_id", "watch_hits", ["ioc_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("watch_hits")
+    op.drop_table("watch_entries")
@@ -0,0 +1,33 @@
+"""iocs.first_seen: repair rows seeded from the feed's last_seen
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+Ingest used to seed first_seen from ThreatFox's `last_seen` when both were present, and
+least() on later upserts could never move it back. Pull it down to the context's
+`first_seen` where that is earlier; the rollup reconcile job picks up the changed days.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(r"""
+        UPDATE iocs SET first_seen = left(context->>'first_seen', 19)::timestamp
+         WHERE context->>'first_seen' ~ '^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}'
+           AND (first_seen IS NULL OR left(context->>'first_seen', 19)::timestamp < first_seen)
+    """)
+
+
+def downgrade() -> None:
+    # Data repair only
+    pass
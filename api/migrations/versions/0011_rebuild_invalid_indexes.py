@@ -0,0 +1,69 @@
+"""rebuild indexes left INVALID by a failed CREATE INDEX CONCURRENTLY
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+Earlier migrations built indexes CONCURRENTLY ... IF NOT EXISTS; a build that failed
+(e.g. a duplicate hash inserted while ux_items_hash_sha256 was being built) left an
+INVALID index that reruns skipped. Such an index serves no query, and a unique one is no
+ON CONFLICT arbiter, so every item upsert fails. Each invalid index is dropped and built
+again from its own definition; duplicate item hashes are folded first, as in 0003.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _fold_duplicate_items() -> None:
+    op.execute("""
+        CREATE TEMP TABLE item_dupes ON COMMIT DROP AS
+        SELECT id, min(id) OVER (PARTITION BY hash_sha256) AS keep_id
+          FROM items WHERE hash_sha256 IS NOT NULL
+    """)
+    op.execute("DELETE FROM item_dupes WHERE id = keep_id")
+    op.execute("UPDATE iocs SET item_id = d.keep_id FROM item_dupes d WHERE iocs.item_id = d.id")
+    op.execute("""
+        INSERT INTO ioc_sightings (ioc_id, item_id, source_id, seen_at)
+        SELECT s.ioc_id, d.keep_id, s.source_id, s.seen_at FROM ioc_sightings s JOIN item_dupes d ON d.id = s.item_id
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("DELETE FROM ioc_sightings USING item_dupes d WHERE ioc_sightings.item_id = d.id")
+    op.execute("UPDATE item_aliases SET item_id = d.keep_id FROM item_dupes d WHERE item_aliases.item_id = d.id")
+    op.execute("UPDATE watch_hits SET item_id = d.keep_id FROM item_dupes d WHERE watch_hits.item_id = d.id")
+    op.execute("UPDATE ingest_checkpoints SET item_id = d.keep_id FROM item_dupes d WHERE ingest_checkpoints.item_id = d.id")
+    op.execute("DELETE FROM item_tags USING item_dupes d WHERE item_tags.item_id = d.id")
+    op.execute("DELETE FROM item_techniques USING item_dupes d WHERE item_techniques.item_id = d.id")
+    op.execute("DELETE FROM items USING item_dupes d WHERE items.id = d.id")
+
+
+def upgrade() -> None:
+    if op.get_context().as_sql:
+        return
+    invalid = op.get_bind().execute(sa.text("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+          FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+         WHERE NOT i.indisvalid AND pg_table_is_visible(c.oid)
+         ORDER BY c.relname
+    """)).all()
+    if not invalid:
+        return
+    if any(name == "ux_items_hash_sha256" for name, _ in invalid):
+        _fold_duplicate_items()
+    with op.get_context().autocommit_block():
+        for name, ddl in invalid:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1))
+
+
+def downgrade() -> None:
+    # Repair only
+    pass
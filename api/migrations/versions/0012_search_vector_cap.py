@@ -0,0 +1,55 @@
+"""items.search_vector: cap the indexed text at 500k characters
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+A tsvector over 1 MB is an error, so one very large report failed its whole insert
+batch. Postgres 15 can't change a generated column's expression in place: the column
+is dropped and added again (one rewrite of `items`, as in 0002) and its GIN index
+rebuilt. Skipped where 0002 already created the capped column.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', left(coalesce(text, ''), 500000)), 'B')"
+)
+
+
+def _capped() -> bool:
+    if op.get_context().as_sql:
+        return False
+    expr = op.get_bind().execute(sa.text("""
+        SELECT pg_get_expr(d.adbin, d.adrelid) FROM pg_attrdef d
+          JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+         WHERE d.adrelid = 'items'::regclass AND a.attname = 'search_vector'
+    """)).scalar()
+    return expr is not None and "500000" in expr
+
+
+def upgrade() -> None:
+    if _capped():
+        return
+    op.execute("ALTER TABLE items DROP COLUMN IF EXISTS search_vector")
+    op.execute(f"ALTER TABLE items ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED")
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_search_vector "
+                                      "ON items USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    # The uncapped expression is what made large reports fail; keep the cap
+    pass
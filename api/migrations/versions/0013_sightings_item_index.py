@@ -0,0 +1,35 @@
+"""ioc_sightings (item_id, ioc_id) index for the item detail page
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+
+The item page lists an item's IOCs through its sightings, keyset-paged on IOC id;
+the composite index serves both that and the item_id lookups the old one did.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ioc_sightings_item_id_ioc_id "
+                                      "ON ioc_sightings (item_id, ioc_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_ioc_sightings_item_id")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_index_concurrently(op, "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ioc_sightings_item_id "
+                                      "ON ioc_sightings (item_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_ioc_sightings_item_id_ioc_id")